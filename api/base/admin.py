@@ -13,11 +13,25 @@ class DroneAdmin(admin.ModelAdmin):
 class DroneAdmin(admin.ModelAdmin):
     list_display = ('name', 'code', 'weight',)
     search_fields = ['name', 'code',]
+    # written by the image processing task
+    readonly_fields = ('image_variants',)
 
 
 @admin.register(models.DroneStatusLog)
 class DroneAdmin(admin.ModelAdmin):
     list_display = ('drone_name', 'current_battery', 'created',)
-    search_fields = ['drone_name',]
+    list_select_related = ('drone_rel',)
+    search_fields = ['drone_rel__serial_number',]
     date_hierarchy = 'created'
+    # avoids counting every row of the partitioned table on each page
+    show_full_result_count = False
+
+
+@admin.register(models.DroneBatteryRollup)
+class DroneBatteryRollupAdmin(admin.ModelAdmin):
+    list_display = ('drone_rel', 'period', 'period_start', 'samples', 'min_battery', 'avg_battery', 'max_battery',)
+    list_filter = ('period',)
+    list_select_related = ('drone_rel',)
+    date_hierarchy = 'period_start'
+    show_full_result_count = False
 
@@ -0,0 +1,43 @@
+from datetime import timedelta
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional(handler):
+    """
+    Decorates a GET handler of a viewset with ETag and Last-Modified headers computed from
+    the get_resource_version method of the viewset, that returns a version of the data of the
+    resource and its last modification datetime. The ETag also depends on the url, so the
+    pages and filters of a list have its own ETag. If-None-Match and If-Modified-Since
+    headers matching the current version return 304 Not Modified without calling the handler.
+    The modification datetime is the updated timestamp, set before the commit and sent in
+    seconds, so If-Modified-Since only returns 304 once it is LAST_MODIFIED_WINDOW seconds old.
+    Changes committed later than that window after their timestamp are only seen through the ETag.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        version, last_modified = self.get_resource_version()
+        etag = quote_etag(md5('{} {} {}'.format(
+            request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), version
+        ).encode()).hexdigest())
+        settled = last_modified is not None and (
+            timezone.now() - last_modified >= timedelta(seconds=settings.LAST_MODIFIED_WINDOW))
+        last_modified = int(last_modified.timestamp()) if last_modified is not None else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified if settled else None)
+        if response is None:
+            response = handler(self, request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    return wrapper
@@ -0,0 +1,134 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from dynamic_rest.pagination import DynamicPageNumberPagination
+
+
+def encode_cursor(values):
+    """
+    Encodes the keyset values of the last row of a page into an opaque cursor
+    """
+
+    return urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor built by encode_cursor, raises ValueError if it is not valid
+    """
+
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+    except (TypeError, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def keyset_filter(ordering, values):
+    """
+    Returns the filter of the rows after the row with values on an ordering:
+    (a > x) or (a = x and b > y) or ...
+    """
+
+    query = Q()
+    equal = {}
+    for term, value in zip(ordering, values):
+        field = term.lstrip('-')
+        query |= Q(**equal, **{'{}__{}'.format(field, 'lt' if term.startswith('-') else 'gt'): value})
+        equal[field] = value
+    return query
+
+
+class DynamicKeysetPagination(DynamicPageNumberPagination):
+    """
+    Page number pagination that switches to keyset pagination when the request has a cursor
+    parameter, empty for the first page. Keyset pages filter the rows after the last row of the
+    previous page on the ordering columns instead of using an OFFSET and do not count the rows.
+    The ordering of the view, including the one requested with sort[], is used with the primary
+    key appended to break ties.
+    """
+
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.model_pk_name = queryset.model._meta.pk.name
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if any(not isinstance(term, str) or '__' in term for term in ordering):
+            raise ValidationError(_('Cursor pagination only supports sorting by fields of the resource.'))
+        if not any(term.lstrip('-') in ('pk', queryset.model._meta.pk.name) for term in ordering):
+            ordering.append('pk')
+
+        cursor = request.query_params[self.cursor_query_param]
+        if cursor:
+            try:
+                values = decode_cursor(cursor)
+            except ValueError:
+                raise ValidationError(_('Invalid cursor.'))
+            if len(values) != len(ordering):
+                raise ValidationError(_('Invalid cursor.'))
+            queryset = queryset.filter(keyset_filter(ordering, values))
+
+        page_size = self.get_page_size(request)
+        # one extra row tells if there is a next page
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        self.page_rows = rows[:page_size]
+        self.next_cursor = None
+        if len(rows) > page_size:
+            last = self.page_rows[-1]
+            self.next_cursor = encode_cursor([self.get_row_value(last, term.lstrip('-')) for term in ordering])
+        return self.page_rows
+
+    def get_row_value(self, row, field):
+        """
+        Returns a value of a model instance or of a row of a .values() queryset
+        """
+
+        if isinstance(row, dict):
+            if field == self.model_pk_name and field not in row:
+                field = 'pk'
+            return row[field]
+        return row.serializable_value(field)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_page_metadata(self):
+        if not self.keyset:
+            return super().get_page_metadata()
+        return {
+            'next_cursor': self.next_cursor,
+            'per_page': self.get_page_size(self.request),
+        }
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        if isinstance(data, list):
+            data = OrderedDict([
+                ('next', self.get_next_link()),
+                ('results', data),
+                ('meta', self.get_page_metadata())
+            ])
+        else:
+            data.setdefault('meta', {}).update(self.get_page_metadata())
+        return Response(data)
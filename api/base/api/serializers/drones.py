@@ -1,14 +1,45 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
+from drf_spectacular.utils import extend_schema_field
+
 from dynamic_rest.fields.fields import DynamicRelationField
 from dynamic_rest.serializers import DynamicModelSerializer
 
 from rest_framework import serializers
 
+from base.geo import parse_position, to_geojson, to_point
 from base.models import Drone, Load
 from base.api.serializers.medications import MedicationSerializer
 
 
+@extend_schema_field({
+    'type': 'object',
+    'nullable': True,
+    'description': 'GeoJSON point with the longitude and latitude',
+    'properties': {
+        'type': {'type': 'string', 'enum': ['Point']},
+        'coordinates': {'type': 'array', 'items': {'type': 'number'}, 'minItems': 2, 'maxItems': 2},
+    },
+})
+class PositionField(serializers.Field):
+    """
+    Position of a drone as a GeoJSON point
+    """
+
+    def to_representation(self, value):
+        return to_geojson(value)
+
+    def to_internal_value(self, data):
+        try:
+            return to_point(parse_position(data))
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+
+
 class DroneSerializer(DynamicModelSerializer):
 
     class Meta:
@@ -16,7 +47,11 @@ class DroneSerializer(DynamicModelSerializer):
         ref_name = 'Drone'
         name = 'drone'
         view_name = 'drones-list'
-        fields = ('pk', 'serial_number', 'model', 'weight_limit', 'battery_capacity', 'state')
+        fields = ('pk', 'serial_number', 'model', 'weight_limit', 'battery_capacity', 'state', 'position', 'current_load')
+
+    current_load = serializers.FloatField(source='get_load_weight', read_only=True)
+
+    position = PositionField(required=False, allow_null=True)
 
     def validate_weight_limit(self, value):
         """
@@ -37,6 +72,29 @@ class DroneSerializer(DynamicModelSerializer):
         return value
 
 
+class DroneAvailableSerializer(DynamicModelSerializer):
+
+    class Meta:
+        model = Drone
+        ref_name = 'DroneAvailable'
+        name = 'drone'
+        view_name = 'drones-list'
+        fields = ('pk', 'serial_number', 'model', 'weight_limit', 'battery_capacity', 'state', 'position', 'remaining_capacity')
+
+    remaining_capacity = serializers.FloatField(read_only=True)
+
+    position = PositionField(read_only=True)
+
+
+class DroneNearestSerializer(DroneAvailableSerializer):
+
+    class Meta(DroneAvailableSerializer.Meta):
+        ref_name = 'DroneNearest'
+        fields = DroneAvailableSerializer.Meta.fields + ('distance',)
+
+    distance = serializers.FloatField(read_only=True, help_text="Distance in meters to the point")
+
+
 class DroneBatterySerializer(DynamicModelSerializer):
 
     class Meta:
@@ -62,6 +120,182 @@ class DroneCurrentLoadSerializer(serializers.Serializer):
     current_load = serializers.FloatField()
 
 class DroneAddLoadSerializer(serializers.Serializer):
-    quantity = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+    medication = serializers.IntegerField()
+
+class DroneBatchAddLoadSerializer(serializers.Serializer):
+
+    loads = DroneAddLoadSerializer(many=True, allow_empty=False)
+
+class DroneDispatchSerializer(serializers.Serializer):
+
+    orders = DroneAddLoadSerializer(many=True, allow_empty=False)
+
+    destination = PositionField(
+        required=False, help_text="Only load drones with a position with the payload they can fly there and back")
+
+class DroneDispatchAssignmentSerializer(serializers.Serializer):
+
+    drone = serializers.IntegerField()
+
+    loads = DroneAddLoadSerializer(many=True)
+
+class DroneDispatchResultSerializer(serializers.Serializer):
+
+    assignments = DroneDispatchAssignmentSerializer(many=True)
+
+    unassigned = DroneAddLoadSerializer(many=True)
+
+class DroneDestinationSerializer(serializers.Serializer):
+
+    position = PositionField()
+
+    weight = serializers.FloatField(default=0, min_value=0, help_text="Payload weight to carry to the destination")
+
+class DroneFeasibilitySerializer(serializers.Serializer):
+
+    destinations = DroneDestinationSerializer(many=True, allow_empty=False)
+
+    drones = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False,
+        help_text="Ids of the candidate drones, the drones available for loading by default")
+
+    limit = serializers.IntegerField(
+        default=settings.DRONE_FEASIBILITY_DEFAULT_RESULTS, min_value=1,
+        max_value=settings.DRONE_FEASIBILITY_MAX_RESULTS, help_text="Number of pairs returned")
+
+    def validate_destinations(self, value):
+        if len(value) > settings.DRONE_FEASIBILITY_MAX_DESTINATIONS:
+            raise serializers.ValidationError(
+                _("At most %d destinations are allowed.") % settings.DRONE_FEASIBILITY_MAX_DESTINATIONS)
+        return value
+
+class DroneFeasiblePairSerializer(serializers.Serializer):
+
+    drone = serializers.IntegerField()
+
+    destination = serializers.IntegerField(help_text="Position of the destination in the request")
+
+    distance = serializers.FloatField(help_text="Distance in meters to the destination")
+
+    energy = serializers.FloatField(help_text="Battery used by the round trip")
+
+    margin = serializers.FloatField(help_text="Battery left above the reserve at the return")
+
+class DroneFeasibilityResultSerializer(serializers.Serializer):
+
+    evaluated = serializers.IntegerField(help_text="Pairs evaluated")
+
+    feasible = serializers.IntegerField(help_text="Pairs feasible")
+
+    pairs = DroneFeasiblePairSerializer(many=True, help_text="Best feasible pairs from the largest margin")
+
+class DroneBatteryHistoryQuerySerializer(serializers.Serializer):
+
+    start = serializers.DateTimeField(required=False, help_text="Start of the time range, one day before end by default")
+
+    end = serializers.DateTimeField(required=False, help_text="End of the time range, now by default")
+
+    bucket = serializers.ChoiceField(
+        choices=['auto', 'raw', 'minute', 'hour', 'day'], default='auto',
+        help_text="Size of the aggregation buckets, raw returns the status logs, auto keeps the points under max_points")
+
+    max_points = serializers.IntegerField(default=720, min_value=1, max_value=10000)
+
+    limit = serializers.IntegerField(default=1000, min_value=1, max_value=10000, help_text="Page size of the raw mode")
+
+    cursor = serializers.CharField(required=False, help_text="Cursor of the next page of the raw mode")
+
+    def validate(self, data):
+        data['end'] = data.get('end') or timezone.now()
+        data['start'] = data.get('start') or data['end'] - timedelta(days=1)
+        if data['start'] >= data['end']:
+            raise serializers.ValidationError(_("Start must be before end."))
+        return data
+
+class DroneBatteryPointSerializer(serializers.Serializer):
+
+    time = serializers.DateTimeField()
+
+    battery = serializers.FloatField(required=False, help_text="Battery logged, only on raw mode")
+
+    min = serializers.FloatField(required=False)
+
+    avg = serializers.FloatField(required=False)
+
+    max = serializers.FloatField(required=False)
+
+    samples = serializers.IntegerField(required=False)
+
+class DroneBatteryHistorySerializer(serializers.Serializer):
+
+    drone = serializers.IntegerField()
+
+    bucket = serializers.CharField()
+
+    points = DroneBatteryPointSerializer(many=True)
+
+    next = serializers.CharField(required=False, allow_null=True, help_text="Cursor of the next page of the raw mode")
+
+class DroneTelemetrySerializer(serializers.Serializer):
+
+    serial_number = serializers.CharField(max_length=100)
+
+    battery_capacity = serializers.FloatField(required=False, min_value=0, max_value=100)
+
+    state = serializers.ChoiceField(choices=Drone.STATE_CHOICES, required=False)
+
+    position = PositionField(required=False)
+
+class DroneTelemetryErrorSerializer(serializers.Serializer):
+
+    index = serializers.IntegerField(allow_null=True, help_text="Position of the invalid report")
+
+    details = serializers.CharField()
+
+class DroneTelemetryErrorsSerializer(serializers.Serializer):
+
+    details = serializers.CharField(help_text="Error details")
+
+    errors = DroneTelemetryErrorSerializer(many=True)
+
+class DroneTelemetryResultSerializer(serializers.Serializer):
+
+    received = serializers.IntegerField(help_text="Drones reported")
+
+    updated = serializers.IntegerField(help_text="Drones whose battery or state changed")
+
+    unchanged = serializers.IntegerField()
+
+    logged = serializers.IntegerField(help_text="Status logs appended")
+
+    unknown = serializers.ListField(child=serializers.CharField(), help_text="Serial numbers of no drone")
+
+class DroneTelemetryQueuedSerializer(serializers.Serializer):
+
+    received = serializers.IntegerField(help_text="Drones reported")
+
+    queued = serializers.CharField(help_text="Id of the telemetry stream entry")
+
+class DroneTelemetryStreamStatsSerializer(serializers.Serializer):
+
+    length = serializers.IntegerField(help_text="Entries waiting to be applied")
+
+    pending = serializers.IntegerField(help_text="Entries read by a flush and not acknowledged")
+
+    lag_seconds = serializers.FloatField(help_text="Age of the oldest entry waiting")
+
+    max_length = serializers.IntegerField(help_text="Entries waiting before the reports are rejected")
+
+    last_id = serializers.CharField(allow_null=True, help_text="Id of the last entry applied")
+
+    flushes = serializers.IntegerField()
+
+    entries = serializers.IntegerField(help_text="Entries applied")
+
+    reports = serializers.IntegerField(help_text="Reports applied")
+
+    duplicates = serializers.IntegerField(help_text="Entries delivered again and skipped")
 
-    medication = serializers.IntegerField()
\ No newline at end of file
+    rejected = serializers.IntegerField(help_text="Requests rejected because the stream was full")
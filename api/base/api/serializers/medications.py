@@ -1,9 +1,12 @@
 from django.utils.translation import ugettext_lazy as _
 
+from drf_spectacular.utils import extend_schema_field
+
 from dynamic_rest.serializers import DynamicModelSerializer
 
 from rest_framework import serializers
 
+from base.images import VARIANTS, get_variant_urls
 from base.models import Medication
 
 import re
@@ -16,7 +19,18 @@ class MedicationSerializer(DynamicModelSerializer):
         ref_name = 'Medication'
         name = 'medication'
         view_name = 'medications-list'
-        fields = ('pk', 'name', 'weight', 'code', 'image',)
+        fields = ('pk', 'name', 'weight', 'code', 'image', 'image_variants',)
+
+    image_variants = serializers.SerializerMethodField()
+
+    @extend_schema_field({
+        'type': 'object',
+        'nullable': True,
+        'description': 'Urls of the thumbnails and WebP version of the image, null while they are generated',
+        'properties': {variant: {'type': 'string'} for variant in VARIANTS},
+    })
+    def get_image_variants(self, medication):
+        return get_variant_urls(medication.image.name, medication.image_variants, self.context.get('request'))
 
     def validate_code(self, value):
         """
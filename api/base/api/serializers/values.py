@@ -0,0 +1,78 @@
+from base.geo import to_geojson
+from base.images import get_variant_urls
+from base.models import Medication
+
+
+class ValuesSerializer:
+    """
+    Read only serializer of the rows of a .values() queryset.
+    Rows are plain dicts with the fields of the resource, so they are returned as they come
+    from the database. Fields that need a conversion define a to_<field> method.
+    It returns the same representation as the dynamic serializer of the resource when the
+    request does not ask for other fields (include[] or exclude[]).
+    """
+
+    name = None
+    plural_name = None
+    fields = ()
+
+    def __init__(self, request=None):
+        self.request = request
+        self.converters = [
+            (field, getattr(self, 'to_' + field)) for field in self.fields if hasattr(self, 'to_' + field)
+        ]
+
+    def get_values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.fields)
+
+    def to_representation(self, row):
+        for field, converter in self.converters:
+            row[field] = converter(row[field])
+        return row
+
+    def to_representation_many(self, rows):
+        if not self.converters:
+            return list(rows)
+        return [self.to_representation(row) for row in rows]
+
+    def serialize(self, queryset):
+        return self.to_representation_many(self.get_values(queryset))
+
+
+class DroneValuesSerializer(ValuesSerializer):
+
+    name = 'drone'
+    plural_name = 'drones'
+    fields = ('pk', 'serial_number', 'model', 'weight_limit', 'battery_capacity', 'state', 'position', 'current_load')
+
+    def to_position(self, value):
+        return to_geojson(value)
+
+
+class LoadValuesSerializer(ValuesSerializer):
+
+    name = 'Load'
+    plural_name = 'Loads'
+    fields = ('pk', 'medication_rel', 'quantity')
+
+
+class MedicationValuesSerializer(ValuesSerializer):
+
+    name = 'medication'
+    plural_name = 'medications'
+    fields = ('pk', 'name', 'weight', 'code', 'image', 'image_variants')
+
+    def to_representation(self, row):
+        # the variants are checked against the name of the image, before it is converted to its url
+        row['image_variants'] = get_variant_urls(row['image'], row['image_variants'], self.request)
+        return super().to_representation(row)
+
+    def to_image(self, value):
+        """
+        Returns the url of the image like the image field of MedicationSerializer
+        """
+
+        if not value:
+            return None
+        url = Medication._meta.get_field('image').storage.url(value)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
@@ -0,0 +1,28 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def stream_json_list(head, key, items, tail=None):
+    """
+    Yields the JSON of an object with the fields of head, a list of items under key and
+    the fields returned by tail, a callable evaluated once all the items were written.
+    Items are encoded one by one, so the list is never held in memory.
+    """
+
+    yield _dumps(head)[:-1] + (', ' if head else '') + _dumps(key) + ': ['
+    for index, item in enumerate(items):
+        yield (', ' if index else '') + _dumps(item)
+    tail = tail() if tail is not None else {}
+    yield ']' + (', ' + _dumps(tail)[1:] if tail else '}')
+
+
+def streaming_json_response(head, key, items, tail=None, status=200):
+    return StreamingHttpResponse(
+        stream_json_list(head, key, items, tail), status=status, content_type='application/json'
+    )
@@ -0,0 +1,158 @@
+"""
+Async read endpoints of drones and medications for the ASGI server.
+Under ASGI the sync views of the API share one thread per process, so a slow query blocks
+every other request. These views run each database access on a thread of a pool instead, so
+one process serves many requests at the same time. They return the same JSON as the list
+(paginated by page number), detail, battery and load endpoints of the API.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import close_old_connections
+from django.http import Http404, JsonResponse
+from django.utils.translation import ugettext_lazy as _
+
+from dynamic_rest.conf import settings as dynamic_settings
+
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from base.api.serializers.values import DroneValuesSerializer, LoadValuesSerializer, MedicationValuesSerializer
+from base.db import check_connections
+from base.models import Drone, Load, Medication
+
+
+def run_query(func, *args):
+    """
+    Runs a function using the database on a thread of the pool, its connection is closed
+    or reused following CONN_MAX_AGE and CONN_HEALTH_CHECKS like on the sync request cycle
+    """
+
+    def query():
+        close_old_connections()
+        check_connections()
+        return func(*args)
+
+    return sync_to_async(query, thread_sensitive=False)()
+
+
+def authenticate(request):
+    """
+    Returns the user of the JWT token or the session of the request, None if it is not authenticated
+    """
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    if result is not None:
+        return result[0]
+    return request.user if request.user.is_authenticated else None
+
+
+def async_read(view):
+    """
+    Decorates an async read view: only GET is allowed, the user must be authenticated
+    and missing objects return 404 like the API.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({'detail': _('Method "{}" not allowed.').format(request.method)}, status=405)
+        if await run_query(authenticate, request) is None:
+            return JsonResponse({'detail': _('Authentication credentials were not provided.')}, status=401)
+        try:
+            return await view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': _('Not found.')}, status=404)
+
+    return wrapper
+
+
+def get_page(request, queryset, serializer):
+    """
+    Returns the page of rows of the request and its meta data like DynamicPageNumberPagination
+    """
+
+    page_size = dynamic_settings.PAGE_SIZE or settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        per_page = int(request.GET.get(dynamic_settings.PAGE_SIZE_QUERY_PARAM, page_size))
+    except ValueError:
+        per_page = page_size
+    if per_page <= 0:
+        per_page = page_size
+    if dynamic_settings.MAX_PAGE_SIZE:
+        per_page = min(per_page, dynamic_settings.MAX_PAGE_SIZE)
+
+    paginator = Paginator(serializer.get_values(queryset), per_page)
+    try:
+        page = paginator.page(request.GET.get(dynamic_settings.PAGE_QUERY_PARAM, 1))
+    except (EmptyPage, PageNotAnInteger):
+        raise Http404
+    return serializer.to_representation_many(page.object_list), {
+        'total_results': paginator.count,
+        'total_pages': paginator.num_pages,
+        'page': page.number,
+        'per_page': paginator.per_page,
+    }
+
+
+def get_row(queryset, serializer):
+    row = serializer.get_values(queryset).first()
+    if row is None:
+        raise Http404
+    return serializer.to_representation(row)
+
+
+@async_read
+async def drone_list(request):
+    serializer = DroneValuesSerializer(request)
+    rows, meta = await run_query(
+        get_page, request, Drone.objects.with_current_load().order_by('serial_number'), serializer)
+    return JsonResponse({serializer.plural_name: rows, 'meta': meta})
+
+
+@async_read
+async def drone_detail(request, pk):
+    serializer = DroneValuesSerializer(request)
+    row = await run_query(get_row, Drone.objects.with_current_load().filter(pk=pk), serializer)
+    return JsonResponse({serializer.name: row})
+
+
+@async_read
+async def drone_battery(request, pk):
+    row = await run_query(lambda: Drone.objects.filter(pk=pk).values('pk', 'battery_capacity').first())
+    if row is None:
+        raise Http404
+    return JsonResponse(row)
+
+
+@async_read
+async def drone_load(request, pk):
+    def load():
+        if not Drone.objects.filter(pk=pk).exists():
+            raise Http404
+        return LoadValuesSerializer(request).serialize(
+            Load.objects.filter(flight_rel__drone_rel=pk, flight_rel__was_delivered=False))
+
+    return JsonResponse(await run_query(load), safe=False)
+
+
+@async_read
+async def medication_list(request):
+    serializer = MedicationValuesSerializer(request)
+    rows, meta = await run_query(get_page, request, Medication.objects.order_by('name'), serializer)
+    return JsonResponse({serializer.plural_name: rows, 'meta': meta})
+
+
+@async_read
+async def medication_detail(request, pk):
+    serializer = MedicationValuesSerializer(request)
+    row = await run_query(get_row, Medication.objects.filter(pk=pk), serializer)
+    return JsonResponse({serializer.name: row})
@@ -3,22 +3,46 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from dynamic_rest.viewsets import DynamicModelViewSet
 from dynamic_rest.filters import DynamicFilterBackend, DynamicSortingFilter
 
-from django.db.models import Q
-from django.db import transaction
+from django.conf import settings
+from django.db import transaction, OperationalError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import ugettext_lazy as _
 
-from base.models import Drone, Flight, Load, Medication
-from base.api.serializers.drones import DroneSerializer, DroneBatterySerializer, DroneLoadSerializer, DroneAddLoadSerializer, DroneCurrentLoadSerializer
+from base.cache import get_drones_version
+from base.dispatch import dispatch_orders
+from base.feasibility import Fleet, rank_pairs
+from base.geo import parse_position, to_point
+from base.history import bucketed_points, choose_bucket, raw_points
+from base.loading import add_loads, merge_quantities, LoadError
+from base.models import Drone, Flight, Load
+from base.telemetry import apply_reports, validate_reports
+from base.telemetry_stream import append_reports, get_stream_stats, StreamFull
+from base.api.serializers.drones import DroneSerializer, DroneAvailableSerializer, DroneNearestSerializer, DroneBatterySerializer, DroneLoadSerializer, DroneAddLoadSerializer, DroneBatchAddLoadSerializer, DroneCurrentLoadSerializer, \
+    DroneDispatchSerializer, DroneDispatchResultSerializer, DroneBatteryHistoryQuerySerializer, DroneBatteryHistorySerializer, \
+    DroneTelemetrySerializer, DroneTelemetryErrorsSerializer, DroneTelemetryResultSerializer, DroneTelemetryQueuedSerializer, \
+    DroneTelemetryStreamStatsSerializer, DroneFeasibilitySerializer, DroneFeasibilityResultSerializer
 from base.api.serializers.errors import ErrorSerializer
+from base.api.serializers.values import DroneValuesSerializer, LoadValuesSerializer
+from base.api.conditional import conditional
+from base.api.parsers import NDJSONParser
+from base.api.pagination import decode_cursor, encode_cursor, DynamicKeysetPagination
+from base.api.streaming import streaming_json_response
+from base.api.views.mixins import ValuesReadMixin
 
+# PostgreSQL error raised by select_for_update(nowait=True) on a locked row
+LOCK_NOT_AVAILABLE = '55P03'
 
-class DroneViewSet(DynamicModelViewSet):
+
+class DroneViewSet(ValuesReadMixin, DynamicModelViewSet):
     """
     API endpoint that allows drone to be viewed and edited.
     """
@@ -30,30 +54,155 @@ class DroneViewSet(DynamicModelViewSet):
         DynamicFilterBackend, DynamicSortingFilter,
     ]
 
+    pagination_class = DynamicKeysetPagination
+
     model = Drone
     queryset = Drone.objects.all()
     serializer_class = DroneSerializer
+    values_serializer_class = DroneValuesSerializer
 
     def get_queryset(self):
         """
         Filters and sorts drones.
         """
-        queryset = Drone.objects.all()
+        queryset = Drone.objects.with_current_load()
 
         return queryset.order_by("serial_number")
 
+    def get_resource_version(self):
+        """
+        Version of the drones for conditional requests: the version started once the last write of
+        drones, flights or loads committed, the number of drones and the last update of the drones
+        and of the flights, whose weight is the current load of the drones.
+        Flights are only deleted with its drone, so they need no count.
+        """
+        # read before the rows, a write committed after them starts a new version
+        version = get_drones_version()
+        drones = Drone.objects.aggregate(count=Count('pk'), updated=Max('updated'))
+        flights_updated = Flight.objects.aggregate(updated=Max('updated'))['updated']
+        last_modified = max([updated for updated in (drones['updated'], flights_updated) if updated], default=None)
+        return (version, drones['count'], drones['updated'], flights_updated), last_modified
+
+    @conditional
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_serializer_class(self):
+        if self.action == 'available_for_loading':
+            return DroneAvailableSerializer
+        return super().get_serializer_class()
+
+    def get_current_loads(self, drone):
+        """
+        Returns the loads on the current flight of a drone.
+        """
+        return Load.objects.filter(flight_rel__drone_rel=drone, flight_rel__was_delivered=False)
+
+    def get_locked_object(self):
+        """
+        Returns the drone of the request locked until the end of the current transaction.
+        Depending on DRONE_LOAD_LOCK_MODE a drone locked by another request makes this
+        wait (wait) or returns None right away (nowait, skip_locked).
+        """
+        lock_mode = settings.DRONE_LOAD_LOCK_MODE
+        lookup = {self.lookup_field: self.kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        queryset = self.get_queryset().select_for_update(
+            nowait=lock_mode == 'nowait',
+            skip_locked=lock_mode == 'skip_locked',
+        ).filter(**lookup)
+
+        try:
+            with transaction.atomic():
+                drone = queryset.first()
+        except OperationalError as e:
+            # only a drone locked by another request is returned as busy, other errors are not contention
+            if getattr(e.__cause__, 'pgcode', None) != LOCK_NOT_AVAILABLE:
+                raise
+            return None
+
+        if drone is None:
+            if lock_mode == 'skip_locked' and Drone.objects.filter(**lookup).exists():
+                return None
+            raise Http404
+
+        self.check_object_permissions(self.request, drone)
+        return drone
+
 
     @extend_schema(methods=['get'], responses={200: DroneBatterySerializer()},
                    description="API endpoint allowing to retrieve the battery for a drone.")
     @action(detail=True, methods=['get'])
+    @conditional
     def battery(self, request, pk=None):
         drone = self.get_object()
-        return Response(DroneBatterySerializer(embed=True, many=True).to_representation(drone))
+        return Response(DroneBatterySerializer(embed=True).to_representation(drone))
+
+
+    @extend_schema(methods=['get'], responses={200: DroneBatteryHistorySerializer(), 400: ErrorSerializer()},
+                   parameters=[DroneBatteryHistoryQuerySerializer],
+                   description="API endpoint allowing to retrieve the battery history of a drone.")
+    @action(detail=True, methods=['get'])
+    def battery_history(self, request, pk=None):
+        """
+        Battery history of a drone on a time range.
+        # This endpoint returns the battery series of a drone aggregated on the server
+        * The bucket parameter aggregates the battery by minute, hour or day returning its min, avg and max, by default the smallest bucket that returns less than max_points points is used
+        * The raw bucket returns the battery logs, paginated by a cursor returned on the next field
+        * The response is streamed
+        """
+
+        drone = self.get_object()
+
+        query = DroneBatteryHistoryQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response({'details': _('Invalid parameters: {}').format(query.errors)}, status=400)
+        params = query.validated_data
+
+        if params['bucket'] != 'raw':
+            bucket = params['bucket'] if params['bucket'] != 'auto' else choose_bucket(
+                params['start'], params['end'], params['max_points'])
+            points = (
+                {'time': time, 'min': low, 'avg': avg, 'max': high, 'samples': samples}
+                for time, low, avg, high, samples in bucketed_points(drone.pk, params['start'], params['end'], bucket)
+            )
+            return streaming_json_response({'drone': drone.pk, 'bucket': bucket}, 'points', points)
+
+        after = None
+        if 'cursor' in params:
+            try:
+                created, log_pk = decode_cursor(params['cursor'])
+                after = (parse_datetime(created), int(log_pk))
+                if after[0] is None:
+                    raise ValueError('Invalid cursor')
+            except (TypeError, ValueError):
+                return Response({'details': _('Invalid cursor')}, status=400)
+
+        # one extra log tells if there is a next page
+        logs = raw_points(drone.pk, params['start'], params['end'], after, params['limit'] + 1)
+        page = {'last': None, 'more': False}
+
+        def points():
+            for index, (created, log_pk, battery) in enumerate(logs.iterator()):
+                if index == params['limit']:
+                    page['more'] = True
+                    break
+                page['last'] = (created, log_pk)
+                yield {'time': created, 'battery': battery}
+
+        def tail():
+            return {'next': encode_cursor(page['last']) if page['more'] else None}
+
+        return streaming_json_response({'drone': drone.pk, 'bucket': 'raw'}, 'points', points(), tail)
 
 
     @extend_schema(methods=['get'], responses={200: DroneCurrentLoadSerializer()},
                    description="API endpoint allowing to retrieve the current load weight for a drone.")
     @action(detail=True, methods=['get'])
+    @conditional
     def current_load_weight(self, request, pk=None):
         drone = self.get_object()
         return Response(DroneCurrentLoadSerializer({"current_load": drone.get_load_weight()}).data, status=200)
@@ -62,19 +211,17 @@ class DroneViewSet(DynamicModelViewSet):
     @extend_schema(methods=['get'], responses={200: DroneLoadSerializer()},
                    description="API endpoint allowing to retrieve the load for a drone.")
     @action(detail=True, methods=['get'])
+    @conditional
     def load(self, request, pk=None):
         drone = self.get_object()
-        flights = drone.flights_rel.filter(was_delivered=False)
-        loads = {}
-        if flights.exists():
-            loads = flights[0].loads_rel
-        return Response(DroneLoadSerializer(embed=True, many=True).to_representation(loads))
+        return Response(LoadValuesSerializer(request).serialize(self.get_current_loads(drone)))
 
     
     @extend_schema(
         methods=['patch'], 
         responses={
             200: DroneLoadSerializer(),
+            409: ErrorSerializer(),
             422: ErrorSerializer()
         },
         request=DroneAddLoadSerializer(many=False),
@@ -87,84 +234,259 @@ class DroneViewSet(DynamicModelViewSet):
         # This endpoint allows add new load to a drone available
         * If the drone is on IDLE state a new Flight is created with the load in the payload
         * If the drone is on LOADING state and do not exists a load for the medication in the payload a new load is created, if exists the load quanity is updated with the current quanty plus the quantity on the payload
+        * If the drone is being loaded by another request a 409 error is returned
         """
 
-        drone = self.get_object()
+        drone = self.get_locked_object()
+        if drone is None:
+            return Response({'details': _('The drone is being loaded by another request')}, status=409)
 
         serializer = DroneAddLoadSerializer(data=request.data, many=False)
 
         if serializer.is_valid():
-            medication=None
-            load_data = serializer.data
             try:
-                medication=Medication.objects.get(pk=load_data['medication'])
-            except Medication.DoesNotExist:
-                return Response({'details': _('Medication does not exists on database')}, status=400)
-
-            if drone.state == 'IDLE' and drone.battery_capacity >= 25:
-                drone.state='LOADING'
-                flight = Flight.objects.create(
-                    drone_rel=drone,
-                )
-
-                if drone.weight_limit >= load_data['quantity'] * medication.weight:
- 
-                    Load.objects.create(
-                        flight_rel=flight,
-                        quantity=load_data['quantity'],
-                        medication_rel=medication
-                    )
-                else:
-                    return Response({'details': _('The load is higher that the current weight capacity of the drone')}, status=400)
-                drone.save()
-            elif drone.state == 'LOADING':
-                if drone.get_load_weight() + load_data['quantity'] * medication.weight <= drone.weight_limit:
-                    flight = Flight.objects.filter(drone_rel__id=drone.id, was_delivered=False)
-                    old_load = flight[0].loads_rel.filter(medication_rel__id=medication.id)
-                    if old_load.exists():
-                        old_load = old_load[0]
-                        old_load.quantity += load_data['quantity']
-                        old_load.save()
-                        flight[0].save()
-                    else:
-                        Load.objects.create(
-                            flight_rel=flight,
-                            quantity=load_data['quantity'],
-                            medication_rel=medication
-                        )
-                    drone.save()
-                    if drone.get_load_weight() == drone.weight_limit:
-                        drone.state = 'LOADED'
-                        drone.save()
-                else:
-                    return Response({'details': _('The load is higher that the current weight capacity of the drone')}, status=400)
-            else:
-                return Response({'details': _('The drone cannot accept new load')}, status=400)
+                add_loads(drone, merge_quantities([serializer.data]))
+            except LoadError as e:
+                return Response({'details': str(e)}, status=400)
+        else:
+            return Response({'details': _('Invalid payload')}, status=400)
+
+        return Response(LoadValuesSerializer(request).serialize(self.get_current_loads(drone)))
+
+
+    @extend_schema(
+        methods=['patch'],
+        responses={
+            200: DroneLoadSerializer(),
+            409: ErrorSerializer(),
+            422: ErrorSerializer()
+        },
+        request=DroneBatchAddLoadSerializer(many=False),
+        description="API endpoint allowing to add several medications to a drone at once.")
+    @action(detail=True, methods=['patch'])
+    @transaction.atomic
+    def load_batch_addition(self, request, pk=None):
+        """
+        Adds a batch of loads to a drone.
+        # This endpoint allows add several medications to a drone available in one request
+        * The whole batch is rejected if any medication does not exists or if it does not fit on the drone
+        * The loads are added as in the load_addition endpoint, repeated medications add its quantities
+        * If the drone is being loaded by another request a 409 error is returned
+        """
+
+        drone = self.get_locked_object()
+        if drone is None:
+            return Response({'details': _('The drone is being loaded by another request')}, status=409)
+
+        serializer = DroneBatchAddLoadSerializer(data=request.data, many=False)
+
+        if serializer.is_valid():
+            try:
+                add_loads(drone, merge_quantities(serializer.data['loads']))
+            except LoadError as e:
+                return Response({'details': str(e)}, status=400)
         else:
             return Response({'details': _('Invalid payload')}, status=400)
 
-        flights = drone.flights_rel.filter(was_delivered=False)
-        loads = {}
-        if flights.exists():
-            loads = flights[0].loads_rel
-        return Response(DroneLoadSerializer(embed=True, many=True).to_representation(loads))
+        return Response(LoadValuesSerializer(request).serialize(self.get_current_loads(drone)))
 
 
-    @extend_schema(methods=['get'], responses={200: DroneSerializer(many=True)},
+    @extend_schema(
+        methods=['post'],
+        responses={
+            200: DroneDispatchResultSerializer(),
+            400: ErrorSerializer()
+        },
+        request=DroneDispatchSerializer(many=False),
+        description="API endpoint allowing to distribute medication orders between the drones available for loading.")
+    @action(detail=False, methods=['post'])
+    def orders_dispatch(self, request, pk=None):
+        """
+        Packs a list of medication orders on the drones available for loading.
+        # This endpoint loads the drones available for loading with a list of orders
+        * Each order is loaded completely on one drone, the heaviest orders are placed first on the drone that leaves less free capacity
+        * Drones being loaded by another request are skipped
+        * The orders that fit on no drone are returned as unassigned
+        * With a destination only the drones with a position are loaded, each one with the payload its battery can take there and back
+        """
+
+        serializer = DroneDispatchSerializer(data=request.data, many=False)
+
+        if serializer.is_valid():
+            try:
+                result = dispatch_orders(serializer.data['orders'], serializer.validated_data.get('destination'))
+            except LoadError as e:
+                return Response({'details': str(e)}, status=400)
+        else:
+            return Response({'details': _('Invalid payload')}, status=400)
+
+        return Response(DroneDispatchResultSerializer(result).data)
+
+
+    @extend_schema(
+        methods=['post'],
+        responses={
+            200: DroneTelemetryResultSerializer(),
+            202: DroneTelemetryQueuedSerializer(),
+            400: DroneTelemetryErrorsSerializer(),
+            503: ErrorSerializer()
+        },
+        request=DroneTelemetrySerializer(many=True),
+        parameters=[OpenApiParameter('log', bool, description='Appends a status log for each reported drone')],
+        description="API endpoint allowing to report the battery and state of many drones at once.")
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def telemetry(self, request, pk=None):
+        """
+        Updates the battery and state of many drones.
+        # This endpoint receives the telemetry of the ground stations
+        * The body is a JSON list or NDJSON (application/x-ndjson) of reports with serial_number and battery_capacity, state or both
+        * The whole batch is rejected if any report is invalid, the errors include the position of each invalid report
+        * Only the drones whose battery or state changed are written, unknown serial numbers are returned
+        * With log=true a status log is appended for each reported drone in the same transaction
+        * On stream mode the reports are queued and applied by the flush task, the response is 202 with the id of the entry
+        * On stream mode the response is 503 with Retry-After while the flush task is too far behind
+        """
+
+        reports, errors = validate_reports(request.data)
+        if errors:
+            return Response({'details': _('Invalid payload'), 'errors': errors}, status=400)
+
+        log = request.query_params.get('log', '').lower() in ('1', 'true')
+        if settings.DRONE_TELEMETRY_MODE != 'stream':
+            return Response(apply_reports(reports, log=log))
+
+        try:
+            entry_id = append_reports(reports, log=log)
+        except StreamFull:
+            return Response({'details': _('Too many reports waiting, retry later')}, status=503,
+                            headers={'Retry-After': str(max(1, round(settings.DRONE_TELEMETRY_STREAM_FLUSH_INTERVAL)))})
+        return Response({'received': len(reports), 'queued': entry_id}, status=202)
+
+    @extend_schema(methods=['get'], responses={200: DroneTelemetryStreamStatsSerializer()},
+                   description="API endpoint allowing to monitor the backlog of the telemetry stream.")
+    @action(detail=False, methods=['get'])
+    def telemetry_stream(self, request, pk=None):
+        """
+        Endpoint to get the backlog of the telemetry stream
+        * length is the number of entries waiting and lag_seconds the age of the oldest one
+        * pending are the entries read by a flush and not acknowledged yet
+        """
+
+        return Response(get_stream_stats())
+
+
+    @extend_schema(methods=['get'], responses={200: DroneAvailableSerializer(many=True), 400: ErrorSerializer()},
+                   parameters=[OpenApiParameter('min_capacity', float, description='Minimum weight the drones can still carry')],
                    description="API endpoint allowing to retrieve the available drones for loading.")
     @action(detail=False, methods=['get'])
+    @conditional
     def available_for_loading(self, request, pk=None):
         """
         Endpoint to get the drones available for loading
+        * Each drone includes the weight it can still carry on remaining_capacity
+        * The min_capacity parameter returns only the drones that can still carry that weight
+        * The list is paginated and accepts the filter{} and sort[] parameters of the drones list
         """
 
-        drones = Drone.objects.filter(
-            Q(state='IDLE', battery_capacity__gte=25) |
-            Q(state='LOADING')
-        )
+        drones = self.get_queryset().available_for_loading().with_remaining_capacity()
+
+        if 'min_capacity' in request.query_params:
+            try:
+                drones = drones.filter(remaining_capacity__gte=float(request.query_params['min_capacity']))
+            except ValueError:
+                return Response({'details': _('Invalid min_capacity value')}, status=400)
+
+        drones = self.filter_queryset(drones)
+        serializer = DroneAvailableSerializer(embed=True, many=True)
 
         page = self.paginate_queryset(drones)
         if page is not None:
-            return self.get_paginated_response(DroneSerializer(embed=True, many=True).to_representation(drones))
+            return self.get_paginated_response(serializer.to_representation(page))
+
+        return Response(serializer.to_representation(drones))
+
+    @extend_schema(methods=['get'], responses={200: DroneNearestSerializer(many=True), 400: ErrorSerializer()},
+                   parameters=[
+                       OpenApiParameter('longitude', float, required=True, description='Longitude of the pickup point'),
+                       OpenApiParameter('latitude', float, required=True, description='Latitude of the pickup point'),
+                       OpenApiParameter('k', int, description='Number of drones, {} by default and at most {}'.format(
+                           settings.DRONE_NEAREST_DEFAULT_RESULTS, settings.DRONE_NEAREST_MAX_RESULTS)),
+                       OpenApiParameter('min_capacity', float, description='Minimum weight the drones can still carry'),
+                   ],
+                   description="API endpoint allowing to retrieve the nearest drones available for loading to a pickup point.")
+    @action(detail=False, methods=['get'], url_path='available_for_loading/nearest')
+    def nearest_available_for_loading(self, request, pk=None):
+        """
+        Endpoint to get the k drones available for loading nearest to a pickup point
+        * The drones are ordered by distance, in meters, and only the drones with a position are returned
+        * The drones are read with one query ordered with the KNN operator on the GiST index of the positions
+        * The min_capacity parameter returns only the drones that can still carry that weight
+        """
+
+        try:
+            point = to_point(parse_position({
+                'type': 'Point',
+                'coordinates': [float(request.query_params['longitude']), float(request.query_params['latitude'])],
+            }))
+        except KeyError:
+            return Response({'details': _('longitude and latitude are required')}, status=400)
+        except ValueError as error:
+            return Response({'details': _('Invalid position: {}').format(error)}, status=400)
+
+        try:
+            k = int(request.query_params.get('k', settings.DRONE_NEAREST_DEFAULT_RESULTS))
+        except ValueError:
+            k = 0
+        if not 0 < k <= settings.DRONE_NEAREST_MAX_RESULTS:
+            return Response({'details': _('k must be between 1 and {}').format(settings.DRONE_NEAREST_MAX_RESULTS)},
+                            status=400)
+
+        drones = Drone.objects.available_for_loading().nearest(point).with_remaining_capacity()
+        if 'min_capacity' in request.query_params:
+            try:
+                drones = drones.filter(remaining_capacity__gte=float(request.query_params['min_capacity']))
+            except ValueError:
+                return Response({'details': _('Invalid min_capacity value')}, status=400)
+
+        serializer = DroneNearestSerializer(embed=True, many=True)
+        return Response(serializer.to_representation(drones[:k]))
+
+
+    @extend_schema(
+        methods=['post'],
+        responses={
+            200: DroneFeasibilityResultSerializer(),
+            400: ErrorSerializer()
+        },
+        request=DroneFeasibilitySerializer(many=False),
+        description="API endpoint allowing to rank the drones and destinations pairs that can be flown with the battery of the drones.")
+    @action(detail=False, methods=['post'])
+    def feasibility(self, request, pk=None):
+        """
+        Evaluates every pair of a candidate drone and a destination and returns the feasible pairs ranked by battery margin.
+        # A pair is feasible when the drone can carry its current load plus the weight of the destination there and back
+        * The battery used is estimated from the distance, the model of the drone and the payload weight
+        * The margin is the battery left above the reserve at the return
+        * The candidates are the drones available for loading, or the given drones, that have a position
+        * The pairs are evaluated with vectorized NumPy operations
+        """
+
+        serializer = DroneFeasibilitySerializer(data=request.data, many=False)
+        if not serializer.is_valid():
+            return Response({'details': _('Invalid payload')}, status=400)
+        data = serializer.validated_data
+
+        drones = Drone.objects.filter(pk__in=data['drones']) if 'drones' in data else Drone.objects.available_for_loading()
+        destinations = [(destination['position'].x, destination['position'].y, destination['weight'])
+                        for destination in data['destinations']]
+        ranking = rank_pairs(Fleet.from_queryset(drones), destinations, limit=data['limit'])
 
-        return Response(DroneSerializer(embed=True, many=True).to_representation(drones))
\ No newline at end of file
+        pairs = [
+            {'drone': drone, 'destination': destination, 'distance': round(distance * 1000, 1),
+             'energy': round(energy, 3), 'margin': round(margin, 3)}
+            for drone, destination, distance, energy, margin in zip(
+                ranking['drones'].tolist(), ranking['destinations'].tolist(), ranking['distances'].tolist(),
+                ranking['energy'].tolist(), ranking['margins'].tolist())
+        ]
+        return Response(DroneFeasibilityResultSerializer(
+            {'evaluated': ranking['evaluated'], 'feasible': ranking['feasible'], 'pairs': pairs}).data)
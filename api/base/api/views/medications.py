@@ -3,18 +3,28 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
 
 from drf_spectacular.utils import extend_schema
 
 from dynamic_rest.viewsets import DynamicModelViewSet
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
 from dynamic_rest.filters import DynamicFilterBackend, DynamicSortingFilter
 
 
+from base.cache import count, get_medications_response_key, get_medications_version
 from base.models import Medication
+from base.api.conditional import conditional
 from base.api.serializers.medications import MedicationSerializer
+from base.api.pagination import DynamicKeysetPagination
+from base.api.serializers.values import MedicationValuesSerializer
+from base.api.views.mixins import ValuesReadMixin
 
 
-class MedicationViewSet(DynamicModelViewSet):
+class MedicationViewSet(ValuesReadMixin, DynamicModelViewSet):
     """
     API endpoint that allows medications to be viewed and edited.
     """
@@ -26,9 +36,15 @@ class MedicationViewSet(DynamicModelViewSet):
         DynamicFilterBackend, DynamicSortingFilter,
     ]
 
+    pagination_class = DynamicKeysetPagination
+
+    # images are uploaded as multipart/form-data
+    parser_classes = [JSONParser, MultiPartParser]
+
     model = Medication
     queryset = Medication.objects.all()
     serializer_class = MedicationSerializer
+    values_serializer_class = MedicationValuesSerializer
 
     def get_queryset(self):
         """
@@ -36,4 +52,40 @@ class MedicationViewSet(DynamicModelViewSet):
         """
         queryset = Medication.objects.all()
 
-        return queryset.order_by("name")
\ No newline at end of file
+        return queryset.order_by("name")
+
+    def get_resource_version(self):
+        """
+        Version of the medications for conditional requests: the catalogue version started once
+        the last write committed, its number and last update
+        """
+        # read before the rows, a write committed after them starts a new version
+        version = get_medications_version()
+        medications = Medication.objects.aggregate(count=Count('pk'), updated=Max('updated'))
+        return (version, medications['count'], medications['updated']), medications['updated']
+
+    def get_cached_response(self, request, build_response):
+        """
+        Returns the cached response of the request url, on a miss the response is built
+        and cached if it succeeded. Saving or deleting a medication invalidates the responses.
+        """
+
+        key = get_medications_response_key(request.build_absolute_uri())
+        data = cache.get(key)
+        if data is not None:
+            count('medications_response', 'hits')
+            return Response(data)
+
+        count('medications_response', 'misses')
+        response = build_response()
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.MEDICATION_RESPONSE_CACHE_TTL)
+        return response
+
+    @conditional
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, lambda: super(MedicationViewSet, self).list(request, *args, **kwargs))
+
+    @conditional
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request, lambda: super(MedicationViewSet, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,44 @@
+from django.http import Http404
+
+from rest_framework.response import Response
+
+
+class ValuesReadMixin:
+    """
+    Serves list and retrieve from a .values() queryset serialized by values_serializer_class,
+    skipping the per field work of the dynamic serializers. Filters, sorting and pagination
+    are applied as usual. Requests that change the fields of the response with include[] or
+    exclude[] go through the dynamic serializer.
+    """
+
+    values_serializer_class = None
+
+    def use_values(self):
+        return self.values_serializer_class is not None and not self.get_request_fields()
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class(request)
+        rows = serializer.get_values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response({serializer.plural_name: serializer.to_representation_many(page)})
+
+        return Response({serializer.plural_name: serializer.to_representation_many(rows)})
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_values():
+            return super().retrieve(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class(request)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = serializer.get_values(
+            self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        ).first()
+        if row is None:
+            raise Http404
+
+        return Response({serializer.name: serializer.to_representation(row)})
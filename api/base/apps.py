@@ -5,3 +5,10 @@ class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
     verbose_name = 'Drones Managment'
+
+    def ready(self):
+        import base.signals  # noqa
+
+        from django.core.signals import request_started
+        from base.db import check_connections
+        request_started.connect(check_connections, dispatch_uid='check_database_connections')
@@ -0,0 +1,47 @@
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+@database_sync_to_async
+def get_token_user(token):
+    """
+    Returns the active user of a JWT access token or an anonymous user if the token is not valid
+    """
+
+    try:
+        user_id = AccessToken(token)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return AnonymousUser()
+    return get_user_model().objects.filter(
+        **{api_settings.USER_ID_FIELD: user_id}, is_active=True).first() or AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates websocket connections with a JWT access token on the token query parameter,
+    browsers cannot set the Authorization header of a websocket
+    """
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        if token:
+            scope = dict(scope, user=await get_token_user(token[0]))
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    """
+    Session authentication, overridden by the JWT token when the connection has one
+    """
+
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
@@ -0,0 +1,85 @@
+"""
+Performance benchmarks for the drones API.
+Each benchmark module exposes a ``run(sizes, **options)`` function returning one result
+row (a dict) for each size. Benchmarks run inside a transaction that is rolled back at
+the end, so they can be executed against a development database without leaving data.
+"""
+
+from contextlib import contextmanager
+from datetime import timedelta
+from random import Random
+
+from django.db import transaction
+
+from base.models import Drone, DroneStatusLog, Medication
+from base.seeding import generate_status_logs, insert_rows
+
+
+@contextmanager
+def rolled_back():
+    """
+    Runs the block inside a transaction that is always rolled back
+    """
+
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def seed_drones(count, seed=0, prefix='BENCH', **fields):
+    """
+    Inserts ``count`` idle drones with random models, weight limits and batteries using bulk inserts,
+    any other field value can be fixed with keyword arguments
+    """
+
+    rand = Random(seed)
+    models = [choice[0] for choice in Drone.MODEL_CHOICES]
+    drones = [
+        Drone(**{
+            'serial_number': '{}-{:08d}'.format(prefix, i),
+            'model': rand.choice(models),
+            'weight_limit': rand.choice([100, 200, 300, 400, 500]),
+            'battery_capacity': rand.randint(0, 100),
+            **fields,
+        })
+        for i in range(count)
+    ]
+    return Drone.objects.bulk_create(drones, batch_size=5000)
+
+
+def seed_medications(count, seed=0, prefix='BENCH'):
+    """
+    Inserts ``count`` medications with random weights using bulk inserts
+    """
+
+    rand = Random(seed)
+    Medication.objects.bulk_create([
+        Medication(
+            name='{} medication {:06d}'.format(prefix, i),
+            code='{}-{:06d}'.format(prefix, i),
+            weight=rand.randint(1, 100),
+        )
+        for i in range(count)
+    ], batch_size=5000)
+    return list(Medication.objects.filter(code__startswith='{}-'.format(prefix)))
+
+
+def seed_status_logs(drone_ids, per_drone, seed=0, end=None, interval=timedelta(minutes=1)):
+    """
+    Inserts ``per_drone`` status logs for each drone id, one every interval until end (now by default),
+    and returns the number of logs
+    """
+
+    return insert_rows(DroneStatusLog, ('drone_rel', 'current_battery', 'created', 'updated'),
+                       generate_status_logs(drone_ids, per_drone, seed, end, interval))
+
+
+def get_benchmarks():
+    from base.benchmarks import battery_task, dispatch, feasibility, serializers
+
+    return {
+        'battery_task': battery_task,
+        'dispatch': dispatch,
+        'feasibility': feasibility,
+        'serializers': serializers,
+    }
@@ -0,0 +1,32 @@
+"""
+Measures how the runtime of the battery check task grows with the fleet size.
+"""
+
+from time import perf_counter
+
+from base.benchmarks import rolled_back, seed_drones
+from base.models import DroneStatusLog
+from base.tasks import check_drone_battery_task
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+
+
+def run(sizes=None, chunk_size=None, **options):
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        with rolled_back():
+            seed_drones(size)
+
+            start = perf_counter()
+            check_drone_battery_task(chunk_size=chunk_size)
+            elapsed = perf_counter() - start
+
+            logged = DroneStatusLog.objects.count()
+
+        results.append({
+            'drones': size,
+            'logged': logged,
+            'seconds': round(elapsed, 4),
+            'drones_per_second': round(size / elapsed) if elapsed else None,
+        })
+    return results
@@ -0,0 +1,47 @@
+"""
+Measures the orders dispatch: the packing heuristic alone and the whole dispatch with its bulk writes.
+Each size is used as the number of orders and the number of drones.
+"""
+
+from random import Random
+from time import perf_counter
+
+from base.benchmarks import rolled_back, seed_drones, seed_medications
+from base.dispatch import dispatch_orders, pack_orders
+
+DEFAULT_SIZES = [1000, 5000, 10000]
+
+
+def run(sizes=None, **options):
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        rand = Random(size)
+        with rolled_back():
+            seed_drones(size, state='IDLE', battery_capacity=100)
+            medications = seed_medications(100)
+            orders = [
+                {'medication': rand.choice(medications).pk, 'quantity': rand.randint(1, 5)}
+                for _ in range(size)
+            ]
+            weights = {medication.pk: medication.weight for medication in medications}
+
+            start = perf_counter()
+            pack_orders(
+                [(index, weights[order['medication']] * order['quantity']) for index, order in enumerate(orders)],
+                [(index, 500) for index in range(size)],
+            )
+            pack_elapsed = perf_counter() - start
+
+            start = perf_counter()
+            result = dispatch_orders(orders)
+            dispatch_elapsed = perf_counter() - start
+
+        results.append({
+            'orders': size,
+            'drones': size,
+            'used_drones': len(result['assignments']),
+            'unassigned': len(result['unassigned']),
+            'pack_seconds': round(pack_elapsed, 4),
+            'dispatch_seconds': round(dispatch_elapsed, 4),
+        })
+    return results
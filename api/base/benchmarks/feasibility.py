@@ -0,0 +1,57 @@
+"""
+Measures the route feasibility engine: every pair of a fleet of drones and 100 destinations is
+evaluated and the feasible pairs are ranked. The fleet is generated in memory, each size is the
+number of drones. The engine should evaluate at least 100k pairs per second.
+"""
+
+from time import perf_counter
+
+import numpy as np
+
+from base.feasibility import MODELS, Fleet, rank_pairs
+from base.seeding import AREA
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+DESTINATIONS = 100
+TARGET_PAIRS_PER_SECOND = 100000
+
+
+def generate_fleet(size, seed=0):
+    rand = np.random.default_rng(seed)
+    return Fleet(
+        np.arange(1, size + 1),
+        rand.integers(0, len(MODELS), size),
+        rand.integers(0, 101, size),
+        rand.choice([100, 200, 300, 400, 500], size),
+        rand.integers(0, 100, size),
+        rand.uniform(AREA[0], AREA[2], size),
+        rand.uniform(AREA[1], AREA[3], size),
+    )
+
+
+def run(sizes=None, **options):
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        fleet = generate_fleet(size, seed=size)
+        rand = np.random.default_rng(size + 1)
+        destinations = np.column_stack([
+            rand.uniform(AREA[0], AREA[2], DESTINATIONS),
+            rand.uniform(AREA[1], AREA[3], DESTINATIONS),
+            rand.integers(0, 200, DESTINATIONS),
+        ])
+
+        start = perf_counter()
+        ranking = rank_pairs(fleet, destinations, limit=100)
+        elapsed = perf_counter() - start
+
+        pairs_per_second = round(ranking['evaluated'] / elapsed) if elapsed else None
+        results.append({
+            'drones': size,
+            'destinations': DESTINATIONS,
+            'pairs': ranking['evaluated'],
+            'feasible': ranking['feasible'],
+            'seconds': round(elapsed, 4),
+            'pairs_per_second': pairs_per_second,
+            'target_met': pairs_per_second is None or pairs_per_second >= TARGET_PAIRS_PER_SECOND,
+        })
+    return results
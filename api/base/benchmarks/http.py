@@ -0,0 +1,115 @@
+"""
+HTTP load driver measuring the throughput and latency of running servers.
+Each worker thread keeps a persistent connection and sends its share of the requests,
+cycling through the paths, so the results compare servers and endpoints under the same
+concurrency. Unlike the other benchmarks it does not touch the database directly.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPSConnection, RemoteDisconnected
+from itertools import cycle
+from time import perf_counter
+from urllib.parse import urlsplit
+import json
+
+
+def percentile(values, fraction):
+    """
+    Returns the value under which the fraction of the sorted values are
+    """
+
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def get_token(base_url, username, password):
+    """
+    Returns a JWT access token of the API
+    """
+
+    connection = _connect(base_url)
+    connection.request('POST', '/api/token/', json.dumps({'username': username, 'password': password}),
+                       {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise ValueError('Could not get a token: {} {}'.format(response.status, body[:200]))
+    return json.loads(body)['access']
+
+
+def _connect(url):
+    url = urlsplit(url)
+    connection_class = HTTPSConnection if url.scheme == 'https' else HTTPConnection
+    return connection_class(url.hostname, url.port, timeout=60)
+
+
+def _send(connection, method, path, body, headers):
+    connection.request(method, path, body, headers)
+    response = connection.getresponse()
+    response.read()
+    if response.getheader('Connection', '').lower() == 'close':
+        connection.close()
+    return response.status
+
+
+def _worker(base_url, method, paths, body, count, headers):
+    latencies = []
+    statuses = {}
+    connection = _connect(base_url)
+    for _, path in zip(range(count), cycle(paths)):
+        start = perf_counter()
+        try:
+            status = _send(connection, method, path, body, headers)
+        except RemoteDisconnected:
+            # the server closed the connection after the last response, it is sent again on a new one
+            connection.close()
+            try:
+                status = _send(connection, method, path, body, headers)
+            except (OSError, ValueError):
+                connection.close()
+                status = 'error'
+        except (OSError, ValueError):
+            connection.close()
+            status = 'error'
+        latencies.append(perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    connection.close()
+    return latencies, statuses
+
+
+def load_test(base_url, paths, requests=1000, concurrency=10, headers=None, method='GET', data=None):
+    """
+    Sends requests requests to the paths of a server from concurrency connections and returns
+    the throughput, the latency percentiles in milliseconds and the statuses.
+    data is sent as the JSON body of every request.
+    """
+
+    headers = dict(headers or {})
+    body = None
+    if data is not None:
+        body = json.dumps(data)
+        headers['Content-Type'] = 'application/json'
+
+    shares = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda count: _worker(base_url, method, paths, body, count, headers), shares))
+    elapsed = perf_counter() - start
+
+    latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+    statuses = {}
+    for _, worker_statuses in results:
+        for status, count in worker_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'statuses': ' '.join('{}:{}'.format(status, count) for status, count in sorted(statuses.items(), key=str)),
+    }
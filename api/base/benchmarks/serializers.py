@@ -0,0 +1,48 @@
+"""
+Compares the rows per second of the dynamic serializers with the .values() serializers
+of the fast read path on the drones list (with its current load) and the medications list.
+"""
+
+from time import perf_counter
+
+from base.api.serializers.drones import DroneSerializer
+from base.api.serializers.medications import MedicationSerializer
+from base.api.serializers.values import DroneValuesSerializer, MedicationValuesSerializer
+from base.benchmarks import rolled_back, seed_drones, seed_medications
+from base.models import Drone, Medication
+
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def _measure(serialize):
+    start = perf_counter()
+    rows = serialize()
+    return len(rows), perf_counter() - start
+
+
+def run(sizes=None, **options):
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        with rolled_back():
+            seed_drones(size)
+            seed_medications(size)
+            drones = Drone.objects.with_current_load().order_by('serial_number')
+            medications = Medication.objects.order_by('name')
+
+            cases = [
+                ('drones', drones, DroneSerializer, DroneValuesSerializer),
+                ('medications', medications, MedicationSerializer, MedicationValuesSerializer),
+            ]
+            for name, queryset, serializer_class, values_serializer_class in cases:
+                rows, dynamic_elapsed = _measure(
+                    lambda: serializer_class(embed=True, many=True).to_representation(queryset.all()))
+                _, values_elapsed = _measure(lambda: values_serializer_class().serialize(queryset.all()))
+
+                results.append({
+                    'resource': name,
+                    'rows': rows,
+                    'dynamic_rows_per_second': round(rows / dynamic_elapsed) if dynamic_elapsed else None,
+                    'values_rows_per_second': round(rows / values_elapsed) if values_elapsed else None,
+                    'speedup': round(dynamic_elapsed / values_elapsed, 1) if values_elapsed else None,
+                })
+    return results
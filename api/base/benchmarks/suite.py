@@ -0,0 +1,173 @@
+"""
+Benchmark suite of the main endpoints of a running server and of the battery task.
+The suite seeds a fleet (drones, medications and their status history) that is committed, so the
+server sees it, drives each endpoint with concurrent clients and counts the queries of one request
+of each endpoint in process. The report is a JSON document, comparing it with the report of a
+previous release shows the endpoints that got slower or run more queries.
+"""
+
+from time import perf_counter
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from base.benchmarks import rolled_back, seed_drones, seed_medications, seed_status_logs
+from base.benchmarks.http import load_test
+from base.cache import invalidate_drones, invalidate_medications
+from base.models import Drone, DroneStatusLog, Medication
+from base.seeding import delete_fleet
+from base.tasks import check_drone_battery_task
+
+PREFIX = 'SUITE'
+
+
+def get_drones(prefix=PREFIX):
+    return Drone.objects.filter(serial_number__startswith='{}-'.format(prefix))
+
+
+def get_medications(prefix=PREFIX):
+    return Medication.objects.filter(code__startswith='{}-'.format(prefix))
+
+
+def cleanup(prefix=PREFIX):
+    """
+    Deletes the fleet of the suite
+    """
+
+    invalidate_medications(delete_fleet(prefix))
+    invalidate_drones()
+
+
+def seed(drones=10000, medications=1000, status_logs=100, prefix=PREFIX):
+    """
+    Replaces the fleet of the suite, status_logs are the logs of each drone, and returns
+    the number of rows inserted and the rows per second
+    """
+
+    cleanup(prefix)
+    start = perf_counter()
+    with transaction.atomic():
+        seed_drones(drones, prefix=prefix)
+        seeded_medications = seed_medications(medications, prefix=prefix)
+        logs = seed_status_logs(list(get_drones(prefix).values_list('pk', flat=True)), status_logs)
+    elapsed = perf_counter() - start
+    invalidate_medications([medication.pk for medication in seeded_medications])
+    invalidate_drones()
+
+    rows = drones + medications + logs
+    return {
+        'drones': drones,
+        'medications': medications,
+        'status_logs': logs,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed) if elapsed else None,
+    }
+
+
+def get_scenarios(prefix=PREFIX, paths=1000):
+    """
+    Returns the requests of each endpoint: name, method, paths and JSON data.
+    Loads are added to different idle drones, one unit of the lightest medication each time.
+    """
+
+    drones = list(get_drones(prefix).order_by('pk').values_list('pk', flat=True)[:paths])
+    idle_drones = list(get_drones(prefix).filter(state='IDLE', battery_capacity__gte=Drone.MIN_FLIGHT_BATTERY)
+                       .order_by('pk').values_list('pk', flat=True)[:paths])
+    medication = get_medications(prefix).order_by('weight').first()
+    if not drones or not idle_drones or medication is None:
+        raise ValueError('The suite fleet is not seeded')
+
+    return [
+        ('drones-list', 'GET', ['/drones/'], None),
+        ('available_for_loading', 'GET', ['/drones/available_for_loading/'], None),
+        ('current_load_weight', 'GET', ['/drones/{}/current_load_weight/'.format(pk) for pk in drones], None),
+        ('load_addition', 'PATCH', ['/drones/{}/load_addition/'.format(pk) for pk in idle_drones],
+         {'medication': medication.pk, 'quantity': 1}),
+    ]
+
+
+def count_queries(user, method, path, data=None):
+    """
+    Returns the queries of a request served in process, its changes are rolled back
+    """
+
+    client = APIClient()
+    client.force_authenticate(user)
+    with rolled_back(), CaptureQueriesContext(connection) as context:
+        getattr(client, method.lower())(path, data, format='json')
+    return len(context)
+
+
+def measure_battery_task(chunk_size=None):
+    """
+    Runs the battery task on the whole database and rolls its logs back
+    """
+
+    drones = Drone.objects.count()
+    with rolled_back(), CaptureQueriesContext(connection) as context:
+        start = perf_counter()
+        check_drone_battery_task(chunk_size=chunk_size)
+        elapsed = perf_counter() - start
+    return {
+        'drones': drones,
+        'seconds': round(elapsed, 4),
+        'drones_per_second': round(drones / elapsed) if elapsed else None,
+        'queries': len(context),
+    }
+
+
+def run_suite(base_url, user, headers, requests=1000, concurrency=(1, 10), prefix=PREFIX, log=None):
+    """
+    Drives the endpoints of the server at base_url and the battery task and returns the report
+    """
+
+    report = {
+        'date': timezone.now().isoformat(),
+        'base_url': base_url,
+        'database': connection.vendor,
+        'drones': Drone.objects.count(),
+        'status_logs': DroneStatusLog.objects.count(),
+        'endpoints': [],
+    }
+    for name, method, paths, data in get_scenarios(prefix, paths=requests):
+        queries = count_queries(user, method, paths[0], data)
+        for clients in concurrency:
+            if log:
+                log('Loading {} with {} connections'.format(name, clients))
+            report['endpoints'].append({
+                'name': name,
+                'method': method,
+                'queries_per_request': queries,
+                **load_test(base_url, paths, requests, clients, headers, method=method, data=data),
+            })
+    if log:
+        log('Running the battery task')
+    report['battery_task'] = measure_battery_task()
+    return report
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    Returns the regressions of a report against the report of a previous run: endpoints with
+    less throughput or more p99 latency than the tolerance allows and more queries per request
+    """
+
+    regressions = []
+    previous = {(row['name'], row['concurrency']): row for row in baseline.get('endpoints', [])}
+    for row in report['endpoints']:
+        old = previous.get((row['name'], row['concurrency']))
+        if old is None:
+            continue
+        label = '{} with {} connections'.format(row['name'], row['concurrency'])
+        if row['requests_per_second'] < old['requests_per_second'] * (1 - tolerance):
+            regressions.append('{}: {} requests per second, {} before'.format(
+                label, row['requests_per_second'], old['requests_per_second']))
+        if row['p99_ms'] > old['p99_ms'] * (1 + tolerance):
+            regressions.append('{}: p99 {} ms, {} ms before'.format(label, row['p99_ms'], old['p99_ms']))
+        if row['queries_per_request'] > old['queries_per_request']:
+            regressions.append('{}: {} queries per request, {} before'.format(
+                label, row['queries_per_request'], old['queries_per_request']))
+    return regressions
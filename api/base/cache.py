@@ -0,0 +1,138 @@
+"""
+Read cache of the medication catalogue.
+Medications are cached by id under a version of each medication for the load endpoints, and the
+responses of the medications endpoints are cached by url under a version of the catalogue. Saving
+or deleting a medication starts new versions of the medication and of the catalogue, so what was
+cached before is not read anymore. Entries are only added, never replaced: a row read before a
+change and written after it stays under the old version. QuerySet.update() sends no signals, code
+updating medications with it must call invalidate_medications.
+The drones resources have a version too, started again once the transactions writing drones, flights
+or loads commit, so the ETags follow the committed data instead of the updated timestamps. Code
+writing them without signals must call invalidate_drones once it commits.
+"""
+
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from base.models import Medication
+
+MEDICATION_KEY = 'medication:{}:{}'
+MEDICATION_VERSION_KEY = 'medication:{}:version'
+MEDICATIONS_VERSION_KEY = 'medications:version'
+DRONES_VERSION_KEY = 'drones:version'
+MEDICATIONS_RESPONSE_KEY = 'medications:response:{}:{}'
+STATS_KEY = 'cache-stats:{}:{}'
+STATS = ('medication', 'medications_response')
+
+
+def count(name, result, amount=1):
+    """
+    Adds amount to the hits or misses counter of a cache
+    """
+
+    if not amount:
+        return
+    key = STATS_KEY.format(name, result)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
+
+
+def get_stats():
+    """
+    Returns the hits and misses of each cache
+    """
+
+    keys = {STATS_KEY.format(name, result): (name, result) for name in STATS for result in ('hits', 'misses')}
+    values = cache.get_many(list(keys))
+    stats = {name: {'hits': 0, 'misses': 0} for name in STATS}
+    for key, value in values.items():
+        name, result = keys[key]
+        stats[name][result] = value
+    return stats
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(name, result) for name in STATS for result in ('hits', 'misses')])
+
+
+def get_medication_versions(pks):
+    """
+    Returns the current cache version of each medication id, starting the missing ones
+    """
+
+    keys = {MEDICATION_VERSION_KEY.format(pk): pk for pk in pks}
+    versions = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid4().hex, timeout=None)
+        # another request may have started the version first
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_medications(pks):
+    """
+    Returns a dict of the medications with the given ids, like Medication.objects.in_bulk,
+    reading the cached ones and fetching the rest with one query
+    """
+
+    keys = {MEDICATION_KEY.format(pk, version): pk for pk, version in get_medication_versions(pks).items()}
+    medications = {keys[key]: medication for key, medication in cache.get_many(list(keys)).items()}
+    missing = [pk for pk in keys.values() if pk not in medications]
+    count('medication', 'hits', len(medications))
+    count('medication', 'misses', len(missing))
+
+    if missing:
+        fetched = Medication.objects.in_bulk(missing)
+        for key, pk in keys.items():
+            if pk in fetched:
+                cache.add(key, fetched[pk], timeout=settings.MEDICATION_CACHE_TTL)
+        medications.update(fetched)
+    return medications
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_medications_version():
+    return _get_version(MEDICATIONS_VERSION_KEY)
+
+
+def get_drones_version():
+    return _get_version(DRONES_VERSION_KEY)
+
+
+def get_medications_response_key(url):
+    """
+    Returns the cache key of the response of a medications endpoint url on the current catalogue version
+    """
+
+    return MEDICATIONS_RESPONSE_KEY.format(get_medications_version(), md5(url.encode()).hexdigest())
+
+
+def invalidate_medications(pks):
+    """
+    Starts new versions of the medications and of the cached responses
+    """
+
+    cache.set_many({MEDICATION_VERSION_KEY.format(pk): uuid4().hex for pk in pks}, timeout=None)
+    cache.set(MEDICATIONS_VERSION_KEY, uuid4().hex, timeout=None)
+
+
+def invalidate_drones():
+    """
+    Starts a new version of the drones resources
+    """
+
+    cache.set(DRONES_VERSION_KEY, uuid4().hex, timeout=None)
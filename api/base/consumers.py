@@ -0,0 +1,42 @@
+from urllib.parse import parse_qs
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from base.events import DRONES_GROUP
+
+
+class DroneEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes the state and battery changes of the drones to an authenticated client.
+    The drones query parameter (comma separated ids) limits the events to some drones.
+    Each message has a list of events:
+    {"events": [{"event": "state", "drone": 1, "state": "LOADING", "battery_capacity": 80}]}
+    """
+
+    groups = [DRONES_GROUP]
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        drones = parse_qs(self.scope.get('query_string', b'').decode()).get('drones')
+        try:
+            self.drones = {int(pk) for pk in drones[0].split(',') if pk} if drones else None
+        except ValueError:
+            await self.close(code=4400)
+            return
+
+        await self.accept()
+
+    async def receive_json(self, content, **kwargs):
+        # the stream is one way, messages of the client are ignored
+        pass
+
+    async def drone_events(self, message):
+        events = message['events']
+        if self.drones is not None:
+            events = [event for event in events if event['drone'] in self.drones]
+        if events:
+            await self.send_json({'events': events})
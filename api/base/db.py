@@ -0,0 +1,21 @@
+"""
+Health checks of the persistent database connections.
+With CONN_MAX_AGE a connection is reused by the next requests of the same worker thread, if the
+database restarted or closed it meanwhile the next request fails on its first query. Django 3.2
+only closes connections that already failed, so connections of a database with the
+CONN_HEALTH_CHECKS option are checked before each request and closed when they are not usable,
+the request opens a new one.
+"""
+
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    """
+    Closes the reused connections that are not usable anymore
+    """
+
+    for connection in connections.all():
+        if (connection.connection is not None and not connection.in_atomic_block
+                and connection.settings_dict.get('CONN_HEALTH_CHECKS') and not connection.is_usable()):
+            connection.close()
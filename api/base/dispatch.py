@@ -0,0 +1,169 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import FloatField, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from base.cache import get_medications, invalidate_drones
+from base.events import publish_drone_events, state_event
+from base.feasibility import Fleet, max_payloads
+from base.loading import WEIGHT_TOLERANCE, LoadError, is_full
+from base.models import Drone, Flight, Load
+
+
+def pack_orders(orders, drones):
+    """
+    Assigns orders to drones with the best-fit decreasing heuristic: orders are taken from the
+    heaviest to the lightest and each one goes to the drone with the smallest remaining capacity
+    that can still carry it. The drones are kept in a list sorted by remaining capacity, so the drone
+    of each order is found with a binary search, but removing it and inserting it back shift the list:
+    packing n orders on m drones is O(n log m) comparisons but O(n m) moves in the worst case. The
+    moves are memmoves of pointers, cheap next to the queries of a dispatch for fleets of thousands of drones.
+    orders: list of (order key, weight)
+    drones: list of (drone key, remaining capacity)
+    Returns a dict order key -> drone key and the list of order keys that fit on no drone.
+    """
+
+    capacities = sorted((remaining, key) for key, remaining in drones if remaining > WEIGHT_TOLERANCE)
+    assignments = {}
+    unassigned = []
+
+    for order_key, weight in sorted(orders, key=lambda order: order[1], reverse=True):
+        # the capacities are float differences, an order fits within the tolerance of add_loads
+        index = bisect_left(capacities, (weight - WEIGHT_TOLERANCE,))
+        if index == len(capacities):
+            unassigned.append(order_key)
+            continue
+
+        remaining, drone_key = capacities.pop(index)
+        assignments[order_key] = drone_key
+        remaining = max(remaining - weight, 0)
+        if remaining > WEIGHT_TOLERANCE:
+            insort(capacities, (remaining, drone_key))
+
+    return assignments, unassigned
+
+
+def dispatch_orders(orders, destination=None):
+    """
+    Packs a list of medication orders ({medication, quantity}) on the drones available for loading
+    and writes the resulting loads with bulk operations in one transaction.
+    Drones locked by other requests are skipped. Orders are not split between drones.
+    With a destination (point) only the drones with a position are used and each one is loaded
+    with at most the payload it can take there and back with its battery.
+    Returns a dict with the loads assigned to each drone and the orders that fit on no drone.
+    Raises LoadError if any medication does not exists.
+    """
+
+    medications = get_medications({order['medication'] for order in orders})
+    if len(medications) != len({order['medication'] for order in orders}):
+        raise LoadError(_('Medication does not exists on database'))
+
+    with transaction.atomic():
+        candidates = Drone.objects.available_for_loading()
+        if destination is not None:
+            candidates = candidates.filter(position__isnull=False)
+        locked = list(candidates.select_for_update(skip_locked=True).order_by().values_list(
+            'pk', 'state', 'weight_limit', 'battery_capacity', 'model', 'position'))
+        # the load of the drones is read once they are locked, a subquery of the locking statement reads
+        # its snapshot and misses the loads committed before each drone was locked
+        current_loads = dict(Flight.objects.filter(
+            drone_rel__in=[row[0] for row in locked], was_delivered=False
+        ).values_list('drone_rel', 'current_load_weight'))
+        drones = {
+            pk: (state, weight_limit, current_loads.get(pk, 0), battery_capacity, model, position)
+            for pk, state, weight_limit, battery_capacity, model, position in locked
+        }
+
+        capacities = {pk: drone[1] - drone[2] for pk, drone in drones.items()}
+        if destination is not None and drones:
+            # the drones can only take the payload they can fly to the destination and back
+            fleet = Fleet.from_rows(
+                (pk, drone[4], drone[3], drone[1], drone[2], drone[5]) for pk, drone in drones.items())
+            for pk, payload in zip(fleet.pks.tolist(), max_payloads(fleet, destination.x, destination.y).tolist()):
+                capacities[pk] = min(capacities[pk], payload - drones[pk][2])
+
+        assignments, unassigned = pack_orders(
+            [(index, medications[order['medication']].weight * order['quantity']) for index, order in enumerate(orders)],
+            list(capacities.items()),
+        )
+
+        quantities = defaultdict(lambda: defaultdict(int))
+        for index, drone_pk in assignments.items():
+            quantities[drone_pk][orders[index]['medication']] += orders[index]['quantity']
+
+        _write_assignments(drones, medications, quantities)
+
+    return {
+        'assignments': [
+            {
+                'drone': drone_pk,
+                'loads': [{'medication': pk, 'quantity': quantity} for pk, quantity in loads.items()],
+            }
+            for drone_pk, loads in quantities.items()
+        ],
+        'unassigned': [orders[index] for index in sorted(unassigned)],
+    }
+
+
+def _write_assignments(drones, medications, quantities):
+    """
+    Writes the loads assigned to each drone with a fixed number of queries, creating the flights
+    of idle drones with its load weight and recomputing the load weight of the loading ones
+    """
+
+    added_weights = {
+        drone_pk: sum(medications[pk].weight * quantity for pk, quantity in loads.items())
+        for drone_pk, loads in quantities.items()
+    }
+    loading = [pk for pk in quantities if drones[pk][0] == 'LOADING']
+    # update() does not set the auto_now fields
+    now = timezone.now()
+
+    Flight.objects.bulk_create([
+        Flight(drone_rel_id=pk, current_load_weight=added_weights[pk])
+        for pk in quantities if drones[pk][0] == 'IDLE'
+    ], batch_size=1000)
+    flights = dict(Flight.objects.filter(
+        drone_rel__in=list(quantities), was_delivered=False
+    ).values_list('drone_rel', 'pk'))
+
+    old_loads = {
+        (load.flight_rel_id, load.medication_rel_id): load
+        for load in Load.objects.filter(flight_rel__in=[flights[pk] for pk in loading])
+    }
+
+    new_loads = []
+    updated_loads = []
+    for drone_pk, loads in quantities.items():
+        for medication_pk, quantity in loads.items():
+            load = old_loads.get((flights[drone_pk], medication_pk))
+            if load is None:
+                new_loads.append(Load(flight_rel_id=flights[drone_pk], medication_rel_id=medication_pk, quantity=quantity))
+            else:
+                load.quantity += quantity
+                updated_loads.append(load)
+
+    Load.objects.bulk_create(new_loads, batch_size=1000)
+    Load.objects.bulk_update(updated_loads, ['quantity'], batch_size=1000)
+
+    if loading:
+        actual_load_weight = Flight.objects.with_actual_load_weight().filter(
+            pk=OuterRef('pk')).values('actual_load_weight')
+        Flight.objects.filter(pk__in=[flights[pk] for pk in loading]).update(
+            current_load_weight=Subquery(actual_load_weight, output_field=FloatField()), updated=now
+        )
+
+    loaded = [
+        pk for pk, added_weight in added_weights.items()
+        if is_full(drones[pk][2] + added_weight, drones[pk][1])
+    ]
+    Drone.objects.filter(pk__in=list(quantities)).exclude(pk__in=loaded).update(state='LOADING', updated=now)
+    Drone.objects.filter(pk__in=loaded).update(state='LOADED', updated=now)
+
+    # update() sends no signals, the drone state changes are published here
+    events = [state_event(pk, 'LOADED' if pk in loaded else 'LOADING', drones[pk][3]) for pk in quantities]
+    transaction.on_commit(lambda: publish_drone_events(events))
+    transaction.on_commit(invalidate_drones)
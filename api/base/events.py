@@ -0,0 +1,37 @@
+"""
+Real time events of the drones pushed to the clients connected to the drone events websocket.
+Events are sent to the drones group of the channel layer, on Redis this is a single publish
+whatever the number of connected clients, each server process fans it out to its clients.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+DRONES_GROUP = 'drones'
+
+
+def state_event(drone_id, state, battery_capacity):
+    return {'event': 'state', 'drone': drone_id, 'state': state, 'battery_capacity': battery_capacity}
+
+
+def battery_event(drone_id, battery_capacity):
+    return {'event': 'battery', 'drone': drone_id, 'battery_capacity': battery_capacity}
+
+
+def publish_drone_events(events):
+    """
+    Sends a list of events to the connected clients with one message.
+    A channel layer failure is logged, the changes that produced the events are already saved.
+    """
+
+    if not events:
+        return
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            DRONES_GROUP, {'type': 'drone.events', 'events': events})
+    except Exception:
+        logger.exception('Could not publish {} drone events'.format(len(events)))
@@ -0,0 +1,181 @@
+"""
+Route feasibility of the drones, evaluated with NumPy on many (drone, destination) pairs at once.
+A flight goes from the position of the drone to the destination with its payload and comes back
+empty. The battery used is linear in the distance and the payload, with the rates of the model of
+the drone, and the battery left at the return must stay above DRONE_FLIGHT_RESERVE_BATTERY.
+The same model gives the largest payload a drone can take to a destination, used by dispatch.
+"""
+
+import numpy as np
+
+from django.conf import settings
+
+from base.models import Drone
+
+EARTH_RADIUS_KM = 6371.0088
+
+MODELS = [choice[0] for choice in Drone.MODEL_CHOICES]
+# battery percentage used per km flying empty and per km for each 100 units of payload weight,
+# heavier frames use more battery empty but carry the payload more efficiently
+CONSUMPTION = np.array([
+    (1.0, 0.8),   # Lightweight
+    (1.3, 0.6),   # Middleweight
+    (1.6, 0.45),  # Cruiserweight
+    (2.0, 0.35),  # Heavyweight
+])
+
+# pairs evaluated by each vectorized pass, bounds the memory of large cross products
+PAIRS_CHUNK_SIZE = 1000000
+
+
+class Fleet:
+    """
+    Arrays with the values of a set of drones used by the estimations, one item per drone
+    """
+
+    FIELDS = ('pk', 'model', 'battery_capacity', 'weight_limit', 'current_load', 'position')
+
+    def __init__(self, pks, models, batteries, weight_limits, loads, longitudes, latitudes):
+        self.pks = np.asarray(pks, dtype=np.int64)
+        self.models = np.asarray(models, dtype=np.int64)
+        self.batteries = np.asarray(batteries, dtype=np.float64)
+        self.weight_limits = np.asarray(weight_limits, dtype=np.float64)
+        self.loads = np.asarray(loads, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.pks)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """
+        Reads the drones of a queryset that have a position with one query, with the weight of their current load
+        """
+
+        return cls.from_rows(queryset.filter(position__isnull=False).with_current_load().order_by('pk').values_list(
+            *cls.FIELDS))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds the arrays of rows with the values of FIELDS, all the drones must have a position
+        """
+
+        rows = list(rows)
+        model_indexes = {model: index for index, model in enumerate(MODELS)}
+        return cls(
+            [row[0] for row in rows],
+            [model_indexes[row[1]] for row in rows],
+            [row[2] for row in rows],
+            [row[3] for row in rows],
+            [row[4] for row in rows],
+            [row[5].x for row in rows],
+            [row[5].y for row in rows],
+        )
+
+
+def distances_km(longitudes, latitudes, to_longitudes, to_latitudes):
+    """
+    Great circle distances in km between arrays of points (haversine formula)
+    """
+
+    longitudes, latitudes, to_longitudes, to_latitudes = map(
+        np.radians, (longitudes, latitudes, to_longitudes, to_latitudes))
+    a = (np.sin((to_latitudes - latitudes) / 2) ** 2 +
+         np.cos(latitudes) * np.cos(to_latitudes) * np.sin((to_longitudes - longitudes) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def estimate(models, batteries, payloads, distances, reserve=None):
+    """
+    Returns the battery used by round trips of the given distances (km) with the given payloads
+    and the battery margin left above the reserve, for arrays of drone models, batteries and payloads
+    """
+
+    reserve = settings.DRONE_FLIGHT_RESERVE_BATTERY if reserve is None else reserve
+    rates = CONSUMPTION[models]
+    energy = distances * (2 * rates[..., 0] + rates[..., 1] * payloads / 100)
+    return energy, batteries - reserve - energy
+
+
+def evaluate_pairs(fleet, destinations, drone_indexes, destination_indexes, reserve=None):
+    """
+    Evaluates the pairs given by the positions of their drones in the fleet and of their destinations in
+    destinations, an array of (longitude, latitude, payload weight) rows. The drone carries its current load
+    plus the payload of the destination. Returns the distances (km), battery used, margins and whether
+    each pair is feasible: the payload fits the weight limit and the margin is not negative.
+    """
+
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 3)
+    payloads = fleet.loads[drone_indexes] + destinations[destination_indexes, 2]
+    distances = distances_km(fleet.longitudes[drone_indexes], fleet.latitudes[drone_indexes],
+                             destinations[destination_indexes, 0], destinations[destination_indexes, 1])
+    energy, margins = estimate(fleet.models[drone_indexes], fleet.batteries[drone_indexes], payloads, distances,
+                               reserve)
+    feasible = (margins >= 0) & (payloads <= fleet.weight_limits[drone_indexes])
+    return distances, energy, margins, feasible
+
+
+def rank_pairs(fleet, destinations, limit=None, reserve=None):
+    """
+    Evaluates every pair of a drone of the fleet and a destination ((longitude, latitude, payload weight) rows)
+    and returns the feasible pairs ranked from the largest margin: a dict of arrays with the drone pks,
+    destination indexes, distances (km), battery used and margins, and the number of pairs evaluated
+    """
+
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 3)
+    drone_indexes = destination_indexes = np.empty(0, dtype=np.int64)
+    distances = energy = margins = np.empty(0)
+    feasible_count = 0
+    if len(fleet) and len(destinations):
+        drones_chunk = max(1, PAIRS_CHUNK_SIZE // len(destinations))
+        found = []
+        for start in range(0, len(fleet), drones_chunk):
+            chunk = np.arange(start, min(start + drones_chunk, len(fleet)))
+            pair_drones = np.repeat(chunk, len(destinations))
+            pair_destinations = np.tile(np.arange(len(destinations)), len(chunk))
+            pair_distances, pair_energy, pair_margins, feasible = evaluate_pairs(
+                fleet, destinations, pair_drones, pair_destinations, reserve)
+            feasible = np.flatnonzero(feasible)
+            feasible_count += len(feasible)
+            if limit is not None and limit < len(feasible):
+                # only the best pairs of each chunk are kept, in pair order so the ties keep ranking by drone
+                best = np.argpartition(-pair_margins[feasible], limit - 1)[:limit] if limit else np.empty(0, dtype=np.int64)
+                feasible = np.sort(feasible[best])
+            found.append((pair_drones[feasible], pair_destinations[feasible], pair_distances[feasible],
+                          pair_energy[feasible], pair_margins[feasible]))
+        drone_indexes, destination_indexes, distances, energy, margins = (
+            np.concatenate(arrays) for arrays in zip(*found))
+
+    if limit is not None and limit < len(margins):
+        # only the best of the chunk winners are sorted
+        best = np.argpartition(-margins, limit - 1)[:limit] if limit else np.empty(0, dtype=np.int64)
+        order = best[np.argsort(-margins[best], kind='stable')]
+    else:
+        order = np.argsort(-margins, kind='stable')
+    return {
+        'evaluated': len(fleet) * len(destinations),
+        'feasible': feasible_count,
+        'drones': fleet.pks[drone_indexes[order]],
+        'destinations': destination_indexes[order],
+        'distances': distances[order],
+        'energy': energy[order],
+        'margins': margins[order],
+    }
+
+
+def max_payloads(fleet, longitude, latitude, reserve=None):
+    """
+    Returns the largest payload, current load included, each drone of the fleet can take on a round trip
+    to a destination, limited by its weight limit. Drones that cannot fly there empty get a negative value.
+    """
+
+    reserve = settings.DRONE_FLIGHT_RESERVE_BATTERY if reserve is None else reserve
+    distances = distances_km(fleet.longitudes, fleet.latitudes, longitude, latitude)
+    rates = CONSUMPTION[fleet.models]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        by_battery = ((fleet.batteries - reserve) / distances - 2 * rates[:, 0]) * 100 / rates[:, 1]
+    # a drone already at the destination only needs its battery above the reserve
+    by_battery = np.where(distances > 0, by_battery, np.where(fleet.batteries >= reserve, np.inf, -np.inf))
+    return np.minimum(by_battery, fleet.weight_limits)
@@ -0,0 +1,56 @@
+"""
+Positions of the drones. Positions are PostGIS geographies (longitude and latitude on WGS 84)
+and are exchanged as GeoJSON points. The nearest drones are found with the KNN distance
+operator <->: ordering by it walks the GiST index of the positions from the nearest one, so
+the K nearest drones are read without computing the distance of every drone.
+"""
+
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import Point
+from django.db.models import FloatField, Func, Value
+from django.utils.translation import ugettext_lazy as _
+
+SRID = 4326
+
+
+def parse_position(value):
+    """
+    Returns the longitude and latitude of a GeoJSON point, raises ValueError when it is not valid
+    """
+
+    if not isinstance(value, dict) or value.get('type') != 'Point':
+        raise ValueError(_('Expected a GeoJSON point'))
+    coordinates = value.get('coordinates')
+    if not isinstance(coordinates, (list, tuple)) or len(coordinates) != 2 or not all(
+            isinstance(coordinate, (int, float)) and not isinstance(coordinate, bool) for coordinate in coordinates):
+        raise ValueError(_('Expected the longitude and latitude of the point'))
+    longitude, latitude = coordinates
+    if not -180 <= longitude <= 180 or not -90 <= latitude <= 90:
+        raise ValueError(_('Longitude must be between -180 and 180 and latitude between -90 and 90'))
+    return float(longitude), float(latitude)
+
+
+def to_point(coordinates):
+    """
+    Returns the point of a (longitude, latitude) pair, None for None
+    """
+
+    return Point(*coordinates, srid=SRID) if coordinates is not None else None
+
+
+def to_geojson(point):
+    return {'type': 'Point', 'coordinates': [point.x, point.y]} if point is not None else None
+
+
+class KNNDistance(Func):
+    """
+    Distance in meters between a geography column and a point, computed with the <-> operator.
+    Ordering by it is answered by the GiST index of the column (KNN search).
+    """
+
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = FloatField()
+
+    def __init__(self, expression, point, **extra):
+        super().__init__(expression, Value(point, output_field=PointField(geography=True, srid=SRID)), **extra)
@@ -0,0 +1,88 @@
+"""
+Battery history series of a drone, read from the status log and its rollups.
+"""
+
+from datetime import timedelta, timezone
+
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import Trunc
+
+from base.models import DroneBatteryRollup, DroneStatusLog
+from base.rollups import truncate
+
+BUCKETS = ['minute', 'hour', 'day']
+
+
+def choose_bucket(start, end, max_points):
+    """
+    Returns the smallest bucket that keeps the series of a time range under max_points
+    """
+
+    for bucket in BUCKETS:
+        if (end - start) / timedelta(**{bucket + 's': 1}) <= max_points:
+            return bucket
+    return BUCKETS[-1]
+
+
+def bucket_start(value, bucket):
+    """
+    Returns the start of the bucket of a datetime, in UTC
+    """
+
+    if bucket == 'minute':
+        return value.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    return truncate(value, bucket)
+
+
+def raw_points(drone_id, start, end, after=None, limit=1000):
+    """
+    Returns up to limit status logs of a drone between start and end ordered by (created, id),
+    after is the (created, id) of the last log of the previous page.
+    """
+
+    logs = DroneStatusLog.objects.filter(drone_rel_id=drone_id, created__gte=start, created__lt=end)
+    if after is not None:
+        logs = logs.filter(Q(created__gt=after[0]) | Q(created=after[0], pk__gt=after[1]))
+    return logs.order_by('created', 'pk').values_list('created', 'pk', 'current_battery')[:limit]
+
+
+def _aggregated_logs(drone_id, start, end, bucket):
+    return DroneStatusLog.objects.filter(
+        drone_rel_id=drone_id, created__gte=start, created__lt=end
+    ).annotate(
+        time=Trunc('created', bucket, tzinfo=timezone.utc)
+    ).order_by().values('time').annotate(
+        min=Min('current_battery'),
+        avg=Avg('current_battery'),
+        max=Max('current_battery'),
+        samples=Count('pk'),
+    ).order_by('time')
+
+
+def bucketed_points(drone_id, start, end, bucket):
+    """
+    Yields the battery min/avg/max of a drone for each bucket between start and end.
+    The first bucket starts at the start of the bucket of start, so it is complete whether it
+    is read from a rollup or aggregated. Hours and days already rolled up before the bucket of
+    end are read from the rollups, that are kept after the status logs are removed, the rest is
+    aggregated from the status log up to end.
+    """
+
+    start = bucket_start(start, bucket)
+    rolled_until = start
+    if bucket in ('hour', 'day'):
+        last = DroneBatteryRollup.objects.filter(
+            drone_rel_id=drone_id, period=bucket
+        ).aggregate(last=Max('period_start'))['last']
+        if last is not None:
+            # a rollup of the bucket of end would count the samples after end
+            rolled_until = min(max(start, last + timedelta(**{bucket + 's': 1})), bucket_start(end, bucket))
+
+        yield from DroneBatteryRollup.objects.filter(
+            drone_rel_id=drone_id, period=bucket, period_start__gte=start, period_start__lt=rolled_until
+        ).order_by('period_start').values_list(
+            'period_start', 'min_battery', 'avg_battery', 'max_battery', 'samples'
+        ).iterator()
+
+    for point in _aggregated_logs(drone_id, rolled_until, end, bucket).iterator():
+        yield point['time'], point['min'], point['avg'], point['max'], point['samples']
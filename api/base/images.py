@@ -0,0 +1,173 @@
+"""
+Derived images of the medications. The uploaded image is never resized by the requests: once a
+medication with a new image is saved, a Celery task makes a size bounded thumbnail (JPEG, or PNG
+when the image has transparency), the same thumbnail in WebP and a WebP version of the image bounded
+to MEDICATION_IMAGE_MAX_SIZE. The variants are saved next to the upload, under variants/, and their
+names are kept in Medication.image_variants with the name of the image they were made from, so the
+variants of a replaced image are never returned.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+from base.cache import invalidate_medications
+from base.models import Medication
+
+VARIANTS = ('thumbnail', 'thumbnail_webp', 'webp')
+
+PROCESSED = 'processed'
+SKIPPED = 'skipped'
+MISSING = 'missing'
+FAILED = 'failed'
+
+
+def get_storage():
+    return Medication._meta.get_field('image').storage
+
+
+def is_processed(image, variants):
+    """
+    Returns whether the variants were made from the image
+    """
+
+    return bool(image) and variants.get('source') == str(image)
+
+
+def get_variant_urls(image, variants, request=None):
+    """
+    Returns the urls of the variants of an image, absolute when there is a request like the urls of
+    image fields, or None while the variants of the image are not generated
+    """
+
+    if not is_processed(image, variants):
+        return None
+    storage = get_storage()
+    urls = {}
+    for variant in VARIANTS:
+        url = storage.url(variants[variant])
+        urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def encode(image, image_format):
+    output = BytesIO()
+    if image_format == 'PNG':
+        image.save(output, image_format, optimize=True)
+    else:
+        image.save(output, image_format, quality=settings.MEDICATION_IMAGE_QUALITY)
+    return output.getvalue()
+
+
+def render_variants(source):
+    """
+    Returns the content and extension of each variant of an image file
+    """
+
+    max_size = settings.MEDICATION_IMAGE_MAX_SIZE
+    thumbnail_size = settings.MEDICATION_THUMBNAIL_SIZE
+    with Image.open(source) as image:
+        # JPEG images are decoded at the smallest scale that is still larger than the largest variant
+        scale = max_size / max(image.size)
+        if scale < 1:
+            image.draft('RGB', (round(image.width * scale), round(image.height * scale)))
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    # the thumbnail is reduced from the bounded image instead of the upload
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+    return {
+        'thumbnail': (encode(thumbnail, 'PNG'), 'png') if transparent else (encode(thumbnail, 'JPEG'), 'jpg'),
+        'thumbnail_webp': (encode(thumbnail, 'WEBP'), 'webp'),
+        'webp': (encode(image, 'WEBP'), 'webp'),
+    }
+
+
+def delete_variants(variants):
+    storage = get_storage()
+    for variant in VARIANTS:
+        if variants.get(variant):
+            storage.delete(variants[variant])
+
+
+def process_medication_image(pk, force=False):
+    """
+    Generates the variants of the image of a medication, replacing the variants of a previous image.
+    Images with variants already generated are skipped unless force is set.
+    Returns PROCESSED, SKIPPED, MISSING when the medication has no image (or no medication) or FAILED
+    when the image cannot be read.
+    """
+
+    medication = Medication.objects.filter(pk=pk).only('image', 'image_variants').first()
+    if medication is None or not medication.image:
+        return MISSING
+    if not force and is_processed(medication.image.name, medication.image_variants):
+        return SKIPPED
+
+    name = medication.image.name
+    try:
+        with medication.image.open('rb') as source:
+            rendered = render_variants(source)
+    except FileNotFoundError:
+        return MISSING
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return FAILED
+
+    storage = get_storage()
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    variants = {'source': name}
+    for variant, (content, extension) in rendered.items():
+        variants[variant] = storage.save(
+            os.path.join(directory, 'variants', '{}.{}.{}'.format(stem, variant, extension)), ContentFile(content))
+
+    # the variants are only kept if the image was not replaced while they were generated
+    if not Medication.objects.filter(pk=pk, image=name).update(image_variants=variants, updated=timezone.now()):
+        delete_variants(variants)
+        return SKIPPED
+    delete_variants(medication.image_variants)
+    # update() sends no signals
+    invalidate_medications([pk])
+    return PROCESSED
+
+
+def get_unprocessed(force=False):
+    """
+    Returns the ids of the medications with an image without variants, or with an image when force is set
+    """
+
+    medications = Medication.objects.exclude(image__isnull=True).exclude(image='').order_by('pk').values_list(
+        'pk', 'image', 'image_variants')
+    return [pk for pk, image, variants in medications.iterator() if force or not is_processed(image, variants)]
+
+
+def process_medication_images(pks, workers=1, force=False):
+    """
+    Generates the variants of the images of many medications, on parallel worker processes when
+    workers is more than 1, and returns the number of images of each result
+    """
+
+    counts = dict.fromkeys((PROCESSED, SKIPPED, MISSING, FAILED), 0)
+    process = partial(process_medication_image, force=force)
+    if workers > 1 and len(pks) > 1:
+        # the workers are forked, they must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            for result in executor.map(process, pks, chunksize=max(1, min(100, len(pks) // (workers * 4)))):
+                counts[result] += 1
+    else:
+        for pk in pks:
+            counts[process(pk)] += 1
+    return counts
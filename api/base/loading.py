@@ -0,0 +1,90 @@
+from collections import defaultdict
+
+from django.utils.translation import ugettext_lazy as _
+
+from base.cache import get_medications
+from base.models import Drone, Flight, Load
+
+# load weights are sums of float weights, they are compared to the weight limit with this tolerance
+WEIGHT_TOLERANCE = 1e-9
+
+
+class LoadError(Exception):
+    """
+    Raised when a load cannot be added to a drone
+    """
+
+
+def is_full(load_weight, weight_limit):
+    """
+    Returns whether a load weight reaches the weight limit of a drone
+    """
+
+    return weight_limit - load_weight < WEIGHT_TOLERANCE
+
+
+def merge_quantities(items):
+    """
+    Returns a dict medication id -> quantity adding the quantities of repeated medications
+    """
+
+    quantities = defaultdict(int)
+    for item in items:
+        quantities[item['medication']] += item['quantity']
+    return dict(quantities)
+
+
+def add_loads(drone, quantities):
+    """
+    Adds the medications in quantities (medication id -> quantity) to the current flight of a drone.
+    All the medications are read from the cache or fetched with one query, the capacity is checked once for the whole
+    load and the loads are written with bulk operations, so the caller must run this inside a
+    transaction holding the lock of the drone.
+    * If the drone is on IDLE state a new Flight is created with the load
+    * If the drone is on LOADING state the quantities are added to the loads of its current flight
+    Raises LoadError without changing anything if the load cannot be added.
+    """
+
+    medications = get_medications(list(quantities))
+    if len(medications) != len(quantities):
+        raise LoadError(_('Medication does not exists on database'))
+
+    added_weight = sum(medications[pk].weight * quantity for pk, quantity in quantities.items())
+
+    if drone.state == 'IDLE' and drone.battery_capacity >= Drone.MIN_FLIGHT_BATTERY:
+        flight = None
+        current_load = 0
+    elif drone.state == 'LOADING':
+        flight = drone.flights_rel.get(was_delivered=False)
+        current_load = flight.current_load_weight
+    else:
+        raise LoadError(_('The drone cannot accept new load'))
+
+    if current_load + added_weight - drone.weight_limit > WEIGHT_TOLERANCE:
+        raise LoadError(_('The load is higher that the current weight capacity of the drone'))
+
+    old_loads = {}
+    if flight is None:
+        flight = Flight.objects.create(drone_rel=drone)
+    else:
+        old_loads = {
+            load.medication_rel_id: load
+            for load in flight.loads_rel.filter(medication_rel__in=list(quantities))
+        }
+
+    new_loads = []
+    for pk, quantity in quantities.items():
+        if pk in old_loads:
+            old_loads[pk].quantity += quantity
+        else:
+            new_loads.append(Load(flight_rel=flight, medication_rel=medications[pk], quantity=quantity))
+
+    Load.objects.bulk_create(new_loads)
+    Load.objects.bulk_update(old_loads.values(), ['quantity'])
+    # bulk operations skip Load.save, so the flight load weight is updated here
+    Flight.add_load_weight(flight.pk, added_weight)
+
+    drone.current_load = current_load + added_weight
+    drone.state = 'LOADED' if is_full(drone.current_load, drone.weight_limit) else 'LOADING'
+    drone.save()
+    return flight
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand, CommandError
+
+from base.benchmarks import get_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Runs a performance benchmark against the configured database, all the data is rolled back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Benchmark to run: {}'.format(', '.join(get_benchmarks())))
+        parser.add_argument('--sizes', nargs='+', type=int, help='Problem sizes to measure')
+        parser.add_argument('--chunk-size', type=int, help='Chunk size used by bulk operations')
+
+    def handle(self, *args, **options):
+        benchmarks = get_benchmarks()
+        if options['name'] not in benchmarks:
+            raise CommandError('Unknown benchmark {}, choices are: {}'.format(
+                options['name'], ', '.join(benchmarks)))
+
+        results = benchmarks[options['name']].run(**options)
+
+        if results:
+            columns = list(results[0].keys())
+            self.stdout.write('  '.join('{:>18}'.format(column) for column in columns))
+            for row in results:
+                self.stdout.write('  '.join('{:>18}'.format(str(row[column])) for column in columns))
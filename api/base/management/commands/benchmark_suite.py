@@ -0,0 +1,71 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+
+from base.benchmarks.http import get_token
+from base.benchmarks.suite import cleanup, compare, run_suite, seed
+
+
+class Command(BaseCommand):
+    help = ('Seeds a fleet and measures the throughput, latency percentiles and queries per request '
+            'of the main endpoints of a running server and of the battery task, as a JSON report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Url of the running server')
+        parser.add_argument('--drones', type=int, default=10000, help='Drones of the seeded fleet')
+        parser.add_argument('--medications', type=int, default=1000, help='Medications of the seeded fleet')
+        parser.add_argument('--status-logs', type=int, default=100, help='Status logs seeded for each drone')
+        parser.add_argument('--no-seed', action='store_true', help='Reuses the fleet seeded by a previous run')
+        parser.add_argument('--cleanup', action='store_true', help='Deletes the seeded fleet at the end')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests sent to each endpoint')
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 10], help='Concurrent connections')
+        parser.add_argument('--username', help='User of the requests, the first superuser by default')
+        parser.add_argument('--password', help='Password of the user')
+        parser.add_argument('--output', help='File the JSON report is written to instead of the output')
+        parser.add_argument('--baseline', help='JSON report of a previous run, regressions make the command fail')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Fraction of throughput or p99 latency lost before it is a regression')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['username']) if options['username'] else \
+            User.objects.filter(is_superuser=True).order_by('pk')
+        user = users.first()
+        if user is None:
+            raise CommandError('User not found')
+
+        if not options['password']:
+            raise CommandError('The password of the user is needed to get a token')
+        try:
+            token = get_token(options['base_url'], user.username, options['password'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        headers = {'Authorization': 'Bearer {}'.format(token)}
+
+        seeded = None
+        if not options['no_seed']:
+            self.stderr.write('Seeding the fleet')
+            seeded = seed(options['drones'], options['medications'], options['status_logs'])
+
+        try:
+            report = run_suite(options['base_url'], user, headers, options['requests'], options['concurrency'],
+                               log=self.stderr.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if options['cleanup']:
+                cleanup()
+        report['seed'] = seeded
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                regressions = compare(report, json.load(f), options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against {}:\n{}'.format(options['baseline'], '\n'.join(regressions)))
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from base.cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Shows the hits and misses of the medication caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Resets the counters after showing them')
+
+    def handle(self, *args, **options):
+        for name, stats in get_stats().items():
+            total = stats['hits'] + stats['misses']
+            self.stdout.write('{}: {} hits, {} misses, hit ratio {}'.format(
+                name, stats['hits'], stats['misses'], '{:.1%}'.format(stats['hits'] / total) if total else '-'))
+
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,41 @@
+import json
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from base.api.serializers.drones import DroneDispatchSerializer
+from base.dispatch import dispatch_orders
+from base.loading import LoadError
+
+
+class Command(BaseCommand):
+    help = 'Loads the drones available for loading with the medication orders of a JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('orders_file',
+                            help='JSON file with a list of {"medication": id, "quantity": n} orders, - to read stdin')
+        parser.add_argument('--destination', nargs=2, type=float, metavar=('LONGITUDE', 'LATITUDE'),
+                            help='Only load the drones that can fly to this point and back with their payload')
+
+    def handle(self, *args, **options):
+        if options['orders_file'] == '-':
+            orders = json.load(sys.stdin)
+        else:
+            with open(options['orders_file']) as orders_file:
+                orders = json.load(orders_file)
+
+        data = {'orders': orders}
+        if options['destination']:
+            data['destination'] = {'type': 'Point', 'coordinates': options['destination']}
+        serializer = DroneDispatchSerializer(data=data)
+        if not serializer.is_valid():
+            raise CommandError('Invalid orders or destination: {}'.format(serializer.errors))
+
+        try:
+            result = dispatch_orders(serializer.data['orders'], serializer.validated_data.get('destination'))
+        except LoadError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(result, indent=2))
+        self.stdout.write('{} orders loaded on {} drones, {} orders unassigned'.format(
+            len(orders) - len(result['unassigned']), len(result['assignments']), len(result['unassigned'])))
@@ -0,0 +1,44 @@
+from urllib.parse import urlsplit, urlunsplit
+
+from django.core.management import BaseCommand, CommandError
+
+from base.benchmarks.http import get_token, load_test
+
+
+class Command(BaseCommand):
+    help = 'Measures the requests per second and latency percentiles of GET endpoints of running servers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Urls to compare, e.g. http://localhost:8005/drones/')
+        parser.add_argument('--requests', type=int, default=1000, help='Number of requests sent to each url')
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[10], help='Concurrent connections')
+        parser.add_argument('--token', help='JWT access token of the requests')
+        parser.add_argument('--username', help='User used to get a token when --token is not given')
+        parser.add_argument('--password', help='Password of the user')
+
+    def handle(self, *args, **options):
+        token = options['token']
+        if token is None and options['username']:
+            try:
+                token = get_token(options['urls'][0], options['username'], options['password'])
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+        headers = {'Authorization': 'Bearer {}'.format(token)} if token else {}
+
+        results = []
+        for url in options['urls']:
+            for concurrency in options['concurrency']:
+                self.stderr.write('Loading {} with {} connections'.format(url, concurrency))
+                url_parts = urlsplit(url)
+                path = urlunsplit(('', '', url_parts.path or '/', url_parts.query, ''))
+                results.append({
+                    'url': url,
+                    **load_test(url, [path], options['requests'], concurrency, headers),
+                })
+
+        columns = list(results[0].keys())
+        width = max(len(row['url']) for row in results)
+        self.stdout.write('  '.join(['{:<{}}'.format('url', width)] + ['{:>19}'.format(column) for column in columns[1:]]))
+        for row in results:
+            self.stdout.write('  '.join(
+                ['{:<{}}'.format(row['url'], width)] + ['{:>19}'.format(str(row[column])) for column in columns[1:]]))
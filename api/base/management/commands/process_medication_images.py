@@ -0,0 +1,28 @@
+import os
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from base.images import PROCESSED, get_unprocessed, process_medication_images
+
+
+class Command(BaseCommand):
+    help = ('Generates the thumbnails and WebP versions of the medication images that do not have them yet, '
+            'on parallel worker processes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--force', action='store_true', help='Generates again the variants of every image')
+
+    def handle(self, *args, **options):
+        pks = get_unprocessed(options['force'])
+        self.stderr.write('{} medication images to process with {} workers'.format(len(pks), options['workers']))
+
+        start = perf_counter()
+        counts = process_medication_images(pks, options['workers'], options['force'])
+        elapsed = perf_counter() - start
+
+        for result, count in counts.items():
+            self.stdout.write('{:>12}  {}'.format(result, count))
+        self.stdout.write('{} images processed in {:.3f} seconds ({} images per second)'.format(
+            counts[PROCESSED], elapsed, round(counts[PROCESSED] / elapsed) if elapsed else None))
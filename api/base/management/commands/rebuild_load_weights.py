@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from base.cache import invalidate_drones
+from base.models import Flight
+
+
+class Command(BaseCommand):
+    # delivered flights keep the weight they flew with, medication weight changes only apply to the open flights
+    help = 'Verifies or rebuilds the denormalized load weight of the open flights from its loads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report the flights with a wrong load weight, exits with error if any')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wrong_flights = Flight.objects.filter(was_delivered=False).select_for_update().with_wrong_load_weight()
+            wrong = list(wrong_flights.values_list('pk', 'current_load_weight', 'actual_load_weight'))
+
+            for pk, current_load_weight, actual_load_weight in wrong:
+                self.stdout.write('Flight {} has a load weight of {} but its loads weight {}'.format(
+                    pk, current_load_weight, actual_load_weight))
+
+            if options['check']:
+                if wrong:
+                    raise CommandError('{} flights have a wrong load weight'.format(len(wrong)))
+                self.stdout.write('All the flights have the right load weight')
+                return
+
+            updated = Flight.objects.filter(pk__in=[row[0] for row in wrong]).rebuild_load_weight()
+            if updated:
+                transaction.on_commit(invalidate_drones)
+            self.stdout.write('Load weight rebuilt for {} flights'.format(updated))
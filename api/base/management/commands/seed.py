@@ -0,0 +1,49 @@
+from time import perf_counter
+
+from django.core.management import BaseCommand
+
+from base.cache import invalidate_drones, invalidate_medications
+from base.seeding import delete_fleet, seed_fleet
+
+
+class Command(BaseCommand):
+    help = ('Generates a synthetic fleet of drones, medications, flights, loads and status logs with bulk inserts '
+            '(COPY on PostgreSQL) and reports the rows per second of each table')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drones', type=int, default=1000, help='Drones generated')
+        parser.add_argument('--medications', type=int, default=100, help='Medications generated')
+        parser.add_argument('--flights', type=int, default=5, help='Delivered flights of each drone')
+        parser.add_argument('--loads', type=int, default=3, help='Medications loaded on each flight')
+        parser.add_argument('--status-logs', type=int, default=100, help='Status logs of each drone, one per minute')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random values')
+        parser.add_argument('--prefix', default='SEED', help='Prefix of the serial numbers and medication codes')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Rows sent on each insert')
+        parser.add_argument('--clear', action='store_true', help='Deletes the fleet generated before with the prefix')
+
+    def handle(self, *args, **options):
+        start = perf_counter()
+        if options['clear']:
+            invalidate_medications(delete_fleet(options['prefix']))
+            invalidate_drones()
+
+        results = seed_fleet(
+            options['drones'], options['medications'], options['flights'], options['loads'], options['status_logs'],
+            options['seed'], options['prefix'], options['batch_size'], log=self.stderr.write)
+        # the fleet is inserted without signals
+        invalidate_medications([])
+        invalidate_drones()
+
+        elapsed = perf_counter() - start
+        rows = sum(row['rows'] for row in results)
+        results.append({
+            'table': 'total',
+            'rows': rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed) if elapsed else None,
+        })
+
+        columns = list(results[0].keys())
+        self.stdout.write('  '.join('{:>22}'.format(column) for column in columns))
+        for row in results:
+            self.stdout.write('  '.join('{:>22}'.format(str(row[column])) for column in columns))
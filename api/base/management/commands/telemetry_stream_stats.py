@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from base.telemetry_stream import get_stream_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Shows the backlog of the telemetry stream and the counters of its flushes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Resets the counters after showing them')
+
+    def handle(self, *args, **options):
+        stats = get_stream_stats()
+        self.stdout.write('{} entries waiting (limit {}), {} read and not acknowledged, oldest {}s ago, '
+                          'last applied entry {}'.format(
+                              stats['length'], stats['max_length'], stats['pending'], stats['lag_seconds'],
+                              stats['last_id'] or '-'))
+        self.stdout.write('{} flushes: {} entries, {} reports, {} duplicated entries skipped, {} requests rejected'.format(
+            stats['flushes'], stats['entries'], stats['reports'], stats['duplicates'], stats['rejected']))
+
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,36 @@
+# Generated by Django 3.2 on 2026-10-18 11:58
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def compute_current_load_weight(apps, schema_editor):
+    Flight = apps.get_model('base', 'Flight')
+    Load = apps.get_model('base', 'Load')
+
+    load_weight = Load.objects.filter(
+        flight_rel=OuterRef('pk'),
+    ).order_by().values('flight_rel').annotate(
+        total_load=Sum(F('medication_rel__weight') * F('quantity'))
+    ).values('total_load')
+
+    Flight.objects.update(
+        current_load_weight=Coalesce(Subquery(load_weight, output_field=FloatField()), 0.0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0005_dronestatuslog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='current_load_weight',
+            field=models.FloatField(default=0, verbose_name='Current load weight'),
+        ),
+        migrations.RunPython(compute_current_load_weight, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2 on 2026-10-18 12:02
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def merge_open_flights(apps, schema_editor):
+    """
+    Merges the open flights of each drone into its latest one before a single open flight is enforced:
+    the loads are moved to the latest flight and the emptied flights are closed
+    """
+
+    Flight = apps.get_model('base', 'Flight')
+    Load = apps.get_model('base', 'Load')
+
+    drone_ids = Flight.objects.filter(was_delivered=False).order_by().values('drone_rel').annotate(
+        open_flights=Count('id')).filter(open_flights__gt=1).values_list('drone_rel', flat=True)
+    for drone_id in list(drone_ids):
+        latest, *others = Flight.objects.filter(drone_rel_id=drone_id, was_delivered=False).order_by('-created', '-pk')
+        loads = {load.medication_rel_id: load for load in Load.objects.filter(flight_rel=latest)}
+        for load in Load.objects.filter(flight_rel__in=others).order_by('pk'):
+            if load.medication_rel_id in loads:
+                # a flight has a single load of each medication
+                kept = loads[load.medication_rel_id]
+                kept.quantity += load.quantity
+                kept.save(update_fields=['quantity'])
+                load.delete()
+            else:
+                load.flight_rel = latest
+                load.save(update_fields=['flight_rel'])
+                loads[load.medication_rel_id] = load
+
+        # the emptied flights are closed instead of deleted, deleting them would leave pending foreign key
+        # checks on the flight table that PostgreSQL does not allow while its index is created
+        Flight.objects.filter(pk__in=[flight.pk for flight in others]).update(was_delivered=True, current_load_weight=0)
+        weight = Load.objects.filter(flight_rel=latest).aggregate(
+            weight=Sum(F('medication_rel__weight') * F('quantity')))['weight']
+        Flight.objects.filter(pk=latest.pk).update(current_load_weight=weight or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0006_flight_current_load_weight'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='drone',
+            index=models.Index(fields=['state', 'battery_capacity'], name='drone_state_battery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dronestatuslog',
+            index=models.Index(fields=['drone_rel', 'created'], name='status_log_drone_created_idx'),
+        ),
+        migrations.RunPython(merge_open_flights, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(condition=models.Q(was_delivered=False), fields=('drone_rel',), name='one_open_flight_per_drone'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2 on 2026-10-18 12:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DroneBatteryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now=True)),
+                ('updated', models.DateTimeField(auto_now_add=True)),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Period')),
+                ('period_start', models.DateTimeField(verbose_name='Period start')),
+                ('samples', models.IntegerField(verbose_name='Samples')),
+                ('min_battery', models.FloatField(null=True, verbose_name='Minimum battery')),
+                ('avg_battery', models.FloatField(null=True, verbose_name='Average battery')),
+                ('max_battery', models.FloatField(null=True, verbose_name='Maximum battery')),
+                ('drone_rel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='battery_rollups_rel', to='base.drone', verbose_name='Drone')),
+            ],
+            options={
+                'verbose_name': "Drone's battery rollup",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dronebatteryrollup',
+            constraint=models.UniqueConstraint(fields=('drone_rel', 'period', 'period_start'), name='one_rollup_per_period'),
+        ),
+    ]
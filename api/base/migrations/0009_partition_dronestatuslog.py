@@ -0,0 +1,51 @@
+from django.db import migrations
+
+# Converts the status log into a table partitioned by range of created on PostgreSQL.
+# The existing rows are moved to the default partition, the daily partitions are created
+# by base.tasks.maintain_drone_status_log_task. The primary key must include the partition key.
+PARTITION_SQL = [
+    'CREATE TABLE base_dronestatuslog_partitioned (LIKE base_dronestatuslog INCLUDING DEFAULTS) '
+    'PARTITION BY RANGE (created)',
+    'CREATE TABLE base_dronestatuslog_default PARTITION OF base_dronestatuslog_partitioned DEFAULT',
+    'INSERT INTO base_dronestatuslog_partitioned SELECT * FROM base_dronestatuslog',
+    'ALTER SEQUENCE base_dronestatuslog_id_seq OWNED BY base_dronestatuslog_partitioned.id',
+    'DROP TABLE base_dronestatuslog',
+    'ALTER TABLE base_dronestatuslog_partitioned RENAME TO base_dronestatuslog',
+    'ALTER TABLE base_dronestatuslog ADD CONSTRAINT base_dronestatuslog_pkey PRIMARY KEY (id, created)',
+    'ALTER TABLE base_dronestatuslog ADD CONSTRAINT base_dronestatuslog_drone_rel_id_fk_base_drone_id '
+    'FOREIGN KEY (drone_rel_id) REFERENCES base_drone (id) DEFERRABLE INITIALLY DEFERRED',
+    'CREATE INDEX status_log_drone_created_idx ON base_dronestatuslog (drone_rel_id, created)',
+]
+
+UNPARTITION_SQL = [
+    'CREATE TABLE base_dronestatuslog_plain (LIKE base_dronestatuslog INCLUDING DEFAULTS)',
+    'INSERT INTO base_dronestatuslog_plain SELECT * FROM base_dronestatuslog',
+    'ALTER SEQUENCE base_dronestatuslog_id_seq OWNED BY base_dronestatuslog_plain.id',
+    'DROP TABLE base_dronestatuslog',
+    'ALTER TABLE base_dronestatuslog_plain RENAME TO base_dronestatuslog',
+    'ALTER TABLE base_dronestatuslog ADD CONSTRAINT base_dronestatuslog_pkey PRIMARY KEY (id)',
+    'ALTER TABLE base_dronestatuslog ADD CONSTRAINT base_dronestatuslog_drone_rel_id_fk_base_drone_id '
+    'FOREIGN KEY (drone_rel_id) REFERENCES base_drone (id) DEFERRABLE INITIALLY DEFERRED',
+    'CREATE INDEX base_dronestatuslog_drone_rel_id ON base_dronestatuslog (drone_rel_id)',
+    'CREATE INDEX status_log_drone_created_idx ON base_dronestatuslog (drone_rel_id, created)',
+]
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0008_dronebatteryrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(PARTITION_SQL), run_sql(UNPARTITION_SQL)),
+    ]
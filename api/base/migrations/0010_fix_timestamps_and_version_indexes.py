@@ -0,0 +1,97 @@
+# Generated by Django 3.2 on 2026-10-18 12:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def swap_timestamps(apps, schema_editor):
+    """
+    created was set on every save and updated only on insert, so each one holds the value of
+    the other. The status logs and rollups are never updated, so both values match already.
+    """
+
+    for model_name in ('Drone', 'Flight', 'Medication', 'Load'):
+        apps.get_model('base', model_name).objects.update(created=F('updated'), updated=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0009_partition_dronestatuslog'),
+    ]
+
+    operations = [
+        migrations.RunPython(swap_timestamps, swap_timestamps),
+        migrations.AlterField(
+            model_name='drone',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='drone',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='dronebatteryrollup',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='dronebatteryrollup',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='dronestatuslog',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='dronestatuslog',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='load',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='load',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='medication',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='medication',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='drone',
+            index=models.Index(fields=['updated'], name='drone_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['updated'], name='flight_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(fields=['updated'], name='medication_updated_idx'),
+        ),
+    ]
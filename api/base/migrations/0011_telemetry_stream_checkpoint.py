@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0010_fix_timestamps_and_version_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryStreamCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('stream', models.CharField(max_length=100, unique=True, verbose_name='Stream')),
+                ('last_id', models.CharField(max_length=40, verbose_name='Last entry id')),
+            ],
+            options={
+                'verbose_name': 'Telemetry stream checkpoint',
+            },
+        ),
+    ]
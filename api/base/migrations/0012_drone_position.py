@@ -0,0 +1,22 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0011_telemetry_stream_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drone',
+            name='position',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326, verbose_name='Position'),
+        ),
+        migrations.AddField(
+            model_name='dronestatuslog',
+            name='position',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, spatial_index=False, srid=4326, verbose_name='Position'),
+        ),
+    ]
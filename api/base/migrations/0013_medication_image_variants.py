@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0012_drone_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Image variants'),
+        ),
+    ]
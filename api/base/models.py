@@ -1,27 +1,80 @@
-from django.db import models
-from django.db.models import Sum, F
+from collections import defaultdict
+
+from django.contrib.gis.db.models import PointField
+from django.db import models, transaction
+from django.db.models import Sum, F, OuterRef, Subquery, FloatField
+from django.db.models.functions import Abs, Coalesce
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.core.validators import RegexValidator, MaxValueValidator, MinValueValidator
 
+from base.geo import KNNDistance, SRID
+
 
 class CommonInfo(models.Model):
     """
     Base abstract model to data shared for all models
     """
 
-    created = models.DateTimeField(auto_now=True)
-    updated = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created']
         abstract = True
 
 
+class DroneQuerySet(models.QuerySet):
+
+    def available_for_loading(self):
+        """
+        Drones that can accept new load: idle drones with enough battery and drones already loading
+        """
+
+        return self.filter(
+            models.Q(state='IDLE', battery_capacity__gte=Drone.MIN_FLIGHT_BATTERY) |
+            models.Q(state='LOADING')
+        )
+
+    def with_current_load(self):
+        """
+        Annotates each drone with the total weight (weight x quantity) of the load
+        on its current flight, read by a single correlated subquery.
+        """
+
+        current_load = Flight.objects.filter(
+            drone_rel=OuterRef('pk'),
+            was_delivered=False,
+        ).order_by().values('current_load_weight')[:1]
+
+        return self.annotate(
+            current_load=Coalesce(Subquery(current_load, output_field=FloatField()), 0.0)
+        )
+
+    def with_remaining_capacity(self):
+        """
+        Annotates each drone with the weight it can still carry on its current flight
+        """
+
+        queryset = self if 'current_load' in self.query.annotations else self.with_current_load()
+        return queryset.annotate(remaining_capacity=F('weight_limit') - F('current_load'))
+
+    def nearest(self, point):
+        """
+        Drones with a position ordered from the nearest to a point, annotated with the distance in meters.
+        The order uses the KNN operator, sliced querysets read only the first drones of the GiST index.
+        """
+
+        return self.filter(position__isnull=False).annotate(distance=KNNDistance('position', point)).order_by('distance')
+
+
 class Drone(CommonInfo):
     """
     Store the data of the drones
     """
 
+    objects = DroneQuerySet.as_manager()
+
     MODEL_CHOICES = [
         ('Lightweight', _('Lightweight')),
         ('Middleweight', _('Middleweight')),
@@ -38,6 +91,9 @@ class Drone(CommonInfo):
         ('RETURNING', 'Returning'),
     ]
 
+    # minimum battery capacity that allows an idle drone to start loading
+    MIN_FLIGHT_BATTERY = 25
+
     serial_number = models.CharField(
         max_length=100,
         verbose_name=_('Serial number'),
@@ -98,23 +154,47 @@ class Drone(CommonInfo):
         null=False,
     )
 
+    # last reported position, indexed with GiST for the nearest drones queries
+    position = PointField(
+        geography=True,
+        srid=SRID,
+        null=True,
+        blank=True,
+        verbose_name=_('Position'),
+    )
+
     def is_ready_to_flight(self):
         state = self.state
         battery = self.battery_capacity
-        return (state == 'IDLE' and battery >= 25 ) or state == 'LOADING' or state == 'LOADED'
+        return (state == 'IDLE' and battery >= self.MIN_FLIGHT_BATTERY) or state == 'LOADING' or state == 'LOADED'
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keeps the stored values to publish only the state and battery changes on save
+        instance._stored_status = (instance.__dict__.get('state'), instance.__dict__.get('battery_capacity'))
+        return instance
+
     def get_load_weight(self):
-        current_flight = self.flights_rel.filter(was_delivered=False)
-        if current_flight.exists():
-            return current_flight[0].loads_rel.annotate(quantity_x_weight=F('medication_rel__weight') * F('quantity')).aggregate(
-                total_load=Sum(
-                    'quantity_x_weight'
-                ))['total_load']  
-        else:
-            return 0
+        """
+        Returns the weight of the load on the current flight.
+        Uses the value annotated by DroneQuerySet.with_current_load when available.
+        """
+
+        if hasattr(self, 'current_load'):
+            return self.current_load
+
+        return self.flights_rel.filter(was_delivered=False).values_list(
+            'current_load_weight', flat=True).first() or 0
 
     class Meta:
+        indexes = [
+            # drones available for loading are filtered by state and battery
+            models.Index(fields=['state', 'battery_capacity'], name='drone_state_battery_idx'),
+            # versions of the drones resources for conditional requests
+            models.Index(fields=['updated'], name='drone_updated_idx'),
+        ]
         constraints = [
             models.CheckConstraint(check=models.Q(weight_limit__lte=500), name='weight_limit_lte_500'),
             models.CheckConstraint(check=models.Q(weight_limit__gte=0), name='weight_limit_gte_0'),
@@ -126,6 +206,46 @@ class Drone(CommonInfo):
         return self.serial_number
 
 
+class FlightQuerySet(models.QuerySet):
+
+    def with_actual_load_weight(self):
+        """
+        Annotates each flight with the weight of its loads computed from the Load rows,
+        the source of truth of the denormalized current_load_weight field.
+        """
+
+        actual_load_weight = Load.objects.filter(
+            flight_rel=OuterRef('pk'),
+        ).order_by().values('flight_rel').annotate(
+            total_load=Sum(F('medication_rel__weight') * F('quantity'))
+        ).values('total_load')
+
+        return self.annotate(
+            actual_load_weight=Coalesce(Subquery(actual_load_weight, output_field=FloatField()), 0.0)
+        )
+
+    def with_wrong_load_weight(self, tolerance=1e-6):
+        """
+        Flights whose current_load_weight does not match the weight of its loads
+        """
+
+        return self.with_actual_load_weight().annotate(
+            load_weight_error=Abs(F('current_load_weight') - F('actual_load_weight'))
+        ).filter(load_weight_error__gt=tolerance)
+
+    def rebuild_load_weight(self):
+        """
+        Sets the current_load_weight of the flights to the weight of their loads.
+        Returns the number of updated flights.
+        """
+
+        actual_load_weight = Flight.objects.with_actual_load_weight().filter(
+            pk=OuterRef('pk')).values('actual_load_weight')
+        return self.update(
+            current_load_weight=Subquery(actual_load_weight, output_field=FloatField()), updated=timezone.now()
+        )
+
+
 class Flight(CommonInfo):
     """
     A flight for a drone represent the process of the drone to transport several load
@@ -135,8 +255,13 @@ class Flight(CommonInfo):
     * That means that a drone on IDLE state do not have any flight yet or all the flights had false on was_delivered field
     * A drone when enters on DELIVERING state need to asign a datetime to start_datetime
     * A drone when enter to the state IDLE from RETURNING need to asign a datetime to arrive_datetime
+    * The current_load_weight field keeps the weight of the flight loads, it is maintained by Load.save and Load.delete
+      and by a signal when the weight of a medication on open flights changes. QuerySet.update() and delete() of loads,
+      bulk_create() and bulk_update() skip them, code writing loads in bulk must call rebuild_load_weight() on their flights
     """
 
+    objects = FlightQuerySet.as_manager()
+
     drone_rel = models.ForeignKey(
         Drone,
         verbose_name=_('Drone'),
@@ -159,9 +284,39 @@ class Flight(CommonInfo):
         default=False
     )
 
+    current_load_weight = models.FloatField(
+        verbose_name=_('Current load weight'),
+        default=0,
+        null=False,
+    )
+
+    @classmethod
+    def add_load_weight(cls, flight_id, weight):
+        """
+        Atomically adds weight (negative to remove) to the current load weight of a flight
+        """
+
+        cls.objects.filter(pk=flight_id).update(
+            current_load_weight=F('current_load_weight') + weight, updated=timezone.now()
+        )
+
     def __str__(self) -> str:
         return "Flight {}-{}".format(self.drone_rel.serial_number, self.created)
 
+    class Meta(CommonInfo.Meta):
+        constraints = [
+            # also indexes the lookup of the current flight of a drone
+            models.UniqueConstraint(
+                fields=['drone_rel'],
+                condition=models.Q(was_delivered=False),
+                name='one_open_flight_per_drone'
+            ),
+        ]
+        indexes = [
+            # the load of the flights is part of the version of the drones resources
+            models.Index(fields=['updated'], name='flight_updated_idx'),
+        ]
+
 
 class Medication(CommonInfo):
     """
@@ -212,6 +367,20 @@ class Medication(CommonInfo):
         null=True,
     )
 
+    # names of the thumbnails and WebP versions of the image, and the name of the image they were made from
+    image_variants = models.JSONField(
+        verbose_name=_('Image variants'),
+        default=dict,
+        blank=True,
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keeps the stored weight to update the load weight of the open flights when it changes
+        instance._stored_weight = instance.__dict__.get('weight')
+        return instance
+
     def __str__(self) -> str:
         return self.name
 
@@ -220,6 +389,10 @@ class Medication(CommonInfo):
             models.CheckConstraint(check=models.Q(weight__lte=500), name='weight_lte_500'),
             models.CheckConstraint(check=models.Q(weight__gt=0), name='weight_gt_0'),
         ]
+        indexes = [
+            # versions of the medications resources for conditional requests
+            models.Index(fields=['updated'], name='medication_updated_idx'),
+        ]
 
 
 class Load(CommonInfo):
@@ -246,9 +419,62 @@ class Load(CommonInfo):
         blank=False,
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keeps the stored values to update the flight load weight on save and delete
+        instance._stored_load = (
+            instance.__dict__.get('flight_rel_id'),
+            instance.__dict__.get('medication_rel_id'),
+            instance.__dict__.get('quantity'),
+        )
+        return instance
+
     def get_weight(self):
         return self.medication_rel.weight * self.quantity
 
+    def get_stored_weight(self):
+        """
+        Returns the flight and the weight of this load as stored on the database
+        """
+
+        stored_load = getattr(self, '_stored_load', None)
+        if stored_load is None or None in stored_load:
+            stored_load = Load.objects.filter(pk=self.pk).values_list(
+                'flight_rel_id', 'medication_rel_id', 'quantity').first()
+        if stored_load is None:
+            return None, 0
+
+        flight_id, medication_id, quantity = stored_load
+        if medication_id == self.medication_rel_id:
+            weight = self.medication_rel.weight
+        else:
+            weight = Medication.objects.values_list('weight', flat=True).get(pk=medication_id)
+        return flight_id, weight * quantity
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            weights = defaultdict(float)
+            if self.pk is not None:
+                flight_id, weight = self.get_stored_weight()
+                weights[flight_id] -= weight
+
+            super().save(*args, **kwargs)
+
+            weights[self.flight_rel_id] += self.get_weight()
+            for flight_id, weight in weights.items():
+                if flight_id is not None and weight:
+                    Flight.add_load_weight(flight_id, weight)
+
+        self._stored_load = (self.flight_rel_id, self.medication_rel_id, self.quantity)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            flight_id, weight = self.get_stored_weight()
+            if flight_id is not None and weight:
+                Flight.add_load_weight(flight_id, -weight)
+            return super().delete(*args, **kwargs)
+
     class Meta:
         unique_together = [['flight_rel', 'medication_rel']]
 
@@ -274,13 +500,112 @@ class DroneStatusLog(CommonInfo):
         null=True
     )
 
+    # trail of the drone, read by drone and time with status_log_drone_created_idx so it has no spatial index
+    position = PointField(
+        geography=True,
+        srid=SRID,
+        null=True,
+        blank=True,
+        spatial_index=False,
+        verbose_name=_('Position'),
+    )
+
     def drone_name(self):
         return self.drone_rel.serial_number
 
     drone_name.short_description = _('Drone serial number')
+    drone_name.admin_order_field = 'drone_rel__serial_number'
     
     def __str__(self) -> str:
         return "{} {}".format(self.drone_rel.serial_number, self.created)
 
     class Meta:
-        verbose_name = _("Drone's status log")
\ No newline at end of file
+        verbose_name = _("Drone's status log")
+        indexes = [
+            models.Index(fields=['drone_rel', 'created'], name='status_log_drone_created_idx'),
+        ]
+
+class DroneBatteryRollup(CommonInfo):
+    """
+    Battery statistics of a drone aggregated by hour or by day from the status log,
+    kept after the raw status logs are removed by the retention policy
+    """
+
+    PERIOD_CHOICES = [
+        ('hour', _('Hour')),
+        ('day', _('Day')),
+    ]
+
+    drone_rel = models.ForeignKey(
+        Drone,
+        related_name='battery_rollups_rel',
+        on_delete=models.CASCADE,
+        null=False,
+        verbose_name=_('Drone')
+    )
+
+    period = models.CharField(
+        max_length=4,
+        choices=PERIOD_CHOICES,
+        verbose_name=_('Period'),
+        blank=False,
+        null=False,
+    )
+
+    period_start = models.DateTimeField(
+        verbose_name=_('Period start'),
+        null=False,
+    )
+
+    samples = models.IntegerField(
+        verbose_name=_('Samples'),
+        null=False,
+    )
+
+    min_battery = models.FloatField(
+        verbose_name=_('Minimum battery'),
+        null=True
+    )
+
+    avg_battery = models.FloatField(
+        verbose_name=_('Average battery'),
+        null=True
+    )
+
+    max_battery = models.FloatField(
+        verbose_name=_('Maximum battery'),
+        null=True
+    )
+
+    def __str__(self) -> str:
+        return "{} {} {}".format(self.drone_rel.serial_number, self.period, self.period_start)
+
+    class Meta:
+        verbose_name = _("Drone's battery rollup")
+        constraints = [
+            models.UniqueConstraint(fields=['drone_rel', 'period', 'period_start'], name='one_rollup_per_period'),
+        ]
+
+
+class TelemetryStreamCheckpoint(CommonInfo):
+    """
+    Id of the last telemetry stream entry written to the database, saved in the same transaction
+    as its changes so entries delivered again after a failed acknowledgement are skipped
+    """
+
+    stream = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name=_('Stream'),
+    )
+
+    last_id = models.CharField(
+        max_length=40,
+        verbose_name=_('Last entry id'),
+    )
+
+    def __str__(self) -> str:
+        return "{} {}".format(self.stream, self.last_id)
+
+    class Meta:
+        verbose_name = _('Telemetry stream checkpoint')
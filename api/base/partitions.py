@@ -0,0 +1,111 @@
+"""
+Daily range partitions of the drone status log table on PostgreSQL.
+The table is partitioned by created (see migration 0009) with a default partition that catches
+rows outside the existing ranges. On other databases the status log is a plain table, the
+partition functions do nothing and old rows are removed with a DELETE.
+"""
+
+from datetime import datetime, time, timedelta, timezone
+
+from django.db import connection, transaction
+
+from base.models import DroneStatusLog
+
+PARENT_TABLE = DroneStatusLog._meta.db_table
+DEFAULT_PARTITION = '{}_default'.format(PARENT_TABLE)
+PARTITION_PREFIX = '{}_p'.format(PARENT_TABLE)
+
+
+def is_partitioned():
+    return connection.vendor == 'postgresql'
+
+
+def day_start(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def partition_name(day):
+    return '{}{:%Y%m%d}'.format(PARTITION_PREFIX, day)
+
+
+def get_partition_days():
+    """
+    Returns the sorted days that have its own partition
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s AND child.relname LIKE %s",
+            [PARENT_TABLE, PARTITION_PREFIX + '%']
+        )
+        return sorted(
+            datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m%d').date()
+            for name, in cursor.fetchall()
+        )
+
+
+@transaction.atomic
+def create_partition(day):
+    """
+    Creates the partition of a day, moving into it the rows of that day stored on the default partition
+    """
+
+    quote = connection.ops.quote_name
+    start, end = day_start(day), day_start(day + timedelta(days=1))
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(
+            quote(partition_name(day)), quote(PARENT_TABLE)))
+        cursor.execute(
+            'WITH moved AS (DELETE FROM {} WHERE created >= %s AND created < %s RETURNING *) '
+            'INSERT INTO {} SELECT * FROM moved'.format(quote(DEFAULT_PARTITION), quote(partition_name(day))),
+            [start, end]
+        )
+        cursor.execute('ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)'.format(
+            quote(PARENT_TABLE), quote(partition_name(day))), [start, end])
+
+
+def drop_partition(day):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE {}'.format(quote(partition_name(day))))
+
+
+def create_partitions(today, days_ahead):
+    """
+    Creates the missing partitions from today to days_ahead days later, returns the created days
+    """
+
+    if not is_partitioned():
+        return []
+
+    existing = set(get_partition_days())
+    created = []
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if day not in existing:
+            create_partition(day)
+            created.append(day)
+    return created
+
+
+def drop_partitions_before(day):
+    """
+    Removes the status logs created before a day, dropping whole partitions when possible.
+    Returns the dropped partition days.
+    """
+
+    if not is_partitioned():
+        DroneStatusLog.objects.filter(created__lt=day_start(day)).delete()
+        return []
+
+    dropped = [partition_day for partition_day in get_partition_days() if partition_day < day]
+    for partition_day in dropped:
+        drop_partition(partition_day)
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {} WHERE created < %s'.format(connection.ops.quote_name(DEFAULT_PARTITION)),
+                       [day_start(day)])
+    return dropped
+
@@ -0,0 +1,122 @@
+"""
+Downsampling of the drone status log into hourly and daily battery rollups.
+Hourly rollups are computed from the status logs and daily rollups from the hourly ones,
+each run only aggregates the complete periods that were not rolled up yet. A period is never
+aggregated again, so the maintenance task only rolls up the hours that ended more than
+DRONE_BATTERY_ROLLUP_LAG_MINUTES ago and the logs written late by slow transactions are counted.
+"""
+
+from datetime import timedelta, timezone
+from itertools import islice
+
+from django.db.models import Avg, Count, F, Max, Min, Sum
+from django.db.models.functions import Trunc
+
+from base.models import DroneBatteryRollup, DroneStatusLog
+
+BATCH_SIZE = 5000
+
+
+def _save_rollups(period, rows):
+    rows = iter(rows)
+    total = 0
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return total
+        DroneBatteryRollup.objects.bulk_create([
+            DroneBatteryRollup(period=period, **row) for row in batch
+        ], ignore_conflicts=True)
+        total += len(batch)
+
+
+def truncate(value, period):
+    """
+    Returns the start of the hour or the day of a datetime, in UTC
+    """
+
+    value = value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if period == 'day':
+        value = value.replace(hour=0)
+    return value
+
+
+def _next_period_start(period, source, field):
+    """
+    Returns the start of the first period not rolled up yet, the first period
+    of the source queryset if nothing was rolled up before
+    """
+
+    last = DroneBatteryRollup.objects.filter(period=period).aggregate(last=Max('period_start'))['last']
+    if last is not None:
+        return last + timedelta(**{period + 's': 1})
+
+    first = source.aggregate(first=Min(field))['first']
+    return truncate(first, period) if first is not None else None
+
+
+def rollup_hours(until):
+    """
+    Aggregates the status logs of the complete hours before until into hourly rollups
+    """
+
+    start = _next_period_start('hour', DroneStatusLog.objects.all(), 'created')
+    end = truncate(until, 'hour')
+    if start is None or start >= end:
+        return 0
+
+    rows = DroneStatusLog.objects.filter(
+        created__gte=start, created__lt=end
+    ).annotate(
+        hour=Trunc('created', 'hour', tzinfo=timezone.utc)
+    ).order_by().values('drone_rel', 'hour').annotate(
+        samples=Count('id'),
+        min_battery=Min('current_battery'),
+        avg_battery=Avg('current_battery'),
+        max_battery=Max('current_battery'),
+    )
+    return _save_rollups('hour', (
+        {
+            'drone_rel_id': row['drone_rel'],
+            'period_start': row['hour'],
+            'samples': row['samples'],
+            'min_battery': row['min_battery'],
+            'avg_battery': row['avg_battery'],
+            'max_battery': row['max_battery'],
+        }
+        for row in rows.iterator(chunk_size=BATCH_SIZE)
+    ))
+
+
+def rollup_days(until):
+    """
+    Aggregates the hourly rollups of the complete days before until into daily rollups
+    """
+
+    hourly = DroneBatteryRollup.objects.filter(period='hour')
+    start = _next_period_start('day', hourly, 'period_start')
+    end = truncate(until, 'day')
+    if start is None or start >= end:
+        return 0
+
+    rows = hourly.filter(
+        period_start__gte=start, period_start__lt=end
+    ).annotate(
+        day=Trunc('period_start', 'day', tzinfo=timezone.utc)
+    ).order_by().values('drone_rel', 'day').annotate(
+        total_samples=Sum('samples'),
+        lowest_battery=Min('min_battery'),
+        battery_sum=Sum(F('avg_battery') * F('samples')),
+        highest_battery=Max('max_battery'),
+    )
+    return _save_rollups('day', (
+        {
+            'drone_rel_id': row['drone_rel'],
+            'period_start': row['day'],
+            'samples': row['total_samples'],
+            'min_battery': row['lowest_battery'],
+            'avg_battery': row['battery_sum'] / row['total_samples'] if row['battery_sum'] is not None else None,
+            'max_battery': row['highest_battery'],
+        }
+        for row in rows.iterator(chunk_size=BATCH_SIZE)
+    ))
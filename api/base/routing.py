@@ -0,0 +1,7 @@
+from django.urls import path
+
+from base.consumers import DroneEventsConsumer
+
+websocket_urlpatterns = [
+    path('ws/drones/events/', DroneEventsConsumer.as_asgi()),
+]
@@ -0,0 +1,236 @@
+"""
+Fast generation of large synthetic data sets for staging and benchmarks.
+Rows are inserted without the ORM objects: on PostgreSQL they are streamed with COPY by chunks,
+on other databases they are inserted with executemany. Drones, medications and flights get
+explicit ids so the rows referencing them are generated in the same pass, the sequences are reset
+afterwards like loaddata does. The same seed generates the same fleet. Drones are placed at random
+positions of an area, so the nearest drones queries can be measured on large fleets.
+"""
+
+import csv
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+from random import Random
+from time import perf_counter
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from base.geo import to_point
+from base.models import Drone, DroneStatusLog, Flight, Load, Medication
+
+# drones generated on each pass, with their flights and loads
+DRONES_CHUNK_SIZE = 10000
+# longitudes and latitudes (west, south, east, north) of the area of the generated drones
+AREA = (-74.25, 40.5, -73.7, 40.92)
+
+
+def insert_rows(model, field_names, rows, batch_size=50000):
+    """
+    Inserts the rows (tuples with the values of field_names) of a model and returns their number.
+    Values are stored as given, auto_now fields are not replaced. Geometries are written as EWKT by COPY.
+    """
+
+    fields = [model._meta.get_field(name) for name in field_names]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    copy = connection.vendor == 'postgresql'
+    # geometry fields wrap their parameter in a function of the spatial backend
+    placeholders = ', '.join(
+        field.get_placeholder(None, None, connection) if hasattr(field, 'get_placeholder') else '%s' for field in fields)
+    # numbers and strings are passed as they are, other values (dates) repeat a lot and are adapted once
+    adapted = [{} for field in fields]
+
+    def prepare(column, value):
+        if value is None or isinstance(value, (int, float, str)):
+            return value
+        if isinstance(value, GEOSGeometry):
+            return fields[column].get_db_prep_save(value, connection)
+        if value not in adapted[column]:
+            adapted[column][value] = fields[column].get_db_prep_save(value, connection)
+        return adapted[column][value]
+
+    rows = iter(rows)
+    count = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return count
+            if copy:
+                buffer = StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert('COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(table, columns), buffer)
+            else:
+                cursor.executemany(
+                    'INSERT INTO {} ({}) VALUES ({})'.format(table, columns, placeholders),
+                    [[prepare(column, value) for column, value in enumerate(row)] for row in batch])
+            count += len(batch)
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def reset_sequences(models):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def delete_fleet(prefix):
+    """
+    Deletes the drones and medications generated with a prefix, the status logs first with a single query
+    """
+
+    drones = Drone.objects.filter(serial_number__startswith='{}-'.format(prefix))
+    DroneStatusLog.objects.filter(drone_rel__in=drones).delete()
+    drones.delete()
+    medications = Medication.objects.filter(code__startswith='{}-'.format(prefix))
+    pks = list(medications.values_list('pk', flat=True))
+    medications.delete()
+    return pks
+
+
+def generate_status_logs(drone_ids, per_drone, seed=0, end=None, interval=timedelta(minutes=1)):
+    """
+    Yields per_drone status log rows (drone, battery, created, updated) for each drone id,
+    one every interval until end (now by default)
+    """
+
+    rand = Random('{}:status_logs'.format(seed))
+    end = end or timezone.now()
+    for step in range(per_drone, 0, -1):
+        created = end - interval * step
+        for drone_id in drone_ids:
+            yield drone_id, float(rand.randint(0, 100)), created, created
+
+
+class FleetGenerator:
+    """
+    Generates the rows of a fleet: idle drones with delivered flights and, for some of them,
+    a current flight being loaded. Loads carry distinct medications within the drone weight limit.
+    """
+
+    DRONE_FIELDS = ('id', 'serial_number', 'model', 'weight_limit', 'battery_capacity', 'state', 'position',
+                    'created', 'updated')
+    MEDICATION_FIELDS = ('id', 'name', 'code', 'weight', 'image_variants', 'created', 'updated')
+    FLIGHT_FIELDS = ('id', 'drone_rel', 'start_datetime', 'arrive_datetime', 'was_delivered',
+                     'current_load_weight', 'created', 'updated')
+    LOAD_FIELDS = ('flight_rel', 'medication_rel', 'quantity', 'created', 'updated')
+
+    def __init__(self, seed=0, prefix='SEED', flights=5, loads=3, loading_ratio=0.2, now=None, area=AREA):
+        self.rand = Random(seed)
+        # positions have their own generator so they do not change the rest of the fleet of a seed
+        self.positions = Random('{}:positions'.format(seed))
+        self.area = area
+        self.prefix = prefix
+        self.flights = flights
+        self.loads = loads
+        self.loading_ratio = loading_ratio
+        self.now = now or timezone.now()
+        self.models = [choice[0] for choice in Drone.MODEL_CHOICES]
+        self.medications = []
+
+    def medication_rows(self, count, first_id):
+        for i in range(count):
+            weight = float(self.rand.randint(1, 100))
+            self.medications.append((first_id + i, weight))
+            yield (first_id + i, '{} medication {:06d}'.format(self.prefix, i), '{}-{:06d}'.format(self.prefix, i),
+                   weight, '{}', self.now, self.now)
+
+    def pick_loads(self, weight_limit):
+        """
+        Returns the ids of distinct medications whose total weight fits the weight limit and that weight
+        """
+
+        loads = []
+        total = 0
+        for medication_id, weight in self.rand.sample(self.medications, min(self.loads, len(self.medications))):
+            if total + weight <= weight_limit:
+                loads.append(medication_id)
+                total += weight
+        return loads, total
+
+    def position(self):
+        west, south, east, north = self.area
+        return to_point((round(self.positions.uniform(west, east), 6), round(self.positions.uniform(south, north), 6)))
+
+    def fleet_rows(self, first, count, first_drone_id, first_flight_id):
+        """
+        Returns the drone, flight and load rows of count drones starting at index first
+        """
+
+        drones, flights, loads = [], [], []
+        flight_id = first_flight_id
+        for i in range(first, first + count):
+            drone_id = first_drone_id + i
+            weight_limit = float(self.rand.choice([100, 200, 300, 400, 500]))
+            loading = self.rand.random() < self.loading_ratio
+            battery = float(self.rand.randint(Drone.MIN_FLIGHT_BATTERY if loading else 0, 100))
+            registered = self.now - timedelta(days=self.flights + 1)
+            drones.append((drone_id, '{}-{:08d}'.format(self.prefix, i), self.rand.choice(self.models), weight_limit,
+                           battery, 'LOADING' if loading else 'IDLE', self.position(), registered, self.now))
+
+            for number in range(self.flights + loading):
+                delivered = number < self.flights
+                created = self.now - timedelta(days=self.flights - number) if delivered else self.now
+                medication_ids, weight = self.pick_loads(weight_limit)
+                flights.append((
+                    flight_id, drone_id,
+                    created + timedelta(hours=1) if delivered else None,
+                    created + timedelta(hours=2) if delivered else None,
+                    delivered, weight, created, created))
+                loads.extend((flight_id, medication_id, 1, created, created) for medication_id in medication_ids)
+                flight_id += 1
+        return drones, flights, loads
+
+
+def seed_fleet(drones=1000, medications=100, flights=5, loads=3, status_logs=100, seed=0, prefix='SEED',
+               batch_size=50000, log=None):
+    """
+    Generates a fleet in a transaction and returns the rows, seconds and rows per second of each table
+    """
+
+    counts = {model: [0, 0.0] for model in (Medication, Drone, Flight, Load, DroneStatusLog)}
+
+    def insert(model, field_names, rows):
+        start = perf_counter()
+        counts[model][0] += insert_rows(model, field_names, rows, batch_size)
+        counts[model][1] += perf_counter() - start
+
+    generator = FleetGenerator(seed, prefix, flights, loads)
+    with transaction.atomic():
+        first_drone_id, first_flight_id = next_id(Drone), next_id(Flight)
+        insert(Medication, generator.MEDICATION_FIELDS, generator.medication_rows(medications, next_id(Medication)))
+
+        flight_id = first_flight_id
+        for first in range(0, drones, DRONES_CHUNK_SIZE):
+            drone_rows, flight_rows, load_rows = generator.fleet_rows(
+                first, min(DRONES_CHUNK_SIZE, drones - first), first_drone_id, flight_id)
+            insert(Drone, generator.DRONE_FIELDS, drone_rows)
+            insert(Flight, generator.FLIGHT_FIELDS, flight_rows)
+            insert(Load, generator.LOAD_FIELDS, load_rows)
+            flight_id += len(flight_rows)
+            if log:
+                log('{} drones generated'.format(first + len(drone_rows)))
+
+        drone_ids = range(first_drone_id, first_drone_id + drones)
+        insert(DroneStatusLog, ('drone_rel', 'current_battery', 'created', 'updated'),
+               generate_status_logs(drone_ids, status_logs, seed, generator.now))
+        reset_sequences([Medication, Drone, Flight])
+
+    return [
+        {
+            'table': model._meta.db_table,
+            'rows': rows,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(rows / seconds) if seconds else None,
+        }
+        for model, (rows, seconds) in counts.items()
+    ]
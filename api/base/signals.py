@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from base.cache import invalidate_drones, invalidate_medications
+from base.events import publish_drone_events, state_event
+from base.images import is_processed
+from base.models import Drone, Flight, Load, Medication
+from base.tasks import process_medication_image_task
+
+
+@receiver([post_save, post_delete], sender=Medication)
+def invalidate_medication_cache(sender, instance, **kwargs):
+    """
+    Removes a saved or deleted medication from the cache, again once the transaction commits
+    so responses cached by other requests before the commit are not kept
+    """
+
+    invalidate_medications([instance.pk])
+    transaction.on_commit(lambda: invalidate_medications([instance.pk]))
+
+
+@receiver(post_save, sender=Medication)
+def rebuild_open_flights_load_weight(sender, instance, created, **kwargs):
+    """
+    Recomputes the load weight of the open flights carrying a medication when its weight changes
+    """
+
+    stored_weight = getattr(instance, '_stored_weight', None)
+    instance._stored_weight = instance.weight
+    if created or stored_weight == instance.weight:
+        return
+
+    if Flight.objects.filter(was_delivered=False, loads_rel__medication_rel=instance).rebuild_load_weight():
+        transaction.on_commit(invalidate_drones)
+
+
+@receiver(post_save, sender=Medication)
+def process_medication_image(sender, instance, **kwargs):
+    """
+    Generates the variants of a new image of a medication in the background, once the transaction commits
+    """
+
+    if instance.image and not is_processed(instance.image.name, instance.image_variants):
+        transaction.on_commit(lambda: process_medication_image_task.delay(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Drone)
+@receiver([post_save, post_delete], sender=Flight)
+@receiver([post_save, post_delete], sender=Load)
+def invalidate_drones_version(sender, instance, **kwargs):
+    """
+    Starts a new version of the drones resources once the transaction writing a drone, a flight or a load commits
+    """
+
+    transaction.on_commit(invalidate_drones)
+
+
+@receiver(post_save, sender=Drone)
+def publish_drone_state(sender, instance, created, **kwargs):
+    """
+    Publishes the state and battery of a drone when they change, once the transaction commits
+    """
+
+    status = (instance.state, instance.battery_capacity)
+    if not created and getattr(instance, '_stored_status', None) == status:
+        return
+    instance._stored_status = status
+
+    event = state_event(instance.pk, *status)
+    transaction.on_commit(lambda: publish_drone_events([event]))
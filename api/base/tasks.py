@@ -1,20 +1,118 @@
+from datetime import timedelta
+from itertools import islice
+
 from celery import shared_task
 from celery.utils.log import get_task_logger
 
-from base.models import Drone, DroneStatusLog
+from django.conf import settings
+from django.utils import timezone
+
+from base.events import battery_event, publish_drone_events
+from base.images import FAILED, process_medication_image
+from base.models import Drone, DroneBatteryRollup, DroneStatusLog
+from base.partitions import create_partitions, drop_partitions_before
+from base.rollups import rollup_days, rollup_hours
+from base.telemetry_stream import flush
 
 logger = get_task_logger(__name__)
 
 @shared_task
-def check_drone_battery_task():
-    for drone in Drone.objects.all():
-        message = 'Drone {} have a battery capacity of {}'.format(drone.serial_number, drone.battery_capacity)
-        if drone.battery_capacity >= 25:
-            logger.info(message)
-        else:
-            logger.warning(message)
-
-        DroneStatusLog.objects.create(
-            drone_rel=drone,
-            current_battery=drone.battery_capacity
-        )
\ No newline at end of file
+def check_drone_battery_task(chunk_size=None):
+    """
+    Logs the battery capacity and the position of every drone on the fleet.
+    Drones are streamed from the database in chunks and the status log rows
+    of each chunk are written with a single bulk insert and pushed to the
+    drone events websocket with a single message. Drones with low battery
+    are reported with one aggregated warning per chunk.
+    """
+
+    chunk_size = chunk_size or settings.DRONE_BATTERY_LOG_CHUNK_SIZE
+    drones = Drone.objects.order_by().values_list(
+        'id', 'serial_number', 'battery_capacity', 'position'
+    ).iterator(chunk_size=chunk_size)
+
+    total = 0
+    while True:
+        chunk = list(islice(drones, chunk_size))
+        if not chunk:
+            break
+
+        DroneStatusLog.objects.bulk_create(
+            [DroneStatusLog(drone_rel_id=pk, current_battery=battery, position=position)
+             for pk, _, battery, position in chunk],
+            batch_size=chunk_size
+        )
+
+        publish_drone_events([battery_event(pk, battery) for pk, _, battery, _ in chunk])
+
+        low_battery = [
+            '{} ({})'.format(serial_number, battery)
+            for _, serial_number, battery, _ in chunk
+            if battery < Drone.MIN_FLIGHT_BATTERY
+        ]
+        if low_battery:
+            logger.warning('{} drones have a battery capacity lower than {}: {}'.format(
+                len(low_battery), Drone.MIN_FLIGHT_BATTERY, ', '.join(low_battery)))
+        total += len(chunk)
+
+    logger.info('Battery capacity logged for {} drones'.format(total))
+    return total
+
+
+@shared_task
+def maintain_drone_status_log_task():
+    """
+    Rolls up the drone status logs into hourly and daily battery aggregates,
+    creates the status log partitions of the next days and drops the partitions
+    older than the retention window.
+    """
+
+    now = timezone.now()
+    # rolled up periods are never aggregated again, they must not miss logs still being committed
+    rolled_up_until = now - timedelta(minutes=settings.DRONE_BATTERY_ROLLUP_LAG_MINUTES)
+    hours = rollup_hours(rolled_up_until)
+    days = rollup_days(rolled_up_until)
+
+    created = create_partitions(now.date(), settings.DRONE_STATUS_LOG_PARTITIONS_AHEAD)
+    dropped = drop_partitions_before(now.date() - timedelta(days=settings.DRONE_STATUS_LOG_RETENTION_DAYS))
+    DroneBatteryRollup.objects.filter(
+        period='hour',
+        period_start__lt=now - timedelta(days=settings.DRONE_BATTERY_HOURLY_ROLLUP_RETENTION_DAYS)
+    ).delete()
+
+    logger.info('Status log maintenance: {} hourly and {} daily rollups, partitions created {} and dropped {}'.format(
+        hours, days, [str(day) for day in created], [str(day) for day in dropped]))
+
+
+@shared_task
+def flush_telemetry_stream_task(batch_size=None, max_batches=None):
+    """
+    Applies the telemetry appended to the Redis stream in stream mode.
+    Entries are applied by batches, one transaction each, until the stream is
+    drained. Runs are skipped while another flush holds the lock.
+    """
+
+    totals = flush(batch_size, max_batches)
+    if totals is None:
+        logger.info('Telemetry stream flush skipped, another flush is running')
+    elif totals['entries'] or totals['duplicates']:
+        logger.info('Telemetry stream flushed: {} entries in {} batches, {} reports, {} drones updated, '
+                    '{} status logs, {} duplicated entries skipped'.format(
+                        totals['entries'], totals['batches'], totals['received'], totals['updated'],
+                        totals['logged'], totals['duplicates']))
+    return totals
+
+
+@shared_task
+def process_medication_image_task(pk, force=False):
+    """
+    Generates the thumbnails and the WebP version of the image of a
+    medication, started when a medication is saved with a new image.
+    """
+
+    result = process_medication_image(pk, force=force)
+    if result == FAILED:
+        logger.warning('The image of medication {} cannot be read'.format(pk))
+    else:
+        logger.info('Image of medication {}: {}'.format(pk, result))
+    return result
@@ -0,0 +1,171 @@
+"""
+Bulk telemetry of the ground stations: battery, state and position reports of many drones at once.
+A batch is validated in one pass and applied with a fixed number of queries for each chunk of
+reports: the reported drones are read and locked with one query, only the drones whose battery, state or
+position changed are written (one UPDATE ... FROM (VALUES ...) on PostgreSQL, executemany elsewhere)
+and the status logs are inserted with one bulk insert (COPY on PostgreSQL).
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from base.cache import invalidate_drones
+from base.events import publish_drone_events, state_event
+from base.geo import parse_position, to_point
+from base.models import Drone, DroneStatusLog
+from base.seeding import insert_rows
+
+STATES = {choice[0] for choice in Drone.STATE_CHOICES}
+SERIAL_NUMBER_MAX_LENGTH = Drone._meta.get_field('serial_number').max_length
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_reports(items):
+    """
+    Returns the reports of a list of items and the errors of the invalid items (index and details).
+    Each item has the serial_number of a drone and at least one of its battery_capacity, state and
+    position (GeoJSON point), when a drone is reported more than once its last values are kept.
+    Positions are kept as (longitude, latitude).
+    """
+
+    if not isinstance(items, list):
+        return {}, [{'index': None, 'details': _('Expected a list of reports')}]
+    if len(items) > settings.DRONE_TELEMETRY_MAX_REPORTS:
+        return {}, [{'index': None, 'details': _('Too many reports, the limit is {}').format(
+            settings.DRONE_TELEMETRY_MAX_REPORTS)}]
+
+    reports = {}
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'details': _('Expected an object')})
+            continue
+        serial_number = item.get('serial_number')
+        battery = item.get('battery_capacity')
+        state = item.get('state')
+        position = item.get('position')
+        if not isinstance(serial_number, str) or not 0 < len(serial_number) <= SERIAL_NUMBER_MAX_LENGTH:
+            errors.append({'index': index, 'details': _('Invalid serial_number')})
+            continue
+        if battery is None and state is None and position is None:
+            errors.append({'index': index, 'details': _('battery_capacity, state or position is required')})
+            continue
+        if battery is not None and (not _is_number(battery) or not 0 <= battery <= 100):
+            errors.append({'index': index, 'details': _('Invalid battery_capacity')})
+            continue
+        if state is not None and state not in STATES:
+            errors.append({'index': index, 'details': _('Invalid state')})
+            continue
+        if position is not None:
+            try:
+                position = parse_position(position)
+            except ValueError as error:
+                errors.append({'index': index, 'details': _('Invalid position: {}').format(error)})
+                continue
+
+        report = reports.setdefault(serial_number, {})
+        if battery is not None:
+            report['battery_capacity'] = float(battery)
+        if state is not None:
+            report['state'] = state
+        if position is not None:
+            report['position'] = position
+    return reports, errors
+
+
+def _update_drones(changed, now):
+    """
+    Writes the battery, state and position of the changed drones: list of (pk, state, battery, position)
+    """
+
+    table = connection.ops.quote_name(Drone._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'UPDATE {table} SET state = report.state, battery_capacity = report.battery_capacity, '
+                'position = report.position, updated = %s '
+                'FROM (VALUES {values}) AS report (id, state, battery_capacity, position) '
+                'WHERE {table}.id = report.id'.format(
+                    table=table, values=', '.join(
+                        ['(%s::bigint, %s::varchar, %s::double precision, %s::geography)'] * len(changed))),
+                [now] + [value for pk, state, battery, position in changed
+                         for value in (pk, state, battery, position.ewkt if position else None)])
+        else:
+            # a prepared statement run for each drone, bulk_update builds a CASE for each row that is slower to compile
+            updated = Drone._meta.get_field('updated').get_db_prep_save(now, connection)
+            position_field = Drone._meta.get_field('position')
+            cursor.executemany(
+                'UPDATE {} SET state = %s, battery_capacity = %s, position = {}, updated = %s WHERE id = %s'.format(
+                    table, connection.ops.get_geom_placeholder(position_field, None, None)),
+                [(state, battery, position_field.get_db_prep_save(position, connection), updated, pk)
+                 for pk, state, battery, position in changed])
+
+
+def apply_reports(reports, log=False, readings=None):
+    """
+    Applies the reports (serial number -> battery_capacity, state and/or position) in a transaction and
+    returns the counts of the batch. With log a status log is appended for each reported drone, readings
+    (serial number -> list of (battery_capacity or None, position or None, time)) append status logs at
+    given times. State changes are published once the transaction commits.
+    """
+
+    # the drones are locked in the order of their serial numbers through all the chunks, so concurrent
+    # batches wait for each other instead of deadlocking
+    serial_numbers = sorted(reports)
+    readings = readings or {}
+    chunk_size = settings.DRONE_TELEMETRY_CHUNK_SIZE
+    now = timezone.now()
+    result = {'received': len(reports), 'updated': 0, 'unchanged': 0, 'logged': 0, 'unknown': []}
+    events = []
+
+    with transaction.atomic():
+        for start in range(0, len(serial_numbers), chunk_size):
+            chunk = serial_numbers[start:start + chunk_size]
+            # locked until the transaction ends, all the columns are written back with the values read here
+            drones = {
+                serial_number: (pk, state, battery, position)
+                for pk, serial_number, state, battery, position in Drone.objects.filter(serial_number__in=chunk)
+                .select_for_update().order_by('serial_number')
+                .values_list('pk', 'serial_number', 'state', 'battery_capacity', 'position')
+            }
+
+            changed = []
+            logs = []
+            for serial_number in chunk:
+                if serial_number not in drones:
+                    result['unknown'].append(serial_number)
+                    continue
+                pk, state, battery, position = drones[serial_number]
+                report = reports[serial_number]
+                new_state = report.get('state', state)
+                new_battery = report.get('battery_capacity', battery)
+                new_position = to_point(report['position']) if 'position' in report else position
+                moved = 'position' in report and (position is None or position.coords != new_position.coords)
+                if (new_state, new_battery) != (state, battery) or moved:
+                    changed.append((pk, new_state, new_battery, new_position))
+                if (new_state, new_battery) != (state, battery):
+                    events.append(state_event(pk, new_state, new_battery))
+                if log:
+                    logs.append((pk, new_battery, new_position, now, now))
+                for reading_battery, reading_position, time in readings.get(serial_number, ()):
+                    logs.append((pk, new_battery if reading_battery is None else reading_battery,
+                                 new_position if reading_position is None else to_point(reading_position), time, time))
+
+            if changed:
+                _update_drones(changed, now)
+            result['logged'] += insert_rows(
+                DroneStatusLog, ('drone_rel', 'current_battery', 'position', 'created', 'updated'), logs)
+            result['updated'] += len(changed)
+            result['unchanged'] += len(drones) - len(changed)
+
+        # bulk updates send no signals, the changes are published here
+        transaction.on_commit(lambda: publish_drone_events(events))
+        if result['updated']:
+            transaction.on_commit(invalidate_drones)
+
+    return result
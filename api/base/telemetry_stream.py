@@ -0,0 +1,217 @@
+"""
+Write-behind buffer of the telemetry: in stream mode the validated reports of a request are appended
+to a Redis stream as one entry and acknowledged right away, the flush task drains the stream in
+batches and applies them with apply_reports, so the database is not on the path of the requests.
+Entries are delivered at least once: they are read through a consumer group and acknowledged
+after the transaction that applies them commits, entries of a failed flush stay pending and are
+claimed again by the next flush. The id of the last applied entry is saved in the same
+transaction, entries at or before it were already applied and are skipped.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+
+import redis
+from redis.exceptions import LockNotOwnedError
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from base.models import TelemetryStreamCheckpoint
+from base.telemetry import apply_reports
+
+logger = logging.getLogger(__name__)
+
+STREAM = 'drones:telemetry'
+GROUP = 'drones:telemetry:flush'
+CONSUMER = 'flush'
+LOCK_KEY = 'drones:telemetry:lock'
+STATS_KEY = 'drones:telemetry:stats'
+STATS = ('flushes', 'entries', 'reports', 'duplicates', 'rejected')
+
+_client = None
+
+
+class StreamFull(Exception):
+    """
+    Raised when the stream holds more entries than DRONE_TELEMETRY_STREAM_MAX_LENGTH
+    """
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.DRONE_TELEMETRY_STREAM_REDIS_URL)
+    return _client
+
+
+def parse_id(entry_id):
+    """
+    Returns the milliseconds and sequence of a stream entry id, ids are compared as these tuples
+    """
+
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode()
+    milliseconds, sequence = entry_id.split('-')
+    return int(milliseconds), int(sequence)
+
+
+def append_reports(reports, log=False):
+    """
+    Appends the reports (serial number -> battery_capacity and/or state) to the stream as one entry
+    and returns its id, raises StreamFull when the flush is too far behind
+    """
+
+    client = get_client()
+    if client.xlen(STREAM) >= settings.DRONE_TELEMETRY_STREAM_MAX_LENGTH:
+        client.hincrby(STATS_KEY, 'rejected')
+        raise StreamFull()
+    entry_id = client.xadd(STREAM, {'reports': json.dumps(reports), 'log': '1' if log else '0'})
+    return entry_id.decode()
+
+
+def _ensure_group(client):
+    try:
+        client.xgroup_create(STREAM, GROUP, id='0', mkstream=True)
+    except redis.ResponseError as error:
+        if 'BUSYGROUP' not in str(error):
+            raise
+
+
+def _read_batch(client, batch_size):
+    """
+    Returns the entries left pending by a failed flush, or else the next new entries
+    """
+
+    claimed = client.xautoclaim(STREAM, GROUP, CONSUMER, min_idle_time=0, start_id='0-0', count=batch_size)
+    # entries deleted while pending have no fields, they are only acknowledged
+    deleted = [entry_id for entry_id, fields in claimed if not fields]
+    if deleted:
+        client.xack(STREAM, GROUP, *deleted)
+    entries = [(entry_id, fields) for entry_id, fields in claimed if fields]
+    if entries:
+        return entries
+    response = client.xreadgroup(GROUP, CONSUMER, {STREAM: '>'}, count=batch_size)
+    return response[0][1] if response else []
+
+
+def _merge_entries(entries):
+    """
+    Returns the reports of the entries, the last values of each drone win, and the readings of the entries
+    sent with log at the time they were appended
+    """
+
+    reports = {}
+    readings = {}
+    for entry_id, fields in entries:
+        entry_reports = json.loads(fields[b'reports'])
+        log = fields.get(b'log') == b'1'
+        created = datetime.fromtimestamp(parse_id(entry_id)[0] / 1000, tz=timezone.utc)
+        for serial_number, report in entry_reports.items():
+            reports.setdefault(serial_number, {}).update(report)
+            if log:
+                readings.setdefault(serial_number, []).append(
+                    (report.get('battery_capacity'), report.get('position'), created))
+    return reports, readings
+
+
+def flush_batch(client, batch_size):
+    """
+    Applies the next batch of entries and returns the counts of the batch, None when the stream is drained
+    """
+
+    entries = _read_batch(client, batch_size)
+    if not entries:
+        return None
+
+    with transaction.atomic():
+        checkpoint, _ = TelemetryStreamCheckpoint.objects.select_for_update().get_or_create(
+            stream=STREAM, defaults={'last_id': '0-0'})
+        last_id = parse_id(checkpoint.last_id)
+        new_entries = [(entry_id, fields) for entry_id, fields in entries if parse_id(entry_id) > last_id]
+        reports, readings = _merge_entries(new_entries)
+        result = apply_reports(reports, readings=readings)
+        if new_entries:
+            checkpoint.last_id = new_entries[-1][0].decode()
+            checkpoint.save(update_fields=['last_id', 'updated'])
+
+    entry_ids = [entry_id for entry_id, fields in entries]
+    client.xack(STREAM, GROUP, *entry_ids)
+    client.xdel(STREAM, *entry_ids)
+
+    result['entries'] = len(new_entries)
+    result['duplicates'] = len(entries) - len(new_entries)
+    pipeline = client.pipeline()
+    for name, amount in (('flushes', 1), ('entries', len(new_entries)), ('reports', result['received']),
+                         ('duplicates', result['duplicates'])):
+        pipeline.hincrby(STATS_KEY, name, amount)
+    pipeline.execute()
+    return result
+
+
+def flush(batch_size=None, max_batches=None):
+    """
+    Drains the stream by batches of entries and returns the totals, a single flush runs at a time.
+    Returns None when another flush holds the lock.
+    """
+
+    batch_size = batch_size or settings.DRONE_TELEMETRY_STREAM_BATCH_SIZE
+    client = get_client()
+    # the lock holds a token of this flush, it is only released by this flush and not once it expired
+    # and was taken by another one
+    lock = client.lock(LOCK_KEY, timeout=settings.DRONE_TELEMETRY_STREAM_LOCK_TIMEOUT, thread_local=False)
+    if not lock.acquire(blocking=False):
+        return None
+
+    totals = {'batches': 0, 'entries': 0, 'duplicates': 0, 'received': 0, 'updated': 0, 'logged': 0, 'unknown': 0}
+    try:
+        _ensure_group(client)
+        while max_batches is None or totals['batches'] < max_batches:
+            result = flush_batch(client, batch_size)
+            if result is None:
+                break
+            totals['batches'] += 1
+            for name in ('entries', 'duplicates', 'received', 'updated', 'logged'):
+                totals[name] += result[name]
+            totals['unknown'] += len(result['unknown'])
+    finally:
+        try:
+            lock.release()
+        except LockNotOwnedError:
+            logger.warning('The telemetry flush lasted more than its lock timeout of {} seconds'.format(
+                settings.DRONE_TELEMETRY_STREAM_LOCK_TIMEOUT))
+    return totals
+
+
+def get_stream_stats():
+    """
+    Returns the backlog of the stream: entries waiting, entries read and not acknowledged,
+    age in seconds of the oldest entry, last applied entry and the counters of the flushes
+    """
+
+    client = get_client()
+    length = client.xlen(STREAM)
+    try:
+        groups = client.xinfo_groups(STREAM)
+    except redis.ResponseError:
+        groups = []
+    has_group = any(group['name'] in (GROUP, GROUP.encode()) for group in groups)
+    pending = client.xpending(STREAM, GROUP)['pending'] if has_group else 0
+    oldest = client.xrange(STREAM, count=1)
+    lag = round(time.time() - parse_id(oldest[0][0])[0] / 1000, 3) if oldest else 0
+    checkpoint = TelemetryStreamCheckpoint.objects.filter(stream=STREAM).values_list('last_id', flat=True).first()
+    counters = client.hgetall(STATS_KEY)
+    return {
+        'length': length,
+        'pending': pending,
+        'lag_seconds': max(lag, 0),
+        'max_length': settings.DRONE_TELEMETRY_STREAM_MAX_LENGTH,
+        'last_id': checkpoint,
+        **{name: int(counters.get(name.encode(), 0)) for name in STATS},
+    }
+
+
+def reset_stats():
+    get_client().delete(STATS_KEY)
@@ -0,0 +1,80 @@
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.test import AsyncClient, TransactionTestCase, override_settings
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from base.models import Drone, Flight, Load, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncReadTests(TransactionTestCase):
+    """
+    The async views run its queries on other threads, so its data must be committed
+    """
+
+    def setUp(self):
+        user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        token = RefreshToken.for_user(user).access_token
+        # the async client takes the header names of the ASGI scope
+        self.headers = {'authorization': f'Bearer {token}'}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.medications = [
+            Medication.objects.create(name='testmedication%02d'%i, code='MED-%02d'%i, weight=10 + i) for i in range(3)
+        ]
+        self.drones = [Drone.objects.create(serial_number='testdrone%02d'%i) for i in range(12)]
+        flight = Flight.objects.create(drone_rel=self.drones[0])
+        for medication in self.medications:
+            Load.objects.create(flight_rel=flight, medication_rel=medication, quantity=2)
+
+    def get(self, url, headers=None):
+        async def get():
+            return await AsyncClient().get(url, **(self.headers if headers is None else headers))
+        return async_to_sync(get)()
+
+    def assertSameResponse(self, async_url, url):
+        logger.debug('Comparing async url %s with %s'%(async_url, url))
+        response = self.get(async_url)
+        reference = self.sync_client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), reference.json())
+
+    def test_same_json(self):
+        """
+        Test that the async endpoints return the same JSON as the API
+        """
+
+        drone, medication = self.drones[0].pk, self.medications[0].pk
+        for name, args, query in [
+            ('drones-list', [], ''),
+            ('drones-list', [], '?page=2&per_page=5'),
+            ('drones-detail', [drone], ''),
+            ('drones-battery', [drone], ''),
+            ('drones-load', [drone], ''),
+            ('medications-list', [], ''),
+            ('medications-detail', [medication], ''),
+        ]:
+            self.assertSameResponse(reverse('async-' + name, args=args) + query, reverse(name, args=args) + query)
+
+    def test_errors(self):
+        """
+        Test the authentication and not found errors of the async endpoints
+        """
+
+        url = reverse('async-drones-detail', args=[self.drones[-1].pk + 1])
+        self.assertEqual(self.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get(reverse('async-drones-list') + '?page=5').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.get(reverse('async-drones-list'), {}).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(reverse('async-drones-list'), {'authorization': 'Bearer bad'}).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
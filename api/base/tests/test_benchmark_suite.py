@@ -0,0 +1,47 @@
+from copy import deepcopy
+
+from django.contrib.auth.models import User
+from django.test import LiveServerTestCase
+
+from base.benchmarks.http import get_token
+from base.benchmarks.suite import cleanup, compare, get_drones, get_medications, run_suite, seed
+from base.models import DroneStatusLog
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class BenchmarkSuiteTests(LiveServerTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+
+    def test_suite(self):
+        """
+        Test that the suite seeds the fleet, drives every endpoint of a live server and compares reports
+        """
+
+        seeded = seed(drones=20, medications=5, status_logs=3)
+        self.assertEqual((seeded['drones'], seeded['medications'], seeded['status_logs']), (20, 5, 60))
+        self.assertEqual(DroneStatusLog.objects.filter(drone_rel__in=get_drones()).count(), 60)
+
+        headers = {'Authorization': 'Bearer {}'.format(get_token(self.live_server_url, 'admin', 'admin'))}
+        report = run_suite(self.live_server_url, self.user, headers, requests=10, concurrency=[1])
+        logger.debug(report)
+
+        self.assertEqual([row['name'] for row in report['endpoints']],
+                         ['drones-list', 'available_for_loading', 'current_load_weight', 'load_addition'])
+        for row in report['endpoints']:
+            self.assertEqual(row['statuses'], '200:10')
+            self.assertGreater(row['queries_per_request'], 0)
+        self.assertEqual(report['battery_task']['drones'], 20)
+
+        self.assertEqual(compare(report, report), [])
+        baseline = deepcopy(report)
+        baseline['endpoints'][0]['queries_per_request'] -= 1
+        baseline['endpoints'][1]['requests_per_second'] *= 2
+        self.assertEqual(len(compare(report, baseline)), 2)
+
+        cleanup()
+        self.assertFalse(get_drones().exists())
+        self.assertFalse(get_medications().exists())
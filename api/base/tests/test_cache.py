@@ -0,0 +1,109 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from base.cache import MEDICATION_KEY, get_medication_versions, get_medications, get_stats
+from base.models import Drone, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MedicationCacheTests(APITestCase):
+    base_url = 'http://127.0.0.1:8000'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        self.client.force_authenticate(self.user)
+        self.medication = Medication.objects.create(name='testmedication01', code='MED-01', weight=10)
+
+    def test_medication_responses(self):
+        """
+        Test that the medications responses are cached until a medication is saved or deleted
+        """
+
+        url = self.base_url + reverse('medications-list')
+        detail_url = self.base_url + reverse('medications-detail', args=[self.medication.pk])
+        logger.debug('Sending TEST data to url: %s'%url)
+        # version of the medications, count and page
+        with self.assertNumQueries(3):
+            first = self.client.get(url, format='json')
+        # only the version of the medications
+        with self.assertNumQueries(1):
+            second = self.client.get(url, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(get_stats()['medications_response'], {'hits': 1, 'misses': 1})
+
+        self.client.get(detail_url, format='json')
+        with self.assertNumQueries(1):
+            self.client.get(detail_url, format='json')
+
+        self.medication.weight = 20
+        self.medication.save()
+        Medication.objects.create(name='testmedication02', code='MED-02', weight=5)
+
+        json = self.client.get(url, format='json').json()
+        self.assertEqual([medication['weight'] for medication in json['medications']], [20, 5])
+        self.assertEqual(self.client.get(detail_url, format='json').json()['medication']['weight'], 20)
+
+        self.medication.delete()
+        self.assertEqual(self.client.get(detail_url, format='json').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(self.client.get(url, format='json').json()['medications']), 1)
+
+    def test_errors_are_not_cached(self):
+        """
+        Test that failed responses are not cached
+        """
+
+        url = self.base_url + reverse('medications-detail', args=[self.medication.pk + 1])
+        self.assertEqual(self.client.get(url, format='json').status_code, status.HTTP_404_NOT_FOUND)
+        Medication.objects.bulk_create([Medication(pk=self.medication.pk + 1, name='testmedication02', code='MED-02')])
+        self.assertEqual(self.client.get(url, format='json').status_code, status.HTTP_200_OK)
+
+    def test_medication_lookup(self):
+        """
+        Test that the load endpoints read the medications from the cache and see its changes
+        """
+
+        self.assertEqual(get_medications([self.medication.pk, self.medication.pk + 1]), {self.medication.pk: self.medication})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_medications([self.medication.pk])[self.medication.pk].weight, 10)
+        self.assertEqual(get_stats()['medication'], {'hits': 1, 'misses': 2})
+
+        drone = Drone.objects.create(serial_number='testdrone01')
+        url = self.base_url + '/drones/{}/load_addition/'.format(drone.pk)
+        self.client.patch(url, {'quantity': 1, 'medication': self.medication.pk}, format='json')
+
+        self.medication.weight = 30
+        self.medication.save()
+        self.client.patch(url, {'quantity': 1, 'medication': self.medication.pk}, format='json')
+
+        response = self.client.get(self.base_url + '/drones/{}/current_load_weight/'.format(drone.pk), format='json')
+        # the load added before the change weighs the new weight too
+        self.assertEqual(response.json()['current_load'], 60)
+
+    def test_stale_medication_is_not_read(self):
+        """
+        Test that a medication read before a change and cached after it is not returned
+        """
+
+        # a request reads the version and the row, then the medication changes before it writes the cache
+        version = get_medication_versions([self.medication.pk])[self.medication.pk]
+        stale = Medication.objects.get(pk=self.medication.pk)
+        self.medication.weight = 30
+        self.medication.save()
+        cache.add(MEDICATION_KEY.format(self.medication.pk, version), stale)
+
+        self.assertEqual(get_medications([self.medication.pk])[self.medication.pk].weight, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_medications([self.medication.pk])[self.medication.pk].weight, 30)
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import perf_counter, sleep
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from base.models import Drone, Flight, Medication
+from base.telemetry import apply_reports
+
+import logging
+logger = logging.getLogger(__name__)
+
+@skipUnless(connection.vendor == 'postgresql', 'Row level locks require PostgreSQL')
+class ConcurrentLoadAdditionTests(TransactionTestCase):
+    base_url = 'http://127.0.0.1:8000'
+    workers = 16
+    requests = 64
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        self.drone = Drone.objects.create(serial_number='testdrone01', weight_limit=500)
+        self.medication = Medication.objects.create(name='testmedication01', code='LLLL-HHHHH', weight=10)
+
+    def add_load(self, _):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        try:
+            url = self.base_url + '/drones/{}/load_addition/'.format(self.drone.id)
+            response = client.patch(url, {'quantity': 2, 'medication': self.medication.id}, format='json')
+            return response.status_code
+        finally:
+            connection.close()
+
+    def hammer_drone(self):
+        """
+        Sends many concurrent load requests to the same drone
+        """
+
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            codes = list(executor.map(self.add_load, range(self.requests)))
+        elapsed = perf_counter() - start
+
+        logger.debug('%d requests in %.2f seconds: %s'%(self.requests, elapsed, codes))
+        self.assertEqual(set(codes) - {200, 400, 409}, set())
+        self.assertLess(elapsed, 30)
+
+        flights = Flight.objects.filter(drone_rel=self.drone, was_delivered=False)
+        self.assertEqual(flights.count(), 1)
+
+        load_weight = Drone.objects.get(pk=self.drone.pk).get_load_weight()
+        self.assertLessEqual(load_weight, self.drone.weight_limit)
+        self.assertEqual(load_weight, codes.count(200) * 20)
+        self.assertEqual(flights.with_wrong_load_weight().count(), 0)
+        return codes
+
+    @override_settings(DRONE_LOAD_LOCK_MODE='nowait')
+    def test_concurrent_load_nowait(self):
+        """
+        Test that concurrent loads never exceed the drone capacity and busy drones fail fast
+        """
+
+        codes = self.hammer_drone()
+        self.assertGreater(codes.count(200), 0)
+
+    @override_settings(DRONE_LOAD_LOCK_MODE='skip_locked')
+    def test_concurrent_load_skip_locked(self):
+        """
+        Test that concurrent loads never exceed the drone capacity when locked drones are skipped
+        """
+
+        codes = self.hammer_drone()
+        self.assertGreater(codes.count(200), 0)
+
+    @override_settings(DRONE_LOAD_LOCK_MODE='wait')
+    def test_concurrent_load_wait(self):
+        """
+        Test that waiting for the lock serializes the loads until the drone is full
+        """
+
+        codes = self.hammer_drone()
+        self.assertEqual(codes.count(200), 25)
+        self.assertEqual(Drone.objects.get(pk=self.drone.pk).state, 'LOADED')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Row level locks require PostgreSQL')
+class ConcurrentTelemetryTests(TransactionTestCase):
+
+    def test_telemetry_keeps_concurrent_state(self):
+        """
+        Test that a battery report applied while a load changes the state of the drone does not write back the old state
+        """
+
+        drone = Drone.objects.create(serial_number='testdrone01')
+        locked = Event()
+
+        def load():
+            try:
+                with transaction.atomic():
+                    loading = Drone.objects.select_for_update().get(pk=drone.pk)
+                    locked.set()
+                    sleep(0.5)
+                    loading.state = 'LOADING'
+                    loading.save()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(load)
+            locked.wait(5)
+            result = apply_reports({'testdrone01': {'battery_capacity': 50}})
+            future.result()
+
+        logger.debug(result)
+        drone.refresh_from_db()
+        self.assertEqual((drone.state, drone.battery_capacity), ('LOADING', 50))
@@ -0,0 +1,139 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from base.models import Drone, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalRequestTests(APITestCase):
+    base_url = 'http://127.0.0.1:8000'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        self.client.force_authenticate(self.user)
+        self.drone = Drone.objects.create(serial_number='testdrone01')
+        self.medication = Medication.objects.create(name='testmedication01', code='MED-01', weight=10)
+
+    def assertNotModified(self, url, **headers):
+        response = self.client.get(url, format='json', **headers)
+        logger.debug('Testing conditional response of %s: %d'%(url, response.status_code))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def assertModified(self, url, **headers):
+        response = self.client.get(url, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        return response
+
+    def test_drones_etag(self):
+        """
+        Test that drone resources return 304 until a drone or its load changes
+        """
+
+        urls = [
+            self.base_url + reverse('drones-list'),
+            self.base_url + reverse('drones-detail', args=[self.drone.pk]),
+            self.base_url + reverse('drones-battery', args=[self.drone.pk]),
+        ]
+        etags = {url: self.assertModified(url)['ETag'] for url in urls}
+        self.assertEqual(len(set(etags.values())), len(urls))
+
+        # user lookup and the version of the drones and flights
+        with self.assertNumQueries(2):
+            self.assertNotModified(urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]])
+        for url in urls:
+            self.assertNotModified(url, HTTP_IF_NONE_MATCH=etags[url])
+
+        self.drone.battery_capacity = 50
+        self.drone.save()
+        for url in urls:
+            etags[url] = self.assertModified(url, HTTP_IF_NONE_MATCH=etags[url])['ETag']
+
+        url = self.base_url + '/drones/{}/load_addition/'.format(self.drone.pk)
+        self.client.patch(url, {'quantity': 1, 'medication': self.medication.pk}, format='json')
+        self.assertModified(urls[1], HTTP_IF_NONE_MATCH=etags[urls[1]])
+
+        Drone.objects.create(serial_number='testdrone02')
+        self.assertModified(urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]])
+
+    def test_drones_last_modified(self):
+        """
+        Test the If-Modified-Since header on drone resources
+        """
+
+        url = self.base_url + reverse('drones-detail', args=[self.drone.pk])
+        # a modification in the last seconds may still be followed by another one in the same second
+        last_modified = self.assertModified(url)['Last-Modified']
+        self.assertModified(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        updated = timezone.now() - timedelta(minutes=1)
+        Drone.objects.filter(pk=self.drone.pk).update(updated=updated)
+        last_modified = self.assertModified(url)['Last-Modified']
+        self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        Drone.objects.filter(pk=self.drone.pk).update(updated=updated + timedelta(seconds=5))
+        self.assertModified(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+    def test_drones_etag_after_late_commit(self):
+        """
+        Test that the ETag changes when a write stamped before the last update commits after it
+        """
+
+        Drone.objects.create(serial_number='testdrone02')
+        url = self.base_url + reverse('drones-list')
+        etag = self.assertModified(url)['ETag']
+
+        # a transaction that set updated before the last update and commits now
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch('django.utils.timezone.now', return_value=self.drone.updated):
+                self.drone.battery_capacity = 50
+                self.drone.save()
+        self.assertModified(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_medications_etag(self):
+        """
+        Test that medication resources return 304 until a medication changes
+        """
+
+        urls = [
+            self.base_url + reverse('medications-list'),
+            self.base_url + reverse('medications-detail', args=[self.medication.pk]),
+        ]
+        etags = {url: self.assertModified(url)['ETag'] for url in urls}
+        for url in urls:
+            self.assertNotModified(url, HTTP_IF_NONE_MATCH=etags[url])
+
+        Medication.objects.create(name='testmedication02', code='MED-02', weight=5)
+        for url in urls:
+            self.assertModified(url, HTTP_IF_NONE_MATCH=etags[url])
+
+    def test_timestamps(self):
+        """
+        Test that created is kept and updated changes on each save
+        """
+
+        created, updated = self.drone.created, self.drone.updated
+        self.drone.state = 'LOADING'
+        self.drone.save()
+        self.drone.refresh_from_db()
+
+        self.assertEqual(self.drone.created, created)
+        self.assertGreater(self.drone.updated, updated)
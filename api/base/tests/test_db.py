@@ -0,0 +1,39 @@
+from unittest import mock
+
+from django.core.signals import request_started
+from django.db import connection
+from django.test import TransactionTestCase
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class ConnectionHealthCheckTests(TransactionTestCase):
+
+    def setUp(self):
+        connection.ensure_connection()
+        self.health_checks = connection.settings_dict.get('CONN_HEALTH_CHECKS')
+
+    def tearDown(self):
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = self.health_checks
+
+    def start_request(self, health_checks, usable):
+        """
+        Starts a request with a persistent connection open and returns whether it was closed
+        """
+
+        connection.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+        with mock.patch.object(connection, 'close_at', None), \
+                mock.patch.object(connection, 'is_usable', return_value=usable), \
+                mock.patch.object(connection, 'close') as close:
+            request_started.send(sender=self.__class__)
+        return close.called
+
+    def test_health_checks(self):
+        """
+        Test that an unusable reused connection is closed before the request when health checks are on
+        """
+
+        self.assertTrue(self.start_request(health_checks=True, usable=False))
+        self.assertFalse(self.start_request(health_checks=True, usable=True))
+        self.assertFalse(self.start_request(health_checks=False, usable=False))
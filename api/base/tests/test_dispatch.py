@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from base.dispatch import pack_orders
+from base.models import Drone, Flight, Load, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+class PackOrdersTests(SimpleTestCase):
+
+    def test_heaviest_orders_go_to_tightest_drone(self):
+        """
+        Test that each order goes to the drone with the smallest capacity that can carry it
+        """
+
+        assignments, unassigned = pack_orders(
+            [('a', 300), ('b', 150), ('c', 200), ('d', 600)],
+            [('small', 200), ('big', 550)],
+        )
+
+        self.assertEqual(assignments, {'a': 'big', 'c': 'small', 'b': 'big'})
+        self.assertEqual(unassigned, ['d'])
+
+    def test_capacity_is_never_exceeded(self):
+        """
+        Test that the orders assigned to a drone never exceed its capacity
+        """
+
+        drones = [(i, 100 + i % 5 * 100) for i in range(50)]
+        orders = [(i, 1 + i * 37 % 150) for i in range(400)]
+        assignments, unassigned = pack_orders(orders, drones)
+
+        loads = {}
+        for order, drone in assignments.items():
+            loads[drone] = loads.get(drone, 0) + dict(orders)[order]
+        for drone, capacity in drones:
+            self.assertLessEqual(loads.get(drone, 0), capacity)
+        self.assertEqual(len(assignments) + len(unassigned), len(orders))
+
+
+    def test_float_weights_fill_the_capacity(self):
+        """
+        Test that orders filling the capacity fit even if the float weights do not add up exactly
+        """
+
+        # 1.1 * 3 is 3.3000000000000003
+        assignments, unassigned = pack_orders([(0, 1.1), (1, 1.1), (2, 1.1)], [('drone', 3.3)])
+        self.assertEqual(assignments, {0: 'drone', 1: 'drone', 2: 'drone'})
+        self.assertEqual(unassigned, [])
+        # 3.3 - (1.1 + 1.1) is 1.0999999999999996
+        self.assertEqual(pack_orders([(0, 1.1)], [('drone', 3.3 - (1.1 + 1.1))]), ({0: 'drone'}, []))
+
+
+class OrdersDispatchTests(APITestCase):
+    base_url = 'http://127.0.0.1:8000'
+
+    def add_user_and_setup_token(self):
+        user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_orders_dispatch(self):
+        """
+        Test that orders are loaded on the available drones respecting battery and capacity
+        """
+
+        self.add_user_and_setup_token()
+        idle = Drone.objects.create(serial_number='testdrone01', weight_limit=100)
+        loading = Drone.objects.create(serial_number='testdrone02', weight_limit=100, state='LOADING')
+        Drone.objects.create(serial_number='testdrone03', weight_limit=500, battery_capacity=10)
+        medication = Medication.objects.create(name='testmedication01', code='LLLL-HHHHH', weight=10)
+        Load.objects.create(flight_rel=Flight.objects.create(drone_rel=loading), medication_rel=medication, quantity=7)
+
+        url = self.base_url + '/drones/orders_dispatch/'
+        data = {
+            'orders': [
+                {'medication': medication.id, 'quantity': 10},
+                {'medication': medication.id, 'quantity': 3},
+                {'medication': medication.id, 'quantity': 20},
+            ],
+        }
+
+        logger.debug('Sending TEST data to url: %s, data: %s'%(url, data))
+        response = self.client.post(url, data, format='json')
+        json = response.json()
+
+        logger.debug('Testing status code response: %s, code: %d'%(json, response.status_code))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json['unassigned'], [{'medication': medication.id, 'quantity': 20}])
+
+        drones = {drone.serial_number: drone for drone in Drone.objects.with_current_load()}
+        self.assertEqual(drones['testdrone01'].current_load, 100)
+        self.assertEqual(drones['testdrone01'].state, 'LOADED')
+        self.assertEqual(drones['testdrone02'].current_load, 100)
+        self.assertEqual(drones['testdrone02'].state, 'LOADED')
+        self.assertEqual(drones['testdrone03'].current_load, 0)
+        self.assertEqual(Load.objects.get(flight_rel__drone_rel=loading).quantity, 10)
+        self.assertEqual(Flight.objects.with_wrong_load_weight().count(), 0)
+        self.assertEqual(idle.flights_rel.count(), 1)
@@ -6,8 +6,15 @@ from rest_framework.test import APITestCase
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from base.models import Drone, Medication
+from django.db import OperationalError
+from django.db.models.query import QuerySet
+from django.utils import timezone
 
+from base.models import Drone, DroneStatusLog, Medication
+
+from datetime import timedelta
+from unittest import mock
+from json import loads
 import logging
 logger = logging.getLogger(__name__)
 
@@ -204,3 +211,225 @@ class DroneViewSetTests(APITestCase):
         self.assertEqual(json["current_load"], 40)
 
 
+    def test_list_drones_current_load(self):
+        """
+        Test that the drone list returns the current load of each drone without extra queries
+        """
+
+        self.add_user_and_setup_token()
+        drone = self.add_test_drone()
+        Drone.objects.create(serial_number='testdrone02')
+        medication = self.add_test_medication()
+
+        url = self.base_url + '/drones/{}/load_addition/'.format(drone.id)
+        response = self.client.patch(url, {'quantity': 3, 'medication': medication.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(Drone.objects.with_current_load().get(pk=drone.pk).current_load, 30)
+
+        url = self.base_url + reverse('drones-list')
+        logger.debug('Sending TEST data to url: %s'%url)
+        # user lookup, version of the drones and flights, count and the page of drones with its loads
+        with self.assertNumQueries(5):
+            response = self.client.get(url, format='json')
+        json = response.json()
+
+        logger.debug('Testing status code response: %s, code: %d'%(json, response.status_code))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        loads = {d['serial_number']: d['current_load'] for d in json['drones']}
+        self.assertEqual(loads, {'testdrone01': 30, 'testdrone02': 0})
+
+    def test_add_load_batch_to_drone(self):
+        """
+        Test adding several medications to a drone in one request
+        """
+
+        self.add_user_and_setup_token()
+        drone = self.add_test_drone()
+        medications = [
+            Medication.objects.create(name='testmedication%02d'%i, code='MED-%02d'%i, weight=5)
+            for i in range(20)
+        ]
+
+        url = self.base_url + '/drones/{}/load_batch_addition/'.format(drone.id)
+        data = {
+            'loads': [{'quantity': 2, 'medication': m.id} for m in medications] + [
+                {'quantity': 1, 'medication': medications[0].id}
+            ],
+        }
+
+        logger.debug('Sending TEST data to url: %s, data: %s'%(url, data))
+        response = self.client.patch(url, data, format='json')
+        json = response.json()
+
+        logger.debug('Testing status code response: %s, code: %d'%(json, response.status_code))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json), 20)
+
+        drone = Drone.objects.with_current_load().get(pk=drone.pk)
+        self.assertEqual(drone.current_load, 205)
+        self.assertEqual(drone.state, 'LOADING')
+
+        logger.debug('Testing that a batch over the drone capacity is rejected as a whole')
+        data = {
+            'loads': [{'quantity': 20, 'medication': m.id} for m in medications[:3]],
+        }
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Drone.objects.with_current_load().get(pk=drone.pk).current_load, 205)
+
+        logger.debug('Testing that the batch fills the drone')
+        data = {
+            'loads': [{'quantity': 59, 'medication': medications[0].id}],
+        }
+        response = self.client.patch(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Drone.objects.get(pk=drone.pk).state, 'LOADED')
+
+    def test_battery_history(self):
+        """
+        Test the battery history of a drone aggregated and paginated by cursor
+        """
+
+        self.add_user_and_setup_token()
+        drone = self.add_test_drone()
+        end = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for i in range(12):
+            log = DroneStatusLog.objects.create(drone_rel=drone, current_battery=100 - i)
+            DroneStatusLog.objects.filter(pk=log.pk).update(created=end - timedelta(minutes=10 * (i + 1)))
+
+        url = self.base_url + '/drones/{}/battery_history/'.format(drone.id)
+        params = {'start': (end - timedelta(hours=3)).isoformat(), 'end': end.isoformat()}
+
+        logger.debug('Sending TEST data to url: %s, data: %s'%(url, params))
+        response = self.client.get(url, {**params, 'bucket': 'hour'})
+        json = loads(b''.join(response.streaming_content))
+
+        logger.debug('Testing status code response: %s, code: %d'%(json, response.status_code))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json['bucket'], 'hour')
+        self.assertEqual([point['samples'] for point in json['points']], [6, 6])
+        self.assertEqual([point['max'] for point in json['points']], [94, 100])
+
+        response = self.client.get(url, {**params, 'max_points': 200})
+        json = loads(b''.join(response.streaming_content))
+        self.assertEqual(json['bucket'], 'minute')
+        self.assertEqual(len(json['points']), 12)
+
+        logger.debug('Testing raw mode pagination')
+        batteries = []
+        cursor = None
+        while True:
+            response = self.client.get(url, {**params, 'bucket': 'raw', 'limit': 5, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            json = loads(b''.join(response.streaming_content))
+            batteries += [point['battery'] for point in json['points']]
+            cursor = json['next']
+            if cursor is None:
+                break
+        self.assertEqual(batteries, [100 - i for i in reversed(range(12))])
+
+        response = self.client.get(url, {**params, 'bucket': 'raw', 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_drones_keyset_pagination(self):
+        """
+        Test walking the drone list with cursors, without counting the drones
+        """
+
+        self.add_user_and_setup_token()
+        Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%02d'%i, battery_capacity=i % 4 * 10) for i in range(25)
+        ])
+
+        url = self.base_url + reverse('drones-list')
+        for params, expected in [
+            ({}, ['testdrone%02d'%i for i in range(25)]),
+            ({'sort[]': '-battery_capacity'}, [
+                'testdrone%02d'%i for i in sorted(range(25), key=lambda i: (-(i % 4), i))
+            ]),
+        ]:
+            serial_numbers = []
+            cursor = ''
+            while cursor is not None:
+                logger.debug('Sending TEST data to url: %s, cursor: %s'%(url, cursor))
+                # user lookup, version of the drones and flights and the page of drones
+                with self.assertNumQueries(4):
+                    response = self.client.get(url, {**params, 'cursor': cursor})
+                json = response.json()
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('total_results', json['meta'])
+                serial_numbers += [d['serial_number'] for d in json['drones']]
+                cursor = json['meta']['next_cursor']
+            self.assertEqual(serial_numbers, expected)
+
+        response = self.client.get(url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_available_for_loading(self):
+        """
+        Test the paginated list of drones available for loading with its remaining capacity
+        """
+
+        self.add_user_and_setup_token()
+        medication = self.add_test_medication()
+        Drone.objects.bulk_create(
+            [Drone(serial_number='testdrone%02d'%i, weight_limit=100 + i) for i in range(15)] +
+            [Drone(serial_number='lowbattery%02d'%i, battery_capacity=10) for i in range(5)] +
+            [Drone(serial_number='delivering%02d'%i, state='DELIVERING') for i in range(5)]
+        )
+        drone = Drone.objects.get(serial_number='testdrone00')
+        url = self.base_url + '/drones/{}/load_addition/'.format(drone.id)
+        self.client.patch(url, {'quantity': 5, 'medication': medication.id}, format='json')
+
+        url = self.base_url + '/drones/available_for_loading/'
+        logger.debug('Sending TEST data to url: %s'%url)
+        # user lookup, version of the drones and flights, count and the page of drones
+        with self.assertNumQueries(5):
+            response = self.client.get(url, format='json')
+        json = response.json()
+
+        logger.debug('Testing status code response: %s, code: %d'%(json, response.status_code))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json['count'], 15)
+        self.assertEqual(len(json['results']), 10)
+        self.assertEqual(json['results'][0]['serial_number'], 'testdrone00')
+        self.assertEqual(json['results'][0]['state'], 'LOADING')
+        self.assertEqual(json['results'][0]['remaining_capacity'], 50)
+        self.assertEqual(json['results'][1]['remaining_capacity'], 101)
+
+        response = self.client.get(url, {'min_capacity': 110}, format='json')
+        json = response.json()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d['serial_number'] for d in json['results']],
+                         ['testdrone%02d'%i for i in range(10, 15)])
+
+        response = self.client.get(url, {'min_capacity': 'a lot'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_load_addition_lock_errors(self):
+        """
+        Test that only a drone locked by another request returns 409 and other database errors are raised
+        """
+
+        self.add_user_and_setup_token()
+        drone = self.add_test_drone()
+        self.add_test_medication()
+        medication = Medication.objects.get()
+        url = self.base_url + '/drones/{}/load_addition/'.format(drone.id)
+
+        def error(pgcode):
+            cause = Exception()
+            cause.pgcode = pgcode
+            e = OperationalError()
+            e.__cause__ = cause
+            return e
+
+        with mock.patch.object(QuerySet, 'first', side_effect=error('55P03')):
+            response = self.client.patch(url, {'quantity': 1, 'medication': medication.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        # a statement timeout
+        with mock.patch.object(QuerySet, 'first', side_effect=error('57014')):
+            with self.assertRaises(OperationalError):
+                self.client.patch(url, {'quantity': 1, 'medication': medication.id}, format='json')
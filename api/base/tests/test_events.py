@@ -0,0 +1,137 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from base.dispatch import dispatch_orders
+from base.models import Drone, Medication
+from base.tasks import check_drone_battery_task
+from drones.asgi import application
+
+import logging
+logger = logging.getLogger(__name__)
+
+INMEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CHANNEL_LAYERS=INMEMORY_CHANNEL_LAYERS)
+class DroneEventsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        self.drone = Drone.objects.create(serial_number='testdrone01', battery_capacity=80)
+        self.other_drone = Drone.objects.create(serial_number='testdrone02', battery_capacity=90)
+
+    def connect(self, path='/ws/drones/events/', user=None):
+        communicator = WebsocketCommunicator(application, path, headers=[(b'origin', b'http://127.0.0.1:8000')])
+        # the JWT middleware is tested apart, it needs the database from another thread
+        communicator.scope['user'] = user or self.user
+        return communicator
+
+    def run_and_receive(self, change, path='/ws/drones/events/', count=1):
+        """
+        Connects a client, runs change committing its transaction and returns the messages received
+        """
+
+        async def scenario():
+            communicator = self.connect(path)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            def run_change():
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+            await sync_to_async(run_change)()
+
+            messages = [await communicator.receive_json_from() for _ in range(count)]
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+            return messages
+
+        return async_to_sync(scenario)()
+
+    def test_state_changes(self):
+        """
+        Test that saved state and battery changes are pushed once the transaction commits
+        """
+
+        def change():
+            self.drone.battery_capacity = 50
+            self.drone.save()
+            # saving without changes does not publish
+            self.drone.save()
+
+        messages = self.run_and_receive(change)
+        self.assertEqual(messages, [{'events': [
+            {'event': 'state', 'drone': self.drone.pk, 'state': 'IDLE', 'battery_capacity': 50}
+        ]}])
+
+    def test_filtered_drones(self):
+        """
+        Test that a client subscribed to some drones only receives its events
+        """
+
+        def change():
+            for drone in (self.other_drone, self.drone):
+                drone.state = 'LOADING'
+                drone.save()
+
+        messages = self.run_and_receive(change, '/ws/drones/events/?drones={}'.format(self.drone.pk))
+        self.assertEqual([event['drone'] for message in messages for event in message['events']], [self.drone.pk])
+
+    def test_dispatch_and_battery_task(self):
+        """
+        Test that a dispatch and a battery check publish a single message with all the drones
+        """
+
+        medication = Medication.objects.create(name='testmedication01', code='MED-01', weight=300)
+        orders = [{'medication': medication.pk, 'quantity': 1}] * 2
+
+        def change():
+            dispatch_orders(orders)
+            check_drone_battery_task()
+
+        messages = {message['events'][0]['event']: message for message in self.run_and_receive(change, count=2)}
+        dispatched, battery = messages['state'], messages['battery']
+        self.assertEqual(sorted((event['drone'], event['state']) for event in dispatched['events']),
+                         [(self.drone.pk, 'LOADING'), (self.other_drone.pk, 'LOADING')])
+        self.assertEqual(sorted((event['drone'], event['battery_capacity']) for event in battery['events']),
+                         [(self.drone.pk, 80), (self.other_drone.pk, 90)])
+
+    def test_anonymous_rejected(self):
+        """
+        Test that unauthenticated clients are disconnected
+        """
+
+        async def scenario():
+            communicator = self.connect(user=AnonymousUser())
+            connected, code = await communicator.connect()
+            return connected, code
+
+        self.assertEqual(async_to_sync(scenario)(), (False, 4401))
+
+
+@override_settings(CHANNEL_LAYERS=INMEMORY_CHANNEL_LAYERS)
+class DroneEventsAuthTests(TransactionTestCase):
+
+    def test_jwt_token(self):
+        """
+        Test that websocket clients authenticate with a JWT access token on the query string
+        """
+
+        user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        token = RefreshToken.for_user(user).access_token
+
+        async def connect(token):
+            communicator = WebsocketCommunicator(
+                application, '/ws/drones/events/?token={}'.format(token),
+                headers=[(b'origin', b'http://127.0.0.1:8000')])
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        self.assertTrue(async_to_sync(connect)(token))
+        self.assertFalse(async_to_sync(connect)('not-a-token'))
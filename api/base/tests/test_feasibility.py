@@ -0,0 +1,171 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from base.dispatch import dispatch_orders
+from base.feasibility import Fleet, distances_km, max_payloads, rank_pairs
+from base.geo import SRID
+from base.models import Drone, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+# 0.1 degrees of longitude on the equator
+DISTANCE_KM = 11.1195
+
+
+class FeasibilityEngineTests(SimpleTestCase):
+
+    def get_fleet(self):
+        """
+        Four drones at the origin, one of each model, and a drone with low battery
+        """
+
+        return Fleet([1, 2, 3, 4, 5], [0, 1, 2, 3, 0], [100, 100, 100, 100, 30], [500, 500, 500, 500, 100],
+                     [0, 0, 0, 0, 50], [0] * 5, [0] * 5)
+
+    def test_distances(self):
+        """
+        Test the great circle distances of the engine
+        """
+
+        distances = distances_km([0, 0, -73.98], [0, 0, 40.75], [0.1, 0, -118.24], [0, 0, 34.05])
+        self.assertAlmostEqual(distances[0], DISTANCE_KM, places=3)
+        self.assertEqual(distances[1], 0)
+        # New York to Los Angeles
+        self.assertAlmostEqual(distances[2], 3936, delta=5)
+
+    def test_rank_pairs(self):
+        """
+        Test that the pairs are estimated with the consumption of each model and ranked by margin
+        """
+
+        ranking = rank_pairs(self.get_fleet(), [(0.1, 0, 0), (0.1, 0, 50)], reserve=10)
+        logger.debug(ranking)
+        self.assertEqual(ranking['evaluated'], 10)
+        # the drone with low battery can fly empty only, 30 - 10 - 2 * 11.12 is below 0
+        self.assertEqual(ranking['feasible'], 8)
+        self.assertEqual(ranking['drones'].tolist(), [1, 1, 2, 2, 3, 3, 4, 4])
+        self.assertEqual(ranking['destinations'].tolist(), [0, 1, 0, 1, 0, 1, 0, 1])
+        self.assertAlmostEqual(ranking['energy'][0], 2 * DISTANCE_KM, places=2)
+        self.assertAlmostEqual(ranking['margins'][0], 90 - 2 * DISTANCE_KM, places=2)
+        self.assertAlmostEqual(ranking['energy'][1], 2.4 * DISTANCE_KM, places=2)
+        self.assertEqual(sorted(ranking['margins'], reverse=True), ranking['margins'].tolist())
+
+        best = rank_pairs(self.get_fleet(), [(0.1, 0, 0), (0.1, 0, 50)], limit=3, reserve=10)
+        self.assertEqual(best['feasible'], 8)
+        self.assertEqual(best['drones'].tolist(), [1, 1, 2])
+
+    def test_rank_pairs_by_chunks(self):
+        """
+        Test that ranking the pairs by chunks of drones returns the same best pairs and feasible count
+        """
+
+        fleet = Fleet(list(range(1, 41)), [i % 4 for i in range(40)], [30 + i for i in range(40)], [500] * 40,
+                      [0] * 40, [0] * 40, [0] * 40)
+        destinations = [(0.1, 0, 0), (0.2, 0, 50), (0.05, 0.05, 200)]
+        expected = rank_pairs(fleet, destinations, reserve=10)
+        # chunks of 3 drones
+        with mock.patch('base.feasibility.PAIRS_CHUNK_SIZE', 9):
+            for limit in (1, 5, 12, 200):
+                ranking = rank_pairs(fleet, destinations, limit=limit, reserve=10)
+                self.assertEqual(ranking['feasible'], expected['feasible'])
+                self.assertEqual(ranking['drones'].tolist(), expected['drones'][:limit].tolist())
+                self.assertEqual(ranking['destinations'].tolist(), expected['destinations'][:limit].tolist())
+            self.assertEqual(rank_pairs(fleet, destinations, limit=0, reserve=10)['drones'].tolist(), [])
+
+    def test_weight_limit(self):
+        """
+        Test that the current load counts in the payload and pairs over the weight limit are not feasible
+        """
+
+        fleet = Fleet([1], [0], [100], [100], [60], [0], [0])
+        self.assertEqual(rank_pairs(fleet, [(0, 0, 40)], reserve=10)['feasible'], 1)
+        self.assertEqual(rank_pairs(fleet, [(0, 0, 41)], reserve=10)['feasible'], 0)
+        self.assertEqual(rank_pairs(fleet, [])['evaluated'], 0)
+
+    def test_max_payloads(self):
+        """
+        Test the largest payload each drone can take to a destination
+        """
+
+        payloads = max_payloads(self.get_fleet(), 0.1, 0, reserve=10)
+        logger.debug(payloads)
+        self.assertEqual(payloads[:4].tolist(), [500, 500, 500, 500])
+        self.assertLess(payloads[4], 0)
+        # Lightweight: 100 - 50 = 11.12 * (2 + 0.8 * payload / 100)
+        payloads = max_payloads(self.get_fleet(), 0.1, 0, reserve=50)
+        self.assertAlmostEqual(payloads[0], (50 / DISTANCE_KM - 2) * 100 / 0.8, delta=0.1)
+        self.assertAlmostEqual(payloads[3], (50 / DISTANCE_KM - 4) * 100 / 0.35, delta=0.1)
+        self.assertEqual(max_payloads(self.get_fleet(), 0, 0, reserve=10).tolist(), [500, 500, 500, 500, 100])
+
+
+class FeasibilityTests(TestCase):
+    base_url = 'http://127.0.0.1:8000'
+    url = base_url + '/drones/feasibility/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.light = Drone.objects.create(serial_number='testdrone01', position=Point(0, 0, srid=SRID))
+        self.heavy = Drone.objects.create(serial_number='testdrone02', model='Heavyweight', battery_capacity=60,
+                                          position=Point(0, 0, srid=SRID))
+        self.busy = Drone.objects.create(serial_number='testdrone03', state='DELIVERING',
+                                         position=Point(0, 0, srid=SRID))
+        Drone.objects.create(serial_number='testdrone04')
+
+    def test_feasibility(self):
+        """
+        Test that the feasible pairs of the available drones are ranked by margin
+        """
+
+        response = self.client.post(self.url, {'destinations': [
+            {'position': {'type': 'Point', 'coordinates': [0.1, 0]}},
+            {'position': {'type': 'Point', 'coordinates': [0.1, 0]}, 'weight': 400},
+        ]}, format='json')
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['evaluated'], response.data['feasible']), (4, 3))
+        pairs = response.data['pairs']
+        self.assertEqual([(pair['drone'], pair['destination']) for pair in pairs],
+                         [(self.light.pk, 0), (self.light.pk, 1), (self.heavy.pk, 0)])
+        self.assertAlmostEqual(pairs[0]['distance'], DISTANCE_KM * 1000, delta=1)
+        self.assertAlmostEqual(pairs[0]['margin'], 90 - 2 * DISTANCE_KM, places=2)
+
+        response = self.client.post(self.url, {
+            'destinations': [{'position': {'type': 'Point', 'coordinates': [0.1, 0]}}],
+            'drones': [self.busy.pk], 'limit': 1,
+        }, format='json')
+        self.assertEqual([pair['drone'] for pair in response.data['pairs']], [self.busy.pk])
+
+    def test_invalid_payload(self):
+        """
+        Test that invalid destinations and limits are rejected
+        """
+
+        for data in ({}, {'destinations': []}, {'destinations': [{'position': [0, 0]}]},
+                     {'destinations': [{'position': {'type': 'Point', 'coordinates': [0, 0]}, 'weight': -1}]},
+                     {'destinations': [{'position': {'type': 'Point', 'coordinates': [0, 0]}}], 'limit': 0}):
+            response = self.client.post(self.url, data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dispatch_to_destination(self):
+        """
+        Test that dispatching to a destination loads each drone with the payload it can fly there and back
+        """
+
+        medication = Medication.objects.create(name='testmedication01', code='LLLL-HHHHH', weight=100)
+        orders = [{'medication': medication.pk, 'quantity': 1} for _ in range(8)]
+        # the heavy drone can take (50 / 11.12 - 4) * 100 / 0.35 = 142 units there
+        result = dispatch_orders(orders, Point(0.1, 0, srid=SRID))
+        logger.debug(result)
+        loads = {assignment['drone']: sum(load['quantity'] for load in assignment['loads'])
+                 for assignment in result['assignments']}
+        self.assertEqual(loads, {self.light.pk: 5, self.heavy.pk: 1})
+        self.assertEqual(len(result['unassigned']), 2)
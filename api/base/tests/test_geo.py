@@ -0,0 +1,151 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from base.geo import SRID
+from base.models import Drone, DroneStatusLog, Flight
+from base.tasks import check_drone_battery_task
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class DronePositionTests(TestCase):
+    base_url = 'http://127.0.0.1:8000'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.drone = Drone.objects.create(serial_number='testdrone01')
+
+    def test_position_geojson(self):
+        """
+        Test that the position is written and read as a GeoJSON point by the drones endpoints
+        """
+
+        url = self.base_url + '/drones/{}/'.format(self.drone.pk)
+        position = {'type': 'Point', 'coordinates': [-73.98, 40.75]}
+        response = self.client.patch(url, {'position': position}, format='json')
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.drone.refresh_from_db()
+        self.assertEqual(self.drone.position.coords, (-73.98, 40.75))
+
+        self.assertEqual(self.client.get(url).data['drone']['position'], position)
+        self.assertEqual(self.client.get(self.base_url + '/drones/').data['drones'][0]['position'], position)
+
+        for invalid in ({'type': 'Point', 'coordinates': [-200, 40]}, {'type': 'LineString'}, [1, 2]):
+            response = self.client.patch(url, {'position': invalid}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_position_trail(self):
+        """
+        Test that the status logs keep the trail of the positions reported by telemetry and the battery task
+        """
+
+        response = self.client.post(self.base_url + '/drones/telemetry/?log=true', [
+            {'serial_number': 'testdrone01', 'position': {'type': 'Point', 'coordinates': [-73.98, 40.75]}},
+        ], format='json')
+        logger.debug(response.data)
+        self.assertEqual(response.data['updated'], 1)
+        response = self.client.post(self.base_url + '/drones/telemetry/', [
+            {'serial_number': 'testdrone01', 'position': {'type': 'Point', 'coordinates': [-73.97, 40.76]}},
+        ], format='json')
+        self.assertEqual(response.data['updated'], 1)
+        check_drone_battery_task()
+
+        self.drone.refresh_from_db()
+        self.assertEqual(self.drone.position.coords, (-73.97, 40.76))
+        self.assertEqual([log.position.coords for log in DroneStatusLog.objects.order_by('pk')],
+                         [(-73.98, 40.75), (-73.97, 40.76)])
+
+    def test_nearest_parameters(self):
+        """
+        Test that the nearest drones endpoint requires a valid point and number of drones
+        """
+
+        url = self.base_url + '/drones/available_for_loading/nearest/'
+        for parameters in ({}, {'longitude': 1}, {'longitude': 'a', 'latitude': 1}, {'longitude': 1, 'latitude': 91},
+                           {'longitude': 1, 'latitude': 1, 'k': 0}, {'longitude': 1, 'latitude': 1, 'k': 101},
+                           {'longitude': 1, 'latitude': 1, 'min_capacity': 'a'}):
+            response = self.client.get(url, parameters)
+            logger.debug(response.data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Positions are queried with PostGIS')
+class NearestDronesTests(TestCase):
+    base_url = 'http://127.0.0.1:8000'
+    url = base_url + '/drones/available_for_loading/nearest/'
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Places a grid of drones, one every 0.01 degrees, where only one in four is available for loading
+        """
+
+        states = ['IDLE', 'DELIVERING', 'RETURNING', 'DELIVERING']
+        Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%03d%03d' % (x, y), state=states[(x + y) % len(states)],
+                  position=Point(x / 100, y / 100, srid=SRID))
+            for x in range(100) for y in range(100)
+        ], batch_size=5000)
+        # drones without position and with low battery are never returned
+        Drone.objects.create(serial_number='testdrone-nowhere')
+        Drone.objects.create(serial_number='testdrone-low', battery_capacity=10, position=Point(0.5, 0.5, srid=SRID))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_nearest_available(self):
+        """
+        Test that the k nearest drones available for loading are returned from the nearest one
+        """
+
+        response = self.client.get(self.url, {'longitude': 0.5, 'latitude': 0.5, 'k': 5})
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        drones = response.json()
+        self.assertEqual(len(drones), 5)
+        self.assertEqual(drones[0]['serial_number'], 'testdrone050050')
+        self.assertEqual(drones[0]['distance'], 0)
+        self.assertEqual(sorted(drone['distance'] for drone in drones), [drone['distance'] for drone in drones])
+        self.assertTrue(all(drone['state'] == 'IDLE' for drone in drones))
+        # the next available drones are on the diagonals, 0.01 degrees away on each axis or about 1.57 km
+        self.assertAlmostEqual(drones[1]['distance'], 1572, delta=20)
+
+    def test_nearest_with_min_capacity(self):
+        """
+        Test that drones that cannot carry the requested weight are skipped
+        """
+
+        drone = Drone.objects.get(serial_number='testdrone050050')
+        drone.state = 'LOADING'
+        drone.save()
+        Flight.objects.create(drone_rel=drone, current_load_weight=450)
+
+        response = self.client.get(self.url, {'longitude': 0.5, 'latitude': 0.5, 'k': 1, 'min_capacity': 100})
+        self.assertNotEqual(response.json()[0]['serial_number'], 'testdrone050050')
+        response = self.client.get(self.url, {'longitude': 0.5, 'latitude': 0.5, 'k': 1, 'min_capacity': 50})
+        self.assertEqual(response.json()[0]['serial_number'], 'testdrone050050')
+
+    def test_nearest_uses_gist_index(self):
+        """
+        Test that the nearest drones are read in KNN order from the GiST index without sorting every drone
+        """
+
+        plan = Drone.objects.available_for_loading().nearest(Point(0.5, 0.5, srid=SRID))[:10].explain()
+        logger.debug('Query plan: %s' % plan)
+        self.assertIn('base_drone_position', plan)
+        self.assertNotIn('Sort', plan)
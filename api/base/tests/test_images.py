@@ -0,0 +1,149 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from base import images
+from base.models import Medication
+from base.tasks import process_medication_image_task
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def make_image(size, mode='RGB', image_format='JPEG'):
+    output = BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(output, image_format)
+    return output.getvalue()
+
+
+class MedicationImageTests(TestCase):
+    base_url = 'http://127.0.0.1:8000'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        # the task runs in the test process instead of a worker
+        patcher = mock.patch('base.signals.process_medication_image_task.delay', side_effect=process_medication_image_task)
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def open_variant(self, name):
+        return Image.open(images.get_storage().open(name))
+
+    def test_variants_on_upload(self):
+        """
+        Test that uploading an image generates its variants once the transaction commits and the urls are returned
+        """
+
+        url = self.base_url + reverse('medications-list')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, encode_multipart(BOUNDARY, {
+                'name': 'testmedication01', 'code': 'MED-01', 'weight': 10,
+                'image': ContentFile(make_image((2400, 1200)), name='test.jpg'),
+            }), content_type=MULTIPART_CONTENT)
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data['medication']['image_variants'])
+        self.assertEqual(self.delay.call_count, 1)
+
+        medication = Medication.objects.get()
+        variants = medication.image_variants
+        self.assertEqual(variants['source'], medication.image.name)
+        self.assertEqual(self.open_variant(variants['thumbnail']).size, (256, 128))
+        self.assertEqual(self.open_variant(variants['thumbnail']).format, 'JPEG')
+        self.assertEqual(self.open_variant(variants['thumbnail_webp']).format, 'WEBP')
+        self.assertEqual(self.open_variant(variants['webp']).size, (1200, 600))
+
+        detail_url = self.base_url + reverse('medications-detail', args=[medication.pk])
+        response = self.client.get(detail_url)
+        urls = response.data['medication']['image_variants']
+        self.assertEqual(urls['thumbnail'], 'http://testserver/media/' + variants['thumbnail'])
+        self.assertEqual(set(urls), set(images.VARIANTS))
+        # the fast read path returns the same urls
+        self.assertEqual(self.client.get(detail_url, {'include[]': 'pk'}).content, response.content)
+
+        # saving the medication again does not process the image again
+        with self.captureOnCommitCallbacks(execute=True):
+            medication.weight = 20
+            medication.save()
+        self.assertEqual(self.delay.call_count, 1)
+
+    def test_replaced_image(self):
+        """
+        Test that the variants of a replaced image are not returned and deleted once the new image is processed
+        """
+
+        medication = Medication.objects.create(name='testmedication01', code='MED-01')
+        with self.captureOnCommitCallbacks(execute=True):
+            medication.image.save('first.png', ContentFile(make_image((400, 400), 'RGBA', 'PNG')))
+        medication.refresh_from_db()
+        old_variants = medication.image_variants
+        self.assertEqual(self.open_variant(old_variants['thumbnail']).format, 'PNG')
+        self.assertEqual(self.open_variant(old_variants['thumbnail']).mode, 'RGBA')
+
+        with self.captureOnCommitCallbacks(execute=False):
+            medication.image.save('second.jpg', ContentFile(make_image((100, 50))))
+        detail_url = self.base_url + reverse('medications-detail', args=[medication.pk])
+        self.assertIsNone(self.client.get(detail_url).data['medication']['image_variants'])
+
+        self.assertEqual(process_medication_image_task(medication.pk), images.PROCESSED)
+        variants = Medication.objects.get().image_variants
+        # images smaller than the bounds are not enlarged
+        self.assertEqual(self.open_variant(variants['webp']).size, (100, 50))
+        self.assertTrue(all(not images.get_storage().exists(old_variants[variant]) for variant in images.VARIANTS))
+        self.assertEqual(process_medication_image_task(medication.pk), images.SKIPPED)
+
+    def test_unreadable_image(self):
+        """
+        Test that files that are not images are reported as failed
+        """
+
+        medication = Medication.objects.create(name='testmedication01', code='MED-01')
+        with self.captureOnCommitCallbacks(execute=True):
+            medication.image.save('test.jpg', ContentFile(b'not an image'))
+        self.assertEqual(Medication.objects.get().image_variants, {})
+        self.assertEqual(images.process_medication_image(medication.pk), images.FAILED)
+        self.assertEqual(images.process_medication_image(0), images.MISSING)
+
+    def test_backfill_command(self):
+        """
+        Test that the backfill command processes the images without variants only
+        """
+
+        storage = images.get_storage()
+        for i in range(3):
+            Medication.objects.create(name='testmedication%02d' % i, code='MED-%02d' % i)
+            # images written without signals, like images added before the variants existed
+            Medication.objects.filter(code='MED-%02d' % i).update(
+                image=storage.save('medications/test%02d.jpg' % i, ContentFile(make_image((300, 300)))))
+        Medication.objects.create(name='testmedication-noimage', code='MED-NOIMAGE')
+        self.assertEqual(len(images.get_unprocessed()), 3)
+
+        output = StringIO()
+        call_command('process_medication_images', workers=1, stdout=output, stderr=StringIO())
+        logger.debug(output.getvalue())
+        self.assertIn('processed  3', output.getvalue())
+        self.assertEqual(images.get_unprocessed(), [])
+        self.assertEqual(len(images.get_unprocessed(force=True)), 3)
+        self.assertEqual(images.process_medication_images(images.get_unprocessed(force=True), force=True)[
+            images.PROCESSED], 3)
@@ -0,0 +1,74 @@
+from unittest import skipUnless
+
+from django.db import connection, transaction, IntegrityError
+from django.test import TestCase
+
+from base.models import Drone, DroneStatusLog, Flight
+
+import logging
+logger = logging.getLogger(__name__)
+
+class OpenFlightConstraintTests(TestCase):
+
+    def test_one_open_flight_per_drone(self):
+        """
+        Test that a drone cannot have two flights not delivered at the same time
+        """
+
+        drone = Drone.objects.create(serial_number='testdrone01')
+        Flight.objects.create(drone_rel=drone, was_delivered=True)
+        Flight.objects.create(drone_rel=drone, was_delivered=True)
+        Flight.objects.create(drone_rel=drone)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Flight.objects.create(drone_rel=drone)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL')
+class HotPathIndexesTests(TestCase):
+    drones = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Seeds a fleet where most of the drones are busy, with a history of flights and status logs
+        """
+
+        logger.debug('Seeding %d drones'%cls.drones)
+        states = ['DELIVERING'] * 18 + ['RETURNING', 'IDLE']
+        drones = Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%06d'%i, state=states[i % len(states)], battery_capacity=i % 101)
+            for i in range(cls.drones)
+        ], batch_size=5000)
+        Flight.objects.bulk_create([
+            Flight(drone_rel=drone, was_delivered=i % 5 != 0)
+            for drone in drones for i in range(5)
+        ], batch_size=5000)
+        DroneStatusLog.objects.bulk_create([
+            DroneStatusLog(drone_rel=drone, current_battery=drone.battery_capacity)
+            for drone in drones for _ in range(10)
+        ], batch_size=5000)
+        cls.drone = drones[len(drones) // 2]
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        logger.debug('Query plan: %s'%plan)
+        self.assertIn(index_name, plan)
+
+    def test_available_for_loading_uses_state_battery_index(self):
+        self.assertUsesIndex(Drone.objects.available_for_loading(), 'drone_state_battery_idx')
+
+    def test_current_flight_uses_open_flight_index(self):
+        self.assertUsesIndex(
+            Flight.objects.filter(drone_rel=self.drone, was_delivered=False),
+            'one_open_flight_per_drone'
+        )
+
+    def test_status_log_history_uses_drone_created_index(self):
+        self.assertUsesIndex(
+            DroneStatusLog.objects.filter(drone_rel=self.drone).order_by('-created')[:10],
+            'status_log_drone_created_idx'
+        )
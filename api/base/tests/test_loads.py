@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.db import transaction
+from django.test import TestCase
+
+from base.loading import add_loads
+from base.models import Drone, Flight, Load, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+class FlightLoadWeightTests(TestCase):
+
+    def setUp(self):
+        self.drone = Drone.objects.create(serial_number='testdrone01', state='LOADING')
+        self.flight = Flight.objects.create(drone_rel=self.drone)
+        self.medication = Medication.objects.create(name='testmedication01', code='LLLL-HHHHH', weight=10)
+        self.other_medication = Medication.objects.create(name='testmedication02', code='LLLL-JJJJJ', weight=3)
+
+    def get_flight_load_weight(self):
+        return Flight.objects.get(pk=self.flight.pk).current_load_weight
+
+    def test_load_weight_follows_load_changes(self):
+        """
+        Test that the flight load weight is updated when its loads are created, updated and deleted
+        """
+
+        load = Load.objects.create(flight_rel=self.flight, medication_rel=self.medication, quantity=2)
+        self.assertEqual(self.get_flight_load_weight(), 20)
+
+        Load.objects.create(flight_rel=self.flight, medication_rel=self.other_medication, quantity=5)
+        self.assertEqual(self.get_flight_load_weight(), 35)
+
+        load = Load.objects.get(pk=load.pk)
+        load.quantity += 3
+        load.save()
+        self.assertEqual(self.get_flight_load_weight(), 65)
+
+        load.delete()
+        self.assertEqual(self.get_flight_load_weight(), 15)
+        self.assertEqual(Drone.objects.with_current_load().get(pk=self.drone.pk).current_load, 15)
+
+    def test_rebuild_load_weights_command(self):
+        """
+        Test that the command detects and fixes flights with a wrong load weight
+        """
+
+        Load.objects.create(flight_rel=self.flight, medication_rel=self.medication, quantity=2)
+        Flight.objects.filter(pk=self.flight.pk).update(current_load_weight=7)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_load_weights', check=True, stdout=StringIO())
+
+        call_command('rebuild_load_weights', stdout=StringIO())
+        self.assertEqual(self.get_flight_load_weight(), 20)
+
+        call_command('rebuild_load_weights', check=True, stdout=StringIO())
+
+    def test_load_weight_follows_medication_weight(self):
+        """
+        Test that the open flights carrying a medication are recomputed when its weight changes
+        """
+
+        Load.objects.create(flight_rel=self.flight, medication_rel=self.medication, quantity=2)
+        Load.objects.create(flight_rel=self.flight, medication_rel=self.other_medication, quantity=5)
+        delivered_flight = Flight.objects.create(drone_rel=Drone.objects.create(serial_number='testdrone02'),
+                                                 was_delivered=True)
+        Load.objects.create(flight_rel=delivered_flight, medication_rel=self.medication, quantity=1)
+
+        medication = Medication.objects.get(pk=self.medication.pk)
+        medication.weight = 12
+        medication.save()
+        self.assertEqual(self.get_flight_load_weight(), 39)
+        # the delivered flights keep the weight they flew with
+        self.assertEqual(Flight.objects.get(pk=delivered_flight.pk).current_load_weight, 10)
+
+    def test_check_after_medication_weight_change(self):
+        """
+        Test that the command checks and rebuilds the open flights only, delivered flights keep their weight
+        """
+
+        Load.objects.create(flight_rel=self.flight, medication_rel=self.medication, quantity=2)
+        delivered_flight = Flight.objects.create(drone_rel=Drone.objects.create(serial_number='testdrone02'),
+                                                 was_delivered=True)
+        Load.objects.create(flight_rel=delivered_flight, medication_rel=self.medication, quantity=1)
+
+        medication = Medication.objects.get(pk=self.medication.pk)
+        medication.weight = 12
+        medication.save()
+        call_command('rebuild_load_weights', check=True, stdout=StringIO())
+
+        call_command('rebuild_load_weights', stdout=StringIO())
+        self.assertEqual(Flight.objects.get(pk=delivered_flight.pk).current_load_weight, 10)
+
+    def test_rebuild_after_bulk_writes(self):
+        """
+        Test that queryset writes of loads skip the load weight until the flights are rebuilt
+        """
+
+        Load.objects.bulk_create([Load(flight_rel=self.flight, medication_rel=self.medication, quantity=2)])
+        self.assertEqual(self.get_flight_load_weight(), 0)
+        self.assertEqual(Flight.objects.filter(pk=self.flight.pk).rebuild_load_weight(), 1)
+        self.assertEqual(self.get_flight_load_weight(), 20)
+
+        Load.objects.filter(flight_rel=self.flight).delete()
+        Flight.objects.filter(pk=self.flight.pk).rebuild_load_weight()
+        self.assertEqual(self.get_flight_load_weight(), 0)
+
+    def test_full_drone_with_float_weights(self):
+        """
+        Test that a load reaching the weight limit loads the drone even if the float weights do not add up exactly
+        """
+
+        # 1.1 * 3 is 3.3000000000000003
+        drone = Drone.objects.create(serial_number='testdrone02', weight_limit=3.3)
+        medication = Medication.objects.create(name='testmedication03', code='LLLL-KKKKK', weight=1.1)
+        with transaction.atomic():
+            add_loads(drone, {medication.pk: 3})
+        self.assertEqual(Drone.objects.get(pk=drone.pk).state, 'LOADED')
@@ -0,0 +1,126 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse as admin_reverse
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from base.cache import invalidate_medications
+from base.models import Drone, DroneBatteryRollup, DroneStatusLog, Flight, Load, Medication
+from base.tasks import check_drone_battery_task
+from base.tests.utils import QueryCountMixin
+
+import logging
+logger = logging.getLogger(__name__)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryCountTests(QueryCountMixin, TestCase):
+    """
+    Every endpoint, admin list and task runs the same number of queries whatever the number of rows
+    """
+
+    base_url = 'http://127.0.0.1:8000'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.drone = Drone.objects.create(serial_number='testdrone')
+        self.flight = Flight.objects.create(drone_rel=self.drone)
+        self.rows = 0
+        self.add_rows()
+
+    def add_rows(self, count=5):
+        """
+        Adds drones with status logs and rollups, medications and loads on the test drone
+        """
+
+        start = self.rows
+        self.rows += count
+        medications = Medication.objects.bulk_create([
+            Medication(name='testmedication%03d'%i, code='MED-%03d'%i, weight=1) for i in range(start, self.rows)
+        ])
+        drones = Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%03d'%i, battery_capacity=50) for i in range(start, self.rows)
+        ])
+        medications = Medication.objects.filter(code__in=[medication.code for medication in medications])
+        # bulk inserts send no signals
+        invalidate_medications([medication.pk for medication in medications])
+        for medication in medications:
+            Load.objects.create(flight_rel=self.flight, medication_rel=medication, quantity=1)
+        for drone in Drone.objects.filter(serial_number__in=[drone.serial_number for drone in drones]):
+            DroneStatusLog.objects.create(drone_rel=drone, current_battery=50)
+            DroneBatteryRollup.objects.create(
+                drone_rel=drone, period='hour', period_start=drone.created,
+                samples=1, min_battery=50, avg_battery=50, max_battery=50)
+
+    def get(self, url, params=None):
+        def func():
+            response = self.client.get(url, params, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            if response.streaming:
+                return b''.join(response.streaming_content)
+            return response.content
+        return func
+
+    def test_drone_endpoints(self):
+        """
+        Test the query count of the drone endpoints
+        """
+
+        # the conditional endpoints read the version of the drones and flights first
+        detail = lambda action: self.base_url + reverse('drones-{}'.format(action), args=[self.drone.pk])
+        self.assertConstantQueries(4, self.get(self.base_url + reverse('drones-list')), self.add_rows)
+        self.assertConstantQueries(3, self.get(self.base_url + reverse('drones-list'), {'cursor': ''}), self.add_rows)
+        self.assertConstantQueries(4, self.get(self.base_url + reverse('drones-list'), {'include[]': 'pk'}), self.add_rows)
+        self.assertConstantQueries(4, self.get(self.base_url + reverse('drones-available-for-loading')), self.add_rows)
+        self.assertConstantQueries(3, self.get(detail('detail')), self.add_rows)
+        self.assertConstantQueries(4, self.get(detail('load')), self.add_rows)
+        self.assertConstantQueries(3, self.get(detail('battery')), self.add_rows)
+        self.assertConstantQueries(3, self.get(detail('current-load-weight')), self.add_rows)
+        self.assertConstantQueries(4, self.get(detail('battery-history'), {'bucket': 'hour'}), self.add_rows)
+        self.assertConstantQueries(2, self.get(detail('battery-history'), {'bucket': 'raw'}), self.add_rows)
+
+    def test_medication_endpoints(self):
+        """
+        Test the query count of the medication endpoints
+        """
+
+        medication = Medication.objects.first()
+        self.assertConstantQueries(3, self.get(self.base_url + reverse('medications-list')), self.add_rows)
+        self.assertConstantQueries(3, self.get(self.base_url + reverse('medications-list'), {'include[]': 'pk'}), self.add_rows)
+        self.assertConstantQueries(2, self.get(self.base_url + reverse('medications-detail', args=[medication.pk])), self.add_rows)
+
+    def test_admin_lists(self):
+        """
+        Test the query count of the admin change lists
+        """
+
+        self.client.force_login(self.user)
+        for model in ('drone', 'medication', 'dronestatuslog', 'dronebatteryrollup'):
+            logger.debug('Testing admin change list of %s'%model)
+            url = admin_reverse('admin:base_{}_changelist'.format(model))
+            self.assertConstantQueries(self.ADMIN_QUERIES[model], self.get(url), self.add_rows)
+
+        url = admin_reverse('admin:base_dronestatuslog_changelist')
+        self.assertConstantQueries(self.ADMIN_QUERIES['dronestatuslog'], self.get(url, {'q': 'testdrone001'}), self.add_rows)
+
+    def test_battery_task(self):
+        """
+        Test the query count of the battery check task for a single chunk
+        """
+
+        self.assertConstantQueries(2, lambda: check_drone_battery_task(chunk_size=1000), self.add_rows)
+
+    ADMIN_QUERIES = {
+        'drone': 5,
+        'medication': 5,
+        'dronestatuslog': 6,
+        'dronebatteryrollup': 6,
+    }
@@ -0,0 +1,55 @@
+from django.db.models import F
+from django.test import TestCase
+
+from base.models import Drone, DroneStatusLog, Flight, Load, Medication
+from base.seeding import delete_fleet, seed_fleet
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class SeedFleetTests(TestCase):
+
+    def get_fleet(self):
+        return (
+            list(Drone.objects.order_by('serial_number').values_list(
+                'serial_number', 'model', 'weight_limit', 'battery_capacity', 'state')),
+            list(Load.objects.order_by('flight_rel__drone_rel__serial_number', 'flight_rel__created',
+                                       'medication_rel__code').values_list(
+                'flight_rel__drone_rel__serial_number', 'medication_rel__code', 'quantity')),
+            sorted(DroneStatusLog.objects.values_list('drone_rel__serial_number', 'current_battery')),
+        )
+
+    def test_seed_fleet(self):
+        """
+        Test that the generated fleet is consistent, counted and the same for the same seed
+        """
+
+        results = seed_fleet(drones=30, medications=10, flights=2, loads=3, status_logs=4, seed=7)
+        logger.debug(results)
+        rows = {row['table']: row['rows'] for row in results}
+        self.assertEqual(rows[Drone._meta.db_table], 30)
+        self.assertEqual(rows[Medication._meta.db_table], 10)
+        self.assertEqual(rows[DroneStatusLog._meta.db_table], 120)
+        self.assertEqual(rows[Flight._meta.db_table], 60 + Drone.objects.filter(state='LOADING').count())
+        self.assertEqual(rows[Load._meta.db_table], Load.objects.count())
+
+        # the denormalized load weights match the loads and loading drones have a current flight
+        self.assertFalse(Flight.objects.with_wrong_load_weight().exists())
+        self.assertEqual(Flight.objects.filter(was_delivered=False).count(),
+                         Drone.objects.filter(state='LOADING').count())
+        self.assertFalse(Drone.objects.with_current_load().filter(current_load__gt=F('weight_limit')).exists())
+
+        fleet = self.get_fleet()
+
+        # new rows get ids after the generated ones
+        drone = Drone.objects.create(serial_number='testdrone01')
+        self.assertGreater(drone.pk, 30)
+        drone.delete()
+
+        delete_fleet('SEED')
+        self.assertFalse(Drone.objects.exists())
+        self.assertFalse(Medication.objects.exists())
+
+        seed_fleet(drones=30, medications=10, flights=2, loads=3, status_logs=4, seed=7)
+        self.assertEqual(self.get_fleet(), fleet)
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from base.history import bucketed_points
+from base.models import Drone, DroneBatteryRollup, DroneStatusLog
+from base.partitions import create_partitions, drop_partitions_before, get_partition_days, partition_name
+from base.rollups import rollup_days, rollup_hours
+from base.tasks import maintain_drone_status_log_task
+
+import logging
+logger = logging.getLogger(__name__)
+
+class StatusLogRollupTests(TestCase):
+
+    def setUp(self):
+        self.drone = Drone.objects.create(serial_number='testdrone01')
+        self.start = datetime(2022, 5, 22, tzinfo=timezone.utc)
+
+    def add_status_logs(self, start, batteries, step=timedelta(minutes=20)):
+        """
+        Adds a status log for each battery value starting at start
+        """
+
+        for i, battery in enumerate(batteries):
+            log = DroneStatusLog.objects.create(drone_rel=self.drone, current_battery=battery)
+            DroneStatusLog.objects.filter(pk=log.pk).update(created=start + step * i)
+
+    def test_rollups(self):
+        """
+        Test that complete hours and days are aggregated only once
+        """
+
+        # three logs per hour during two days
+        self.add_status_logs(self.start, [float(i % 100) for i in range(6 * 24)])
+
+        self.assertEqual(rollup_hours(self.start + timedelta(days=1, minutes=30)), 24)
+        self.assertEqual(rollup_days(self.start + timedelta(days=1, minutes=30)), 1)
+        self.assertEqual(rollup_hours(self.start + timedelta(days=2)), 24)
+        self.assertEqual(rollup_hours(self.start + timedelta(days=2)), 0)
+        self.assertEqual(rollup_days(self.start + timedelta(days=2)), 1)
+
+        first_hour = DroneBatteryRollup.objects.get(period='hour', period_start=self.start)
+        self.assertEqual((first_hour.samples, first_hour.min_battery, first_hour.avg_battery, first_hour.max_battery),
+                         (3, 0, 1, 2))
+
+        first_day = DroneBatteryRollup.objects.get(period='day', period_start=self.start)
+        self.assertEqual(first_day.samples, 72)
+        self.assertEqual(first_day.min_battery, 0)
+        self.assertEqual(first_day.max_battery, 71)
+        self.assertAlmostEqual(first_day.avg_battery, 35.5)
+
+    def test_history_with_unaligned_range(self):
+        """
+        Test that the history buckets of a range not aligned to the buckets are complete and stop at its end
+        """
+
+        self.add_status_logs(self.start, [50.0] * (6 * 24))
+        rollup_hours(self.start + timedelta(days=1, minutes=30))
+        rollup_days(self.start + timedelta(days=1, minutes=30))
+
+        points = list(bucketed_points(self.drone.pk, self.start + timedelta(minutes=30),
+                                      self.start + timedelta(days=1, minutes=30), 'hour'))
+        self.assertEqual(len(points), 25)
+        self.assertEqual((points[0][0], points[0][4]), (self.start, 3))
+        # the hour of end is not rolled up yet, its logs are aggregated up to end
+        self.assertEqual((points[-1][0], points[-1][4]), (self.start + timedelta(days=1), 2))
+
+        points = list(bucketed_points(self.drone.pk, self.start + timedelta(hours=12),
+                                      self.start + timedelta(days=1, hours=12), 'day'))
+        self.assertEqual([(time, samples) for time, _, _, _, samples in points],
+                         [(self.start, 72), (self.start + timedelta(days=1), 36)])
+
+        # the rollup of the day of end would count the logs after end
+        points = list(bucketed_points(self.drone.pk, self.start, self.start + timedelta(hours=12), 'day'))
+        self.assertEqual([(time, samples) for time, _, _, _, samples in points], [(self.start, 36)])
+
+    @override_settings(DRONE_BATTERY_ROLLUP_LAG_MINUTES=10)
+    def test_maintenance_waits_for_late_logs(self):
+        """
+        Test that the maintenance task rolls up an hour once the lag passed so the logs committed late are aggregated
+        """
+
+        self.add_status_logs(self.start, [50, 60])
+        with mock.patch('base.tasks.timezone.now', return_value=self.start + timedelta(hours=1, minutes=5)):
+            maintain_drone_status_log_task()
+        self.assertFalse(DroneBatteryRollup.objects.filter(period='hour').exists())
+
+        # created before the end of the hour, committed after it
+        self.add_status_logs(self.start + timedelta(minutes=59), [70])
+        with mock.patch('base.tasks.timezone.now', return_value=self.start + timedelta(hours=1, minutes=15)):
+            maintain_drone_status_log_task()
+        hour = DroneBatteryRollup.objects.get(period='hour')
+        self.assertEqual((hour.period_start, hour.samples, hour.avg_battery), (self.start, 3, 60))
+
+    @override_settings(DRONE_STATUS_LOG_RETENTION_DAYS=2)
+    def test_maintenance_removes_old_logs(self):
+        """
+        Test that the maintenance task keeps the rollups of the logs removed by the retention policy
+        """
+
+        now = datetime.now(timezone.utc)
+        self.add_status_logs(now - timedelta(days=5), [50] * 3)
+        self.add_status_logs(now - timedelta(hours=2), [40] * 3)
+
+        maintain_drone_status_log_task()
+
+        self.assertEqual(DroneStatusLog.objects.count(), 3)
+        self.assertTrue(DroneBatteryRollup.objects.filter(
+            period='day', avg_battery=50, period_start__lt=now - timedelta(days=4)).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Status log partitions require PostgreSQL')
+class StatusLogPartitionTests(TestCase):
+
+    def test_partitions_lifecycle(self):
+        """
+        Test that daily partitions are created taking its rows out of the default partition and dropped
+        """
+
+        drone = Drone.objects.create(serial_number='testdrone01')
+        today = datetime.now(timezone.utc).date()
+        log = DroneStatusLog.objects.create(drone_rel=drone, current_battery=80)
+
+        created = create_partitions(today, 2)
+        self.assertEqual(created, [today + timedelta(days=offset) for offset in range(3)])
+        self.assertEqual(create_partitions(today, 2), [])
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM {}'.format(partition_name(today)))
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertTrue(DroneStatusLog.objects.filter(pk=log.pk).exists())
+
+        self.assertEqual(drop_partitions_before(today + timedelta(days=1)), [today])
+        self.assertEqual(get_partition_days(), [today + timedelta(days=offset) for offset in range(1, 3)])
+        self.assertFalse(DroneStatusLog.objects.filter(pk=log.pk).exists())
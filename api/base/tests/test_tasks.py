@@ -0,0 +1,58 @@
+from django.test import TestCase
+
+from base.models import Drone, DroneStatusLog
+from base.tasks import check_drone_battery_task
+
+import logging
+logger = logging.getLogger(__name__)
+
+class CheckDroneBatteryTaskTests(TestCase):
+
+    def add_test_drones(self, count):
+        """
+        Adds test drones into the database, one every four with low battery
+        """
+
+        logger.debug('Adding %d drones into database'%count)
+        return Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%03d'%i, battery_capacity=10 if i % 4 == 0 else 80)
+            for i in range(count)
+        ])
+
+    def test_logs_every_drone(self):
+        """
+        Test that a status log row is created for each drone with its battery
+        """
+
+        self.add_test_drones(10)
+
+        logged = check_drone_battery_task(chunk_size=3)
+
+        self.assertEqual(logged, 10)
+        self.assertEqual(DroneStatusLog.objects.count(), 10)
+        for log in DroneStatusLog.objects.select_related('drone_rel'):
+            self.assertEqual(log.current_battery, log.drone_rel.battery_capacity)
+
+    def test_queries_do_not_grow_with_fleet(self):
+        """
+        Test that the task issues one insert per chunk instead of one per drone
+        """
+
+        self.add_test_drones(20)
+
+        # one select plus one insert for each of the two chunks
+        with self.assertNumQueries(3):
+            check_drone_battery_task(chunk_size=10)
+
+    def test_low_battery_warning_is_aggregated(self):
+        """
+        Test that low battery drones are reported in a single warning per chunk
+        """
+
+        self.add_test_drones(8)
+
+        with self.assertLogs('base.tasks', level='WARNING') as logs:
+            check_drone_battery_task(chunk_size=8)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('2 drones', logs.output[0])
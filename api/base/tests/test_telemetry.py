@@ -0,0 +1,108 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from base.models import Drone, DroneStatusLog
+from base.tests.utils import QueryCountMixin
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class DroneTelemetryTests(QueryCountMixin, TestCase):
+    base_url = 'http://127.0.0.1:8000'
+    url = base_url + '/drones/telemetry/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%02d' % i, battery_capacity=100) for i in range(3)
+        ])
+
+    def get_drones(self):
+        return list(Drone.objects.order_by('serial_number').values_list('serial_number', 'state', 'battery_capacity'))
+
+    def test_json_reports(self):
+        """
+        Test that a list of reports updates only the changed drones and returns the unknown ones
+        """
+
+        response = self.client.post(self.url, [
+            {'serial_number': 'testdrone00', 'battery_capacity': 50},
+            {'serial_number': 'testdrone01', 'state': 'LOADING'},
+            {'serial_number': 'testdrone02', 'battery_capacity': 100, 'state': 'IDLE'},
+            {'serial_number': 'testdrone00', 'battery_capacity': 40, 'state': 'RETURNING'},
+            {'serial_number': 'unknown', 'battery_capacity': 10},
+        ], format='json')
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'received': 4, 'updated': 2, 'unchanged': 1, 'logged': 0, 'unknown': ['unknown']})
+        self.assertEqual(self.get_drones(), [
+            ('testdrone00', 'RETURNING', 40), ('testdrone01', 'LOADING', 100), ('testdrone02', 'IDLE', 100)
+        ])
+        self.assertFalse(DroneStatusLog.objects.exists())
+
+    def test_ndjson_reports_with_logs(self):
+        """
+        Test that NDJSON reports are accepted and log the battery of every reported drone
+        """
+
+        body = '\n'.join(json.dumps({'serial_number': 'testdrone%02d' % i, 'battery_capacity': 90 - i}) for i in range(3))
+        response = self.client.post(self.url + '?log=true', body + '\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(sorted(DroneStatusLog.objects.values_list('drone_rel__serial_number', 'current_battery')),
+                         [('testdrone00', 90), ('testdrone01', 89), ('testdrone02', 88)])
+
+    def test_invalid_reports(self):
+        """
+        Test that a batch with an invalid report is rejected with the position of each error
+        """
+
+        response = self.client.post(self.url, [
+            {'serial_number': 'testdrone00', 'battery_capacity': 50},
+            {'serial_number': 'testdrone01', 'battery_capacity': 150},
+            {'serial_number': 'testdrone02', 'state': 'FLYING'},
+            {'serial_number': 'testdrone02'},
+            'testdrone02',
+        ], format='json')
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3, 4])
+        self.assertEqual(Drone.objects.filter(battery_capacity=100).count(), 3)
+
+        response = self.client.post(self.url, {'serial_number': 'testdrone00'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, 'not json', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(DRONE_TELEMETRY_MAX_REPORTS=2):
+            response = self.client.post(self.url, [{'serial_number': 'testdrone00', 'battery_capacity': 1}] * 3,
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_constant_queries(self):
+        """
+        Test that a batch runs the same queries whatever the number of drones reported
+        """
+
+        def report():
+            reports = [{'serial_number': serial_number, 'battery_capacity': 10 + len(serial_number) % 50}
+                       for serial_number in Drone.objects.values_list('serial_number', flat=True)]
+            for item in reports[::2]:
+                item['state'] = 'LOADING'
+            response = self.client.post(self.url + '?log=true', reports, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        def add_rows():
+            Drone.objects.bulk_create([
+                Drone(serial_number='testdrone%03d' % i, battery_capacity=100) for i in range(100, 120)
+            ])
+
+        # serial numbers of the test, savepoint, drones, update, status logs and savepoint release
+        self.assertConstantQueries(6, report, add_rows)
@@ -0,0 +1,161 @@
+from unittest import mock
+
+import fakeredis
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from base import telemetry_stream
+from base.models import Drone, DroneStatusLog, TelemetryStreamCheckpoint
+from base.tasks import flush_telemetry_stream_task
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+@override_settings(DRONE_TELEMETRY_MODE='stream')
+class TelemetryStreamTests(TestCase):
+    base_url = 'http://127.0.0.1:8000'
+    url = base_url + '/drones/telemetry/'
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('base.telemetry_stream.get_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Drone.objects.bulk_create([
+            Drone(serial_number='testdrone%02d' % i, battery_capacity=100) for i in range(3)
+        ])
+
+    def get_drones(self):
+        return list(Drone.objects.order_by('serial_number').values_list('serial_number', 'state', 'battery_capacity'))
+
+    def post(self, reports, log=False):
+        return self.client.post(self.url + ('?log=true' if log else ''), reports, format='json')
+
+    def test_queue_and_flush(self):
+        """
+        Test that the reports are queued without touching the drones and applied by the flush task
+        """
+
+        response = self.post([{'serial_number': 'testdrone00', 'battery_capacity': 50}], log=True)
+        logger.debug(response.data)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['received'], 1)
+        response = self.post([
+            {'serial_number': 'testdrone00', 'battery_capacity': 40, 'state': 'RETURNING'},
+            {'serial_number': 'testdrone01', 'state': 'LOADING'},
+            {'serial_number': 'unknown', 'battery_capacity': 10},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Drone.objects.filter(battery_capacity=100, state='IDLE').count(), 3)
+
+        totals = flush_telemetry_stream_task()
+        logger.debug(totals)
+        self.assertEqual(totals['entries'], 2)
+        self.assertEqual(totals['updated'], 2)
+        self.assertEqual(totals['unknown'], 1)
+        self.assertEqual(self.get_drones(), [
+            ('testdrone00', 'RETURNING', 40), ('testdrone01', 'LOADING', 100), ('testdrone02', 'IDLE', 100)
+        ])
+        # the reading of the first entry is logged with its own battery
+        self.assertEqual(list(DroneStatusLog.objects.values_list('drone_rel__serial_number', 'current_battery')),
+                         [('testdrone00', 50)])
+
+        stats = telemetry_stream.get_stream_stats()
+        self.assertEqual((stats['length'], stats['pending'], stats['entries'], stats['reports']), (0, 0, 2, 3))
+        self.assertEqual(flush_telemetry_stream_task()['entries'], 0)
+
+    def test_redelivery_after_failed_flush(self):
+        """
+        Test that entries read by a flush that fails are applied by the next flush
+        """
+
+        self.post([{'serial_number': 'testdrone00', 'battery_capacity': 50}])
+        with mock.patch('base.telemetry_stream.apply_reports', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                telemetry_stream.flush()
+        self.assertEqual(telemetry_stream.get_stream_stats()['pending'], 1)
+        self.assertEqual(Drone.objects.get(serial_number='testdrone00').battery_capacity, 100)
+
+        self.post([{'serial_number': 'testdrone01', 'battery_capacity': 60}])
+        totals = telemetry_stream.flush()
+        self.assertEqual((totals['entries'], totals['duplicates']), (2, 0))
+        self.assertEqual([drone[2] for drone in self.get_drones()], [50, 60, 100])
+        self.assertEqual(telemetry_stream.get_stream_stats()['pending'], 0)
+
+    def test_duplicated_entries_are_skipped(self):
+        """
+        Test that entries applied and not acknowledged are skipped when they are delivered again
+        """
+
+        self.post([{'serial_number': 'testdrone00', 'battery_capacity': 50}], log=True)
+        # the entries are applied but the acknowledgement is lost
+        with mock.patch.object(self.redis, 'xack'), mock.patch.object(self.redis, 'xdel'):
+            self.assertEqual(telemetry_stream.flush(max_batches=1)['entries'], 1)
+        Drone.objects.filter(serial_number='testdrone00').update(battery_capacity=30)
+
+        totals = telemetry_stream.flush()
+        self.assertEqual((totals['entries'], totals['duplicates']), (0, 1))
+        self.assertEqual(Drone.objects.get(serial_number='testdrone00').battery_capacity, 30)
+        self.assertEqual(DroneStatusLog.objects.count(), 1)
+        self.assertTrue(TelemetryStreamCheckpoint.objects.filter(stream=telemetry_stream.STREAM).exists())
+        self.assertEqual(telemetry_stream.get_stream_stats()['duplicates'], 1)
+
+    def test_backpressure(self):
+        """
+        Test that reports are rejected with 503 while the stream is full and the backlog is reported
+        """
+
+        with override_settings(DRONE_TELEMETRY_STREAM_MAX_LENGTH=2):
+            for battery in (50, 40):
+                self.assertEqual(self.post([{'serial_number': 'testdrone00', 'battery_capacity': battery}]).status_code,
+                                 status.HTTP_202_ACCEPTED)
+            response = self.post([{'serial_number': 'testdrone00', 'battery_capacity': 30}])
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertIn('Retry-After', response)
+
+            response = self.client.get(self.base_url + '/drones/telemetry_stream/')
+            logger.debug(response.data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual((response.data['length'], response.data['rejected']), (2, 1))
+            self.assertGreaterEqual(response.data['lag_seconds'], 0)
+
+            flush_telemetry_stream_task()
+            self.assertEqual(self.post([{'serial_number': 'testdrone00', 'battery_capacity': 30}]).status_code,
+                             status.HTTP_202_ACCEPTED)
+        self.assertEqual(Drone.objects.get(serial_number='testdrone00').battery_capacity, 40)
+
+    def test_single_flush(self):
+        """
+        Test that a flush is skipped while another one holds the lock
+        """
+
+        self.post([{'serial_number': 'testdrone00', 'battery_capacity': 50}])
+        self.redis.set(telemetry_stream.LOCK_KEY, '1')
+        self.assertIsNone(flush_telemetry_stream_task())
+        self.assertEqual(telemetry_stream.get_stream_stats()['length'], 1)
+
+    def test_expired_lock_is_not_released(self):
+        """
+        Test that a flush outliving its lock does not release the lock taken by the next flush
+        """
+
+        self.post([{'serial_number': 'testdrone00', 'battery_capacity': 50}])
+        flush_batch = telemetry_stream.flush_batch
+
+        def expire_lock(client, batch_size):
+            # the lock expires and another flush takes it
+            self.redis.set(telemetry_stream.LOCK_KEY, 'other flush')
+            return flush_batch(client, batch_size)
+
+        with mock.patch('base.telemetry_stream.flush_batch', side_effect=expire_lock):
+            self.assertEqual(flush_telemetry_stream_task()['entries'], 1)
+        self.assertEqual(self.redis.get(telemetry_stream.LOCK_KEY), b'other flush')
@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+
+from rest_framework.reverse import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from base.api.serializers.drones import DroneLoadSerializer
+from base.models import Drone, Flight, Load, Medication
+
+import logging
+logger = logging.getLogger(__name__)
+
+class ValuesSerializerTests(APITestCase):
+    """
+    The fast read path must return the same JSON as the dynamic serializers, that are
+    still used when the request has include[] so those responses are the reference
+    """
+
+    base_url = 'http://127.0.0.1:8000'
+
+    def setUp(self):
+        user = User.objects.create_user(username='admin', email='admin@admin.com', password='admin')
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.medications = [
+            Medication.objects.create(name='testmedication%02d'%i, code='MED-%02d'%i, weight=10 + i)
+            for i in range(3)
+        ]
+        Medication.objects.filter(pk=self.medications[0].pk).update(image='medications/test.png')
+        self.drones = [Drone.objects.create(serial_number='testdrone%02d'%i, weight_limit=100 + i) for i in range(3)]
+        flight = Flight.objects.create(drone_rel=self.drones[0])
+        for medication in self.medications:
+            Load.objects.create(flight_rel=flight, medication_rel=medication, quantity=2)
+
+    def assertSameResponse(self, url, params=None):
+        params = params or {}
+        logger.debug('Sending TEST data to url: %s'%url)
+        fast = self.client.get(url, params, format='json')
+        reference = self.client.get(url, {**params, 'include[]': 'pk'}, format='json')
+
+        logger.debug('Testing fast response: %s, reference: %s'%(fast.content, reference.content))
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(reference.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, reference.content)
+
+    def test_drones_same_json(self):
+        """
+        Test that the drones list and detail keep the JSON of DroneSerializer
+        """
+
+        self.assertSameResponse(self.base_url + reverse('drones-list'))
+        self.assertSameResponse(self.base_url + reverse('drones-list'), {'per_page': 2, 'page': 2})
+        self.assertSameResponse(self.base_url + reverse('drones-list'), {'per_page': 2, 'cursor': ''})
+        self.assertSameResponse(self.base_url + reverse('drones-list'), {'sort[]': '-weight_limit'})
+        self.assertSameResponse(self.base_url + reverse('drones-list'), {'filter{state}': 'IDLE'})
+        self.assertSameResponse(self.base_url + reverse('drones-detail', args=[self.drones[0].pk]))
+
+    def test_medications_same_json(self):
+        """
+        Test that the medications list and detail keep the JSON of MedicationSerializer
+        """
+
+        self.assertSameResponse(self.base_url + reverse('medications-list'))
+        self.assertSameResponse(self.base_url + reverse('medications-detail', args=[self.medications[0].pk]))
+        self.assertSameResponse(self.base_url + reverse('medications-detail', args=[self.medications[1].pk]))
+
+    def test_load_same_json(self):
+        """
+        Test that the load of a drone keeps the JSON of DroneLoadSerializer
+        """
+
+        url = self.base_url + '/drones/{}/load/'.format(self.drones[0].pk)
+        response = self.client.get(url, format='json')
+
+        loads = Load.objects.filter(flight_rel__drone_rel=self.drones[0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), DroneLoadSerializer(embed=True, many=True).to_representation(loads))
+
+    def test_missing_detail(self):
+        """
+        Test that the fast detail returns 404 for missing rows
+        """
+
+        url = self.base_url + reverse('drones-detail', args=[self.drones[-1].pk + 100])
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
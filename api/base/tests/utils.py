@@ -0,0 +1,26 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """
+    Test case mixin asserting that a code path runs a fixed number of queries
+    whatever the number of rows it reads, so N+1 queries make the test fail
+    """
+
+    def assertConstantQueries(self, num, func, add_rows, times=2):
+        """
+        Checks that func runs num queries, then calls add_rows and checks it again,
+        times in total. Returns the result of the last call to func.
+        """
+
+        for attempt in range(times):
+            if attempt:
+                add_rows()
+            with CaptureQueriesContext(connection) as context:
+                result = func()
+            self.assertEqual(
+                len(context), num, '{} queries executed, {} expected after adding rows {} times:\n{}'.format(
+                    len(context), num, attempt, '\n'.join(query['sql'] for query in context.captured_queries))
+            )
+        return result
@@ -2,6 +2,8 @@
 ASGI config for drones project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests are served by Django and websocket connections by the channels
+consumers of base.routing.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +15,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drones.settings')
 
-application = get_asgi_application()
+# Django must be set up before importing the consumers
+django_application = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from base.auth import JWTAuthMiddlewareStack  # noqa: E402
+from base.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_application,
+    'websocket': AllowedHostsOriginValidator(JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))),
+})
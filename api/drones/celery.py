@@ -15,6 +15,14 @@ app.conf.beat_schedule = {
         "task": "base.tasks.check_drone_battery_task",
         "schedule": crontab(minute="*"),
     },
+    "maintain_drone_status_log_task": {
+        "task": "base.tasks.maintain_drone_status_log_task",
+        "schedule": crontab(minute="15"),
+    },
+    "flush_telemetry_stream_task": {
+        "task": "base.tasks.flush_telemetry_stream_task",
+        "schedule": float(os.getenv("DRONE_TELEMETRY_STREAM_FLUSH_INTERVAL", 2)),
+    },
 }
 
 @app.task(bind=True)
@@ -24,8 +24,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'django-insecure-prrcpkjrky2p7%$9@%=g@@(h7f&*xfo$bu-m*_zk2f2q5jhl!7'
 
+# development or production, production turns debug off and keeps the database connections open
+SERVING_MODE = os.getenv('SERVING_MODE', 'development')
+PRODUCTION = SERVING_MODE == 'production'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
 ALLOWED_HOSTS = ['*']
 
@@ -33,14 +37,18 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    # ASGI server, also serves runserver so the websockets work on development
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.gis',
     # custom apps
     'corsheaders',
+    'channels',
     'rest_framework',
     'dynamic_rest',
     'logentry_admin',
@@ -82,6 +90,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'drones.wsgi.application'
+ASGI_APPLICATION = 'drones.asgi.application'
 
 
 # Database
@@ -94,7 +103,11 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
         'PORT': int(os.getenv('POSTGRES_PORT', 5432)),
-        'HOST': os.getenv('POSTGRES_HOST', 'db')
+        'HOST': os.getenv('POSTGRES_HOST', 'db'),
+        # seconds a connection is reused by the requests of a worker thread, 0 closes it after each request
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', 600 if PRODUCTION else 0)),
+        # reused connections are checked before each request, see base.db
+        'CONN_HEALTH_CHECKS': os.getenv('DATABASE_CONN_HEALTH_CHECKS', str(PRODUCTION)).lower() in ('1', 'true'),
     }
 }
 
@@ -152,6 +165,94 @@ SIMPLE_JWT = {
 CELERY_broker_url = os.getenv('CELERY_BROKER_URL', "redis://redis:6379")
 result_backen = os.getenv(
     'CELERY_RESULT_BACKEND', "redis://redis:6379")
+
+# Cache configurations
+# CACHE_BACKEND=locmem keeps the cache in the memory of each process instead of Redis (tests, local development)
+if os.getenv('CACHE_BACKEND') == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL', "redis://redis:6379/1"),
+            'KEY_PREFIX': 'drones',
+            # a Redis outage makes every read a cache miss instead of an error
+            'OPTIONS': {
+                'IGNORE_EXCEPTIONS': True,
+                'SOCKET_CONNECT_TIMEOUT': 1,
+                'SOCKET_TIMEOUT': 1,
+            },
+        }
+    }
+# seconds a medication stays cached for the load endpoints
+MEDICATION_CACHE_TTL = int(os.getenv('MEDICATION_CACHE_TTL', 3600))
+# seconds the responses of the medications endpoints stay cached
+MEDICATION_RESPONSE_CACHE_TTL = int(os.getenv('MEDICATION_RESPONSE_CACHE_TTL', 300))
+# seconds after the last modification of a resource before If-Modified-Since is answered with 304,
+# Last-Modified only has a precision of seconds and the updated timestamps are set before commit
+LAST_MODIFIED_WINDOW = int(os.getenv('LAST_MODIFIED_WINDOW', 5))
+
+# Channel layer configurations
+# the drone events are published once on Redis and fanned out by each server process to its websockets,
+# CHANNEL_LAYER_BACKEND=inmemory keeps them inside a single process (tests, local development)
+if os.getenv('CHANNEL_LAYER_BACKEND') == 'inmemory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {
+                'hosts': [os.getenv('CHANNEL_LAYER_REDIS_URL', "redis://redis:6379/2")],
+            },
+        }
+    }
+
+# Fleet monitoring configurations
+# drones returned by default and at most by the nearest drones available for loading endpoint
+DRONE_NEAREST_DEFAULT_RESULTS = int(os.getenv('DRONE_NEAREST_DEFAULT_RESULTS', 10))
+DRONE_NEAREST_MAX_RESULTS = int(os.getenv('DRONE_NEAREST_MAX_RESULTS', 100))
+# battery percentage a drone must still have when it returns from a flight
+DRONE_FLIGHT_RESERVE_BATTERY = float(os.getenv('DRONE_FLIGHT_RESERVE_BATTERY', 10))
+# destinations of a feasibility request and feasible pairs returned by default and at most
+DRONE_FEASIBILITY_MAX_DESTINATIONS = int(os.getenv('DRONE_FEASIBILITY_MAX_DESTINATIONS', 1000))
+DRONE_FEASIBILITY_DEFAULT_RESULTS = int(os.getenv('DRONE_FEASIBILITY_DEFAULT_RESULTS', 100))
+DRONE_FEASIBILITY_MAX_RESULTS = int(os.getenv('DRONE_FEASIBILITY_MAX_RESULTS', 10000))
+# number of drones read and logged per bulk insert by the battery check task
+DRONE_BATTERY_LOG_CHUNK_SIZE = int(os.getenv('DRONE_BATTERY_LOG_CHUNK_SIZE', 2000))
+# maximum reports of a telemetry request and reports applied with each set of queries
+DRONE_TELEMETRY_MAX_REPORTS = int(os.getenv('DRONE_TELEMETRY_MAX_REPORTS', 10000))
+DRONE_TELEMETRY_CHUNK_SIZE = int(os.getenv('DRONE_TELEMETRY_CHUNK_SIZE', 2000))
+# sync applies the telemetry on the request, stream appends it to a Redis stream applied by the flush task
+DRONE_TELEMETRY_MODE = os.getenv('DRONE_TELEMETRY_MODE', 'sync')
+DRONE_TELEMETRY_STREAM_REDIS_URL = os.getenv('DRONE_TELEMETRY_STREAM_REDIS_URL', "redis://redis:6379/3")
+# entries waiting on the stream before the telemetry requests are rejected with 503
+DRONE_TELEMETRY_STREAM_MAX_LENGTH = int(os.getenv('DRONE_TELEMETRY_STREAM_MAX_LENGTH', 10000))
+# entries applied by each transaction of the flush task and seconds between flushes
+DRONE_TELEMETRY_STREAM_BATCH_SIZE = int(os.getenv('DRONE_TELEMETRY_STREAM_BATCH_SIZE', 100))
+DRONE_TELEMETRY_STREAM_FLUSH_INTERVAL = float(os.getenv('DRONE_TELEMETRY_STREAM_FLUSH_INTERVAL', 2))
+# seconds a flush holds its lock if its worker dies without releasing it
+DRONE_TELEMETRY_STREAM_LOCK_TIMEOUT = int(os.getenv('DRONE_TELEMETRY_STREAM_LOCK_TIMEOUT', 300))
+# how load requests behave when the drone is locked by another request:
+# wait for the lock, or fail right away with 409 (nowait, skip_locked)
+DRONE_LOAD_LOCK_MODE = os.getenv('DRONE_LOAD_LOCK_MODE', 'nowait')
+# days of raw status logs kept, older logs only remain as hourly and daily rollups
+DRONE_STATUS_LOG_RETENTION_DAYS = int(os.getenv('DRONE_STATUS_LOG_RETENTION_DAYS', 30))
+# daily partitions of the status log created in advance
+DRONE_STATUS_LOG_PARTITIONS_AHEAD = int(os.getenv('DRONE_STATUS_LOG_PARTITIONS_AHEAD', 3))
+# minutes a complete hour waits before it is rolled up, so the status logs created before the end
+# of the hour by transactions that commit after it are aggregated
+DRONE_BATTERY_ROLLUP_LAG_MINUTES = int(os.getenv('DRONE_BATTERY_ROLLUP_LAG_MINUTES', 10))
+# days of hourly battery rollups kept, daily rollups are kept forever
+DRONE_BATTERY_HOURLY_ROLLUP_RETENTION_DAYS = int(os.getenv('DRONE_BATTERY_HOURLY_ROLLUP_RETENTION_DAYS', 365))
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -198,6 +299,13 @@ MEDIA_ROOT = os.getenv('SA_UPLOADED_FILES_DIR',
                        '/home/emiguel/mareas_ftp/ordered')
 MEDIA_URL = "/media/"
 
+# Medication images configurations
+# longest side in pixels of the thumbnails and of the WebP version of the medication images
+MEDICATION_THUMBNAIL_SIZE = int(os.getenv('MEDICATION_THUMBNAIL_SIZE', 256))
+MEDICATION_IMAGE_MAX_SIZE = int(os.getenv('MEDICATION_IMAGE_MAX_SIZE', 1200))
+# quality of the WebP and JPEG variants, from 1 to 100
+MEDICATION_IMAGE_QUALITY = int(os.getenv('MEDICATION_IMAGE_QUALITY', 80))
+
 ADMINS = [
     ('admin', 'admin@gmail.com'),
 ]
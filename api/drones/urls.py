@@ -25,6 +25,7 @@ from rest_framework_simplejwt import views as jwt_views
 
 from dynamic_rest import routers
 
+from base.api.views import async_reads
 from base.api.views import drones as drones_views
 from base.api.views import medications as medications_views
 
@@ -37,6 +38,13 @@ router.register(r'medications', medications_views.MedicationViewSet, 'medication
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include(router.urls)),
+    # async read urls, for the ASGI server
+    path('async/drones/', async_reads.drone_list, name='async-drones-list'),
+    path('async/drones/<int:pk>/', async_reads.drone_detail, name='async-drones-detail'),
+    path('async/drones/<int:pk>/battery/', async_reads.drone_battery, name='async-drones-battery'),
+    path('async/drones/<int:pk>/load/', async_reads.drone_load, name='async-drones-load'),
+    path('async/medications/', async_reads.medication_list, name='async-medications-list'),
+    path('async/medications/<int:pk>/', async_reads.medication_detail, name='async-medications-detail'),
     # auth and token urls
     path('auth/', include('rest_framework.urls', namespace='rest_framework')),
     path('api/token/', jwt_views.TokenObtainPairView.as_view(), name='token_obtain_pair'),